@@ -0,0 +1,139 @@
+"""
+Bot and dispatcher factories shared by the entry point and the load-test tools
+"""
+from typing import List, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+
+from config import config
+from bot.handlers import owner_router, user_router, common_router
+from bot.middlewares import (
+    AlbumMiddleware, StateProxyMiddleware, UpdateRecorderMiddleware, ThrottlingMiddleware, parse_limits
+)
+from bot.services import maintenance, outbox, scheduler, warm_up_statements, writer
+from bot.session import CachingResolver, TunedAiohttpSession, json_codec, parse_timeouts
+from bot.storage import BoundedMemoryStorage
+
+def create_session(limit: Optional[int] = None) -> TunedAiohttpSession:
+    """HTTP session for the Bot API (can be shared by several bots)"""
+    json_loads, json_dumps = json_codec(config.HTTP_JSON)
+    kwargs = {}
+    if config.TELEGRAM_API_URL:
+        kwargs['api'] = TelegramAPIServer.from_base(config.TELEGRAM_API_URL)
+    return TunedAiohttpSession(
+        limit=limit or config.HTTP_POOL_SIZE,
+        keepalive_timeout=config.HTTP_KEEPALIVE,
+        resolver=CachingResolver(ttl=config.HTTP_DNS_TTL, stale_ttl=config.HTTP_DNS_STALE),
+        timeout=config.HTTP_TIMEOUT,
+        connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+        method_timeouts=parse_timeouts(config.HTTP_METHOD_TIMEOUTS),
+        json_loads=json_loads,
+        json_dumps=json_dumps,
+        **kwargs
+    )
+
+def create_bot(session=None, token: Optional[str] = None) -> Bot:
+    """Create the bot instance"""
+    if session is None:
+        session = create_session()
+    
+    return Bot(
+        token=token or config.BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+def resolve_used_update_types() -> List[str]:
+    """Update types the handlers use, without building a dispatcher (for ingress that only forwards updates)"""
+    return sorted({
+        update_type
+        for router in (owner_router, user_router, common_router)
+        for update_type in router.resolve_used_update_types()
+    })
+
+def create_dispatcher(
+    storage: Optional[BaseStorage] = None,
+    events_isolation: Optional[BaseEventIsolation] = None,
+    background_services: bool = True
+) -> Dispatcher:
+    """
+    Create the dispatcher with all routers and middlewares registered
+    
+    With several worker processes only one of them should run the outbox
+    and the scheduler (background_services=True).
+    """
+    if storage is None:
+        storage = BoundedMemoryStorage(
+            ttl=config.FSM_STATE_TTL,
+            max_bytes=config.FSM_MEMORY_BYTES,
+            sweep_interval=config.FSM_SWEEP_INTERVAL
+        )
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+    
+    # Abandoned flows are swept out of memory (the dispatcher closes the storage on shutdown)
+    if isinstance(storage, BoundedMemoryStorage):
+        dp.startup.register(storage.start)
+    
+    # Optional traffic recording (see loadtest/replay.py)
+    if config.RECORD_UPDATES_PATH:
+        recorder = UpdateRecorderMiddleware(
+            config.RECORD_UPDATES_PATH,
+            scrub_text=config.RECORD_SCRUB_TEXT
+        )
+        dp.update.outer_middleware(recorder)
+        dp.shutdown.register(recorder.close)
+    
+    # Albums reach the handlers as one update; registered ahead of the FSM
+    # middleware so a waiting album doesn't hold the chat's isolation lock
+    album = AlbumMiddleware(window=config.ALBUM_WINDOW)
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(album)
+    dp.update.outer_middleware(dp.fsm)
+    dp.shutdown.register(album.close)
+    
+    # One FSM read and one merged write per update; concurrent changes are
+    # only possible (and checked for) without event isolation
+    state_proxy = StateProxyMiddleware(verify=isinstance(dp.fsm.events_isolation, DisabledEventIsolation))
+    dp.update.outer_middleware(state_proxy)
+    dp.shutdown.register(state_proxy.close)
+    
+    # Tap-storm protection, before any handler touches the DB
+    if config.THROTTLE_ENABLED:
+        throttling = ThrottlingMiddleware(
+            user_limit=(config.THROTTLE_RATE, config.THROTTLE_BURST),
+            action_limits=parse_limits(config.THROTTLE_ACTION_LIMITS)
+        )
+        dp.message.outer_middleware(throttling)
+        dp.callback_query.outer_middleware(throttling)
+        dp.shutdown.register(throttling.close)
+        dp["throttling"] = throttling
+    
+    # Compile the per-tap queries before the first update arrives
+    dp.startup.register(warm_up_statements)
+    
+    # Handler writes are group-committed; what is queued is committed on shutdown
+    dp.shutdown.register(writer.stop)
+    
+    # Handlers get the services by name (multi-shop mode swaps in the shop's own)
+    dp["outbox"] = outbox
+    dp["scheduler"] = scheduler
+    
+    # Background notification delivery, booking lifecycle and database maintenance jobs
+    if background_services:
+        dp.startup.register(outbox.start)
+        dp.startup.register(scheduler.start)
+        dp.startup.register(maintenance.start)
+        dp.shutdown.register(maintenance.stop)
+        dp.shutdown.register(scheduler.stop)
+        dp.shutdown.register(outbox.stop)
+    
+    # Register routers in order of priority
+    dp.include_router(owner_router)   # Owner-specific handlers FIRST
+    dp.include_router(user_router)    # User handlers
+    dp.include_router(common_router)  # Common handlers LAST (includes fallback)
+    
+    return dp
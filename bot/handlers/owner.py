@@ -2,20 +2,33 @@
 Owner-specific handlers - COMPLETE VERSION
 """
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, ContentType
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, ContentType, FSInputFile
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
+from dataclasses import replace
+from html import escape
+from typing import List, Optional
 import logging
+import math
+import os
 
 from config import config
 from db import async_session
 from models import Tool, Booking, BookingStatus
-from bot.states import AddToolStates, EditToolStates, DeleteToolStates
-from bot.keyboards.inline import InlineKeyboards
+from bot.states import AddToolStates, DeleteToolStates, MessageStates, TriageStates
+from bot.keyboards.inline import InlineKeyboards, STATUS_EMOJI
+from bot.rendering import answer_chunks, chunk_blocks
+from bot.services import (
+    OutboxDispatcher, BookingScheduler, catalog_cache, DuplicateSubmission, idempotency, new_flow_id,
+    DecisionResult, decide_bookings, EXPORT_FORMATS, export_bookings,
+    ThreadPage, enqueue_notification, load_inbox, load_thread, parse_inbox_cursor, record_message, reply_router,
+    CONSOLE_PERIODS, CONSOLE_STATUSES, ConsolePage, ConsoleView, load_console_page, load_tool_page,
+    load_owner_tools, writer
+)
 
 logger = logging.getLogger(__name__)
 router = Router(name="owner")
@@ -46,6 +59,7 @@ async def start_add_tool(update: Message | CallbackQuery, state: FSMContext):
     else:
         await update.answer(text)
     
+    await state.set_data({'flow_id': new_flow_id()})  # idempotency key of the save
     await state.set_state(AddToolStates.waiting_for_name)
 
 @router.message(AddToolStates.waiting_for_name)
@@ -91,14 +105,14 @@ async def process_tool_price(message: Message, state: FSMContext):
         await message.answer("❌ Invalid price format. Please enter a number (e.g., 25.50):")
 
 @router.message(AddToolStates.waiting_for_photos, F.content_type == ContentType.PHOTO)
-async def process_tool_photos(message: Message, state: FSMContext):
-    """Process tool photos"""
+async def process_tool_photos(message: Message, state: FSMContext, album: Optional[List[Message]] = None):
+    """Process tool photos (a whole album at once, see AlbumMiddleware)"""
     data = await state.get_data()
     image_ids = data.get('image_ids', [])
     
-    # Get the largest photo size
-    photo = message.photo[-1]
-    image_ids.append(photo.file_id)
+    # Get the largest size of each photo
+    added = [item.photo[-1].file_id for item in album or [message]][:10 - len(image_ids)]
+    image_ids.extend(added)
     
     await state.update_data(image_ids=image_ids)
     
@@ -106,8 +120,11 @@ async def process_tool_photos(message: Message, state: FSMContext):
         await message.answer("Maximum 10 photos reached. Tool will be saved with these photos.")
         await confirm_add_tool(message, state)
     else:
+        added_text = f"Photo {len(image_ids)} added!" if len(added) == 1 else (
+            f"{len(added)} photos added ({len(image_ids)} in total)!"
+        )
         await message.answer(
-            f"Photo {len(image_ids)} added! Send more photos or:\n"
+            f"{added_text} Send more photos or:\n"
             "/done - Finish adding photos\n"
             "/skip - Skip adding photos"
         )
@@ -143,8 +160,9 @@ async def confirm_add_tool(message: Message, state: FSMContext):
 async def save_new_tool(callback: CallbackQuery, state: FSMContext):
     """Save the new tool to database"""
     data = await state.get_data()
+    key = f"tool:{data.get('flow_id') or callback.id}"
     
-    async with async_session() as session:
+    async def write(session: AsyncSession) -> Tool:
         tool = Tool(
             name=data['name'],
             description=data['description'],
@@ -153,14 +171,20 @@ async def save_new_tool(callback: CallbackQuery, state: FSMContext):
             available=True
         )
         session.add(tool)
-        await session.commit()
-        await session.refresh(tool)
-        
-        await callback.message.edit_text(
-            f"✅ Tool '<b>{tool.name}</b>' has been added successfully!\n"
-            f"Tool ID: #{tool.id}"
-        )
-        
+        return tool
+    
+    try:
+        tool = await idempotency.submit(key, write)
+    except DuplicateSubmission:
+        await callback.answer("This tool was already saved.")
+        return
+    catalog_cache.invalidate()
+    
+    await callback.message.edit_text(
+        f"✅ Tool '<b>{tool.name}</b>' has been added successfully!\n"
+        f"Tool ID: #{tool.id}"
+    )
+    
     await state.clear()
     await callback.answer("Tool added!")
     
@@ -187,68 +211,358 @@ async def cancel_add_tool(callback: CallbackQuery, state: FSMContext):
 @router.message(Command("listtools"))
 @router.callback_query(F.data == "list_tools")
 async def list_owner_tools(update: Message | CallbackQuery):
-    """List all tools for owner"""
-    async with async_session() as session:
-        result = await session.execute(select(Tool).order_by(Tool.id))
-        tools = result.scalars().all()
-        
-        if not tools:
-            text = "📭 No tools in the catalog yet.\n\nUse /addtool to add your first tool!"
-        else:
-            text = "📋 <b>Your Tools Catalog:</b>\n\n"
-            for tool in tools:
-                status = "✅ Available" if tool.available else "❌ Unavailable"
-                text += (
-                    f"<b>#{tool.id} - {tool.name}</b>\n"
-                    f"Price: ${tool.price_per_day}/day\n"
-                    f"Status: {status}\n"
-                    f"Photos: {len(tool.image_ids)}\n\n"
-                )
-        
-        if isinstance(update, CallbackQuery):
-            await update.message.answer(text)
-            await update.answer()
+    """List all tools for owner (split into several messages for a large catalog)"""
+    blocks = [
+        f"<b>#{tool.id} - {tool.name}</b>\n"
+        f"Price: ${tool.price_per_day}/day\n"
+        f"Status: {'✅ Available' if tool.available else '❌ Unavailable'}\n"
+        f"Photos: {tool.photo_count}\n"
+        for tool in await load_owner_tools()
+    ]
+    
+    if blocks:
+        chunks = chunk_blocks(blocks, header="📋 <b>Your Tools Catalog:</b>\n")
+    else:
+        chunks = ["📭 No tools in the catalog yet.\n\nUse /addtool to add your first tool!"]
+    
+    message = update.message if isinstance(update, CallbackQuery) else update
+    await answer_chunks(message, chunks)
+    if isinstance(update, CallbackQuery):
+        await update.answer()
+
+# === TOOL PICKER ===
+TOOL_PICKER_TITLES = {
+    'delete_tool': "Select a tool to delete:",
+    'tool_detail': "Select a tool to edit:",
+}
+
+async def show_tool_picker(update: Message | CallbackQuery, action: str, page: int = 0):
+    """Paged tool selection keyboard; navigation edits it in place"""
+    per_page = config.TOOLS_PER_PAGE * 2
+    total, tools = await load_tool_page(page * per_page, per_page)
+    
+    if not total:
+        text, keyboard = "No tools in the catalog yet.", None
+    else:
+        text = TOOL_PICKER_TITLES[action]
+        keyboard = InlineKeyboards.tool_picker(tools, action, page, math.ceil(total / per_page))
+    
+    if isinstance(update, CallbackQuery):
+        if update.data.startswith("tool_pick:"):
+            await update.message.edit_text(text, reply_markup=keyboard)
         else:
-            await update.answer(text)
+            await update.message.answer(text, reply_markup=keyboard)
+        await update.answer()
+    else:
+        await update.answer(text, reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("tool_pick:"))
+async def page_tool_picker(callback: CallbackQuery):
+    _, action, page = callback.data.split(":")
+    if action not in TOOL_PICKER_TITLES:
+        await callback.answer()
+        return
+    await show_tool_picker(callback, action, int(page))
 
-# === VIEW BOOKINGS ===
+# === BOOKING CONSOLE ===
+def render_booking_console(view: ConsoleView, page: ConsolePage) -> str:
+    """Console text from the page's row tuples"""
+    filters = [CONSOLE_PERIODS[view.period][0]]
+    if page.tool_name:
+        filters.insert(0, page.tool_name)
+    status = CONSOLE_STATUSES[view.status]
+    if status is not None:
+        filters.insert(0, status.value.capitalize())
+    
+    text = f"📊 <b>Bookings</b> ({', '.join(filters)})\n\n"
+    if not page.rows:
+        return text + "📭 No bookings match these filters."
+    
+    for booking_id, status, start_date, end_date, total_price, fullname, tool_name in page.rows:
+        text += (
+            f"{STATUS_EMOJI.get(status, '❓')} <b>#{booking_id}</b> {tool_name}\n"
+            f"{fullname or 'Unknown'} · {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} · ${total_price:.2f}\n\n"
+        )
+    return text
+
+@router.message(Command("bookings"))
 @router.callback_query(F.data == "view_bookings")
-async def view_all_bookings(callback: CallbackQuery):
-    """View all bookings"""
-    async with async_session() as session:
-        result = await session.execute(
-            select(Booking)
-            .options(selectinload(Booking.tool))
-            .order_by(Booking.created_at.desc())
-            .limit(20)
+@router.callback_query(F.data.startswith("bk:"))
+async def view_booking_console(update: Message | CallbackQuery):
+    """Filtered, paginated bookings list; the view lives in the callback data"""
+    view = ConsoleView.parse(update.data) if isinstance(update, CallbackQuery) else ConsoleView()
+    page = await load_console_page(view)
+    
+    text = render_booking_console(view, page)
+    keyboard = InlineKeyboards.booking_console(view, page)
+    
+    if isinstance(update, CallbackQuery):
+        # The owner menu button opens a new console; console buttons update it in place
+        if update.data == "view_bookings":
+            await update.message.answer(text, reply_markup=keyboard)
+        else:
+            await update.message.edit_text(text, reply_markup=keyboard)
+        await update.answer()
+    else:
+        await update.answer(text, reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("bkt:"))
+async def pick_console_tool(callback: CallbackQuery):
+    """Tool filter of the booking console"""
+    view = ConsoleView.parse(callback.data)
+    page = int(callback.data.rsplit(":", 1)[1])
+    per_page = config.TOOLS_PER_PAGE * 2
+    
+    total, tools = await load_tool_page(page * per_page, per_page)
+    total_pages = max(1, math.ceil(total / per_page))
+    
+    await callback.message.edit_text(
+        "🛠 <b>Show bookings for:</b>",
+        reply_markup=InlineKeyboards.booking_console_tools(view, tools, page, total_pages)
+    )
+    await callback.answer()
+
+# === BOOKING DECISIONS ===
+async def apply_decision(
+    booking_ids: List[int],
+    confirm: bool,
+    outbox: OutboxDispatcher,
+    scheduler: BookingScheduler
+) -> DecisionResult:
+    """Decide bookings, then wake the outbox and schedule the confirmed bookings' reminders"""
+    result = await decide_bookings(booking_ids, confirm)
+    if result.changed:
+        outbox.wake()
+    if confirm:
+        for row in result.decided:
+            scheduler.schedule_booking(row)
+    return result
+
+def describe_decision(result: DecisionResult, requested: int, confirm: bool) -> str:
+    text = f"{'✅ Confirmed' if confirm else '❌ Rejected'} {len(result.decided)}"
+    gone = requested - len(result.decided) - len(result.conflicting)
+    if gone:
+        text += f" ({gone} no longer pending)"
+    if result.conflicting:
+        text += f", rejected {len(result.conflicting)} overlapping a confirmed booking"
+    if result.overlapping:
+        text += f", auto-rejected {len(result.overlapping)} overlapping"
+    return text
+
+@router.callback_query(F.data.startswith("confirm_booking:"))
+@router.callback_query(F.data.startswith("reject_booking:"))
+async def decide_booking(callback: CallbackQuery, outbox: OutboxDispatcher, scheduler: BookingScheduler):
+    """Confirm or reject one booking from its notification"""
+    action, booking_id = callback.data.split(":")
+    confirm = action == "confirm_booking"
+    result = await apply_decision([int(booking_id)], confirm, outbox, scheduler)
+    
+    if not result.decided and not result.conflicting:
+        await callback.answer("This booking is no longer pending.", show_alert=True)
+        return
+    
+    await callback.message.edit_text(
+        f"{callback.message.html_text}\n\n<b>{describe_decision(result, 1, confirm)}</b>",
+        reply_markup=InlineKeyboards.booking_actions((result.decided or result.conflicting)[0], is_owner=True)
+    )
+    if result.conflicting:
+        await callback.answer("The tool is already booked for these dates - the request was rejected.", show_alert=True)
+    else:
+        await callback.answer("Booking confirmed!" if confirm else "Booking rejected.")
+
+async def show_triage_page(callback: CallbackQuery, state: FSMContext, notice: str = ""):
+    """Render the bulk triage page stored in the FSM data"""
+    data = await state.get_data()
+    view = ConsoleView.parse(data['triage_view'])
+    selected = set(data.get('triage_selected', []))
+    page = await load_console_page(view, with_counts=False)
+    
+    text = (
+        f"☑️ <b>Bulk Confirm / Reject</b> - {len(selected)} selected\n\n"
+        "Tap pending bookings to select them, then confirm or reject them all at once."
+    )
+    if notice:
+        text += f"\n\n<b>{notice}</b>"
+    await callback.message.edit_text(text, reply_markup=InlineKeyboards.booking_triage(view, page, selected))
+
+@router.callback_query(F.data.startswith("tri:"))
+async def start_triage(callback: CallbackQuery, state: FSMContext):
+    """Open or page the bulk triage view (the selection survives paging)"""
+    view = replace(ConsoleView.parse(callback.data), status='p')
+    if await state.get_state() != TriageStates.selecting:
+        await state.set_data({'triage_selected': []})
+        await state.set_state(TriageStates.selecting)
+    await state.update_data(triage_view=view.pack('tri'))
+    await show_triage_page(callback, state)
+    await callback.answer()
+
+@router.callback_query(TriageStates.selecting, F.data.startswith("tri_toggle:"))
+async def toggle_triage_booking(callback: CallbackQuery, state: FSMContext):
+    booking_id = int(callback.data.split(":")[1])
+    selected = set((await state.get_data()).get('triage_selected', []))
+    selected ^= {booking_id}
+    await state.update_data(triage_selected=sorted(selected))
+    await show_triage_page(callback, state)
+    await callback.answer()
+
+@router.callback_query(TriageStates.selecting, F.data.startswith("tri_page:"))
+async def select_triage_page(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    selected = set(data.get('triage_selected', []))
+    page = await load_console_page(ConsoleView.parse(data['triage_view']), with_counts=False)
+    page_ids = {row[0] for row in page.rows}
+    if callback.data.endswith(":select"):
+        selected |= page_ids
+    else:
+        selected -= page_ids
+    await state.update_data(triage_selected=sorted(selected))
+    await show_triage_page(callback, state)
+    await callback.answer()
+
+@router.callback_query(TriageStates.selecting, F.data.startswith("tri_decide:"))
+async def decide_triage(
+    callback: CallbackQuery,
+    state: FSMContext,
+    outbox: OutboxDispatcher,
+    scheduler: BookingScheduler
+):
+    """Confirm or reject every selected booking in one transaction"""
+    confirm = callback.data.endswith(":confirm")
+    selected = (await state.get_data()).get('triage_selected', [])
+    result = await apply_decision(selected, confirm, outbox, scheduler)
+    
+    await state.update_data(triage_selected=[])
+    await show_triage_page(callback, state, notice=describe_decision(result, len(selected), confirm))
+    await callback.answer()
+
+# === INBOX ===
+THREAD_PREVIEW_LENGTH = 300
+
+@router.message(Command("inbox"))
+@router.callback_query(F.data.startswith("inbox:"))
+async def show_inbox(update: Message | CallbackQuery):
+    """Customer conversations by latest activity"""
+    cursor = update.data.split(":", 1)[1] if isinstance(update, CallbackQuery) else ""
+    page = await load_inbox(parse_inbox_cursor(cursor))
+    
+    if page.rows:
+        text = f"📥 <b>Inbox</b> - {page.total_unread} unread"
+    else:
+        text = "📭 No customer messages yet."
+    keyboard = InlineKeyboards.inbox(page, is_first_page=not cursor)
+    
+    if isinstance(update, CallbackQuery):
+        await update.message.edit_text(text, reply_markup=keyboard)
+        await update.answer()
+    else:
+        await update.answer(text, reply_markup=keyboard)
+
+def render_thread(user_id: int, page: ThreadPage) -> str:
+    """Thread text from the page's row tuples (long messages are shortened)"""
+    conversation = page.conversation
+    name = escape(conversation.user_fullname or '') if conversation else ''
+    username = f" @{conversation.user_username}" if conversation and conversation.user_username else ""
+    header = f"💬 <b>{name or f'Customer {user_id}'}</b>{username}"
+    if conversation:
+        header += f" · {conversation.message_count} messages"
+    
+    blocks = [header]
+    for _, timestamp, is_from_owner, text, booking_id in page.rows:
+        if len(text) > THREAD_PREVIEW_LENGTH:
+            text = text[:THREAD_PREVIEW_LENGTH] + "…"
+        about = f" · booking #{booking_id}" if booking_id else ""
+        blocks.append(
+            f"{'🛠 <b>You</b>' if is_from_owner else '👤 <b>Customer</b>'} "
+            f"<i>{timestamp:%Y-%m-%d %H:%M}{about}</i>\n{escape(text)}"
         )
-        bookings = result.scalars().all()
-        
-        if not bookings:
-            await callback.message.answer("📭 No bookings yet.")
-            await callback.answer()
+    return "\n\n".join(blocks)
+
+@router.callback_query(F.data.startswith("thread:"))
+async def show_thread(callback: CallbackQuery):
+    """One page of a customer thread; opening it marks the thread read"""
+    _, user_id, cursor = callback.data.split(":")
+    user_id = int(user_id)
+    page = await load_thread(user_id, int(cursor) if cursor else None)
+    
+    await callback.message.edit_text(
+        render_thread(user_id, page),
+        reply_markup=InlineKeyboards.conversation(user_id, page, is_first_page=not cursor)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("reply_thread:"))
+@router.callback_query(F.data.startswith("reply_customer:"))
+async def start_reply(callback: CallbackQuery, state: FSMContext):
+    """Reply to a customer from their thread, or about one of their bookings"""
+    action, target = callback.data.split(":")
+    user_id, booking_id = int(target), None
+    if action == "reply_customer":
+        async with async_session() as session:
+            booking_id, user_id = (await session.execute(
+                select(Booking.id, Booking.user_id).where(Booking.id == int(target))
+            )).first() or (None, None)
+        if user_id is None:
+            await callback.answer("Booking not found!", show_alert=True)
             return
-        
-        text = "📊 <b>Recent Bookings:</b>\n\n"
-        for booking in bookings:
-            status_emoji = {
-                BookingStatus.PENDING: "⏳",
-                BookingStatus.CONFIRMED: "✅",
-                BookingStatus.CANCELLED: "❌",
-                BookingStatus.COMPLETED: "✔️"
-            }
-            
-            text += (
-                f"{status_emoji.get(booking.status, '❓')} <b>Booking #{booking.id}</b>\n"
-                f"Tool: {booking.tool.name}\n"
-                f"Customer: {booking.user_fullname or 'Unknown'}\n"
-                f"Dates: {booking.start_date.strftime('%Y-%m-%d')} to {booking.end_date.strftime('%Y-%m-%d')}\n"
-                f"Total: ${booking.total_price:.2f}\n"
-                f"Status: {booking.status.value}\n\n"
-            )
-        
-        await callback.message.answer(text)
-        await callback.answer()
+    
+    await state.set_data({'reply_user_id': user_id, 'reply_booking_id': booking_id})
+    await state.set_state(MessageStates.replying_to_user)
+    about = f" about booking #{booking_id}" if booking_id else ""
+    await callback.message.answer(
+        f"✍️ Type your reply to the customer{about}, or send /cancel to cancel:"
+    )
+    await callback.answer()
+
+async def deliver_reply(message: Message, outbox: OutboxDispatcher, user_id: int, booking_id: Optional[int]) -> bool:
+    """Store the owner's reply in the thread and queue it for the customer; False for a redelivery"""
+    about = f" (booking #{booking_id})" if booking_id else ""
+    # A redelivered update has the same message id
+    key = f"reply:{message.bot.id}:{message.chat.id}:{message.message_id}"
+    
+    async def write(session: AsyncSession):
+        await record_message(session, user_id, message.text, is_from_owner=True, booking_id=booking_id)
+        enqueue_notification(
+            session,
+            user_id,
+            f"💬 <b>Reply from the owner{about}:</b>\n\n{escape(message.text)}",
+            reply_markup=InlineKeyboards.owner_reply()
+        )
+    
+    try:
+        await idempotency.submit(key, write)
+    except DuplicateSubmission:
+        return False
+    
+    outbox.wake()
+    await message.answer(
+        "✅ Reply sent!",
+        reply_markup=InlineKeyboards.conversation(user_id)
+    )
+    return True
+
+@router.message(MessageStates.replying_to_user, F.text)
+async def send_reply(message: Message, state: FSMContext, outbox: OutboxDispatcher):
+    """Reply typed after tapping a Reply button"""
+    if message.text == "/cancel":
+        await message.answer("❌ Reply cancelled.")
+        await state.clear()
+        return
+    
+    data = await state.get_data()
+    if await deliver_reply(message, outbox, data['reply_user_id'], data.get('reply_booking_id')):
+        await state.clear()
+
+@router.message(StateFilter(None), F.reply_to_message, F.text, ~F.text.startswith("/"))
+async def send_routed_reply(message: Message, outbox: OutboxDispatcher):
+    """Telegram Reply to a customer message or booking notification"""
+    route = await reply_router.resolve(message.bot.id, message.chat.id, message.reply_to_message.message_id)
+    if route is None:
+        await message.answer(
+            "↩️ Only replies to customer messages and booking notifications reach a customer.\n"
+            "Use /inbox to pick a conversation."
+        )
+        return
+    await deliver_reply(message, outbox, *route)
 
 # === STATISTICS ===
 @router.callback_query(F.data == "stats")
@@ -312,72 +626,86 @@ async def show_statistics(callback: CallbackQuery):
         await callback.message.answer(text)
         await callback.answer()
 
+# === EXPORT ===
+EXPORT_USAGE = (
+    "Usage: /export [csv|xlsx] [from YYYY-MM-DD] [to YYYY-MM-DD] [status]\n"
+    "Example: /export xlsx 2024-01-01 2024-03-31 completed\n\n"
+    f"Statuses: {', '.join(status.value for status in BookingStatus)}"
+)
+
+@router.message(Command("export"))
+async def export_bookings_file(message: Message, command: CommandObject):
+    """Send the bookings (filtered by start date and status) as a compressed file"""
+    fmt, dates, status = 'csv', [], None
+    statuses = {status.value: status for status in BookingStatus}
+    try:
+        for arg in (command.args or '').lower().split():
+            if arg in EXPORT_FORMATS:
+                fmt = arg
+            elif arg in statuses:
+                status = statuses[arg]
+            else:
+                dates.append(datetime.strptime(arg, '%Y-%m-%d').date())
+        if len(dates) > 2:
+            raise ValueError(arg)
+    except ValueError:
+        await message.answer(EXPORT_USAGE)
+        return
+    start, end = (dates + [None, None])[:2]
+    
+    await message.bot.send_chat_action(message.chat.id, 'upload_document')
+    result = await export_bookings(fmt, start, end, status)
+    try:
+        await message.answer_document(
+            FSInputFile(result.path, filename=result.filename),
+            caption=f"📤 {result.rows} bookings\n💰 Revenue (confirmed + completed): ${result.revenue:.2f}"
+        )
+    finally:
+        os.remove(result.path)
+
 # === TOGGLE AVAILABILITY ===
 @router.callback_query(F.data.startswith("toggle_availability:"))
 async def toggle_tool_availability(callback: CallbackQuery):
     """Toggle tool availability"""
     tool_id = int(callback.data.split(":")[1])
     
-    async with async_session() as session:
+    async def write(session: AsyncSession) -> Optional[Tool]:
         tool = await session.get(Tool, tool_id)
-        if not tool:
-            await callback.answer("Tool not found!", show_alert=True)
-            return
-        
-        tool.available = not tool.available
-        await session.commit()
-        
-        status = "available" if tool.available else "unavailable"
-        await callback.answer(f"Tool marked as {status}!")
-        
-        # Refresh the tool details
-        await callback.message.edit_reply_markup(
-            reply_markup=InlineKeyboards.tool_details(tool, is_owner=True)
-        )
+        if tool:
+            tool.available = not tool.available
+        return tool
+    
+    tool = await writer.submit(write)
+    if not tool:
+        await callback.answer("Tool not found!", show_alert=True)
+        return
+    catalog_cache.invalidate()
+    
+    status = "available" if tool.available else "unavailable"
+    await callback.answer(f"Tool marked as {status}!")
+    
+    # Refresh the tool details
+    await callback.message.edit_reply_markup(
+        reply_markup=InlineKeyboards.tool_details(tool, is_owner=True)
+    )
 
 # === DELETE TOOL ===
 @router.message(Command("deltool"))
 @router.callback_query(F.data == "delete_tool")
 async def start_delete_tool(update: Message | CallbackQuery, state: FSMContext):
     """Start tool deletion process"""
-    async with async_session() as session:
-        result = await session.execute(select(Tool).order_by(Tool.id))
-        tools = result.scalars().all()
-        
-        if not tools:
-            text = "No tools to delete."
-            if isinstance(update, CallbackQuery):
-                await update.message.answer(text)
-                await update.answer()
-            else:
-                await update.answer(text)
-            return
-        
-        text = "Select a tool to delete:\n\n"
-        for tool in tools:
-            text += f"/del_{tool.id} - {tool.name}\n"
-        
-        if isinstance(update, CallbackQuery):
-            await update.message.answer(text)
-            await update.answer()
-        else:
-            await update.answer(text)
-        
-        await state.set_state(DeleteToolStates.selecting_tool)
+    await state.clear()
+    await show_tool_picker(update, "delete_tool")
 
-@router.message(DeleteToolStates.selecting_tool, F.text.startswith("/del_"))
-async def confirm_delete_tool(message: Message, state: FSMContext):
+@router.callback_query(F.data.startswith("delete_tool:"))
+async def confirm_delete_tool(callback: CallbackQuery, state: FSMContext):
     """Confirm tool deletion"""
-    try:
-        tool_id = int(message.text.split("_")[1])
-    except (IndexError, ValueError):
-        await message.answer("Invalid tool ID. Please try again.")
-        return
+    tool_id = int(callback.data.split(":")[1])
     
     async with async_session() as session:
         tool = await session.get(Tool, tool_id)
         if not tool:
-            await message.answer("Tool not found.")
+            await callback.answer("Tool not found!", show_alert=True)
             return
         
         # Check for active bookings
@@ -393,14 +721,15 @@ async def confirm_delete_tool(message: Message, state: FSMContext):
         if active_bookings > 0:
             warning = f"\n\n⚠️ WARNING: This tool has {active_bookings} active bookings!"
         
-        await state.update_data(tool_id=tool_id)
-        await message.answer(
+        await state.set_data({'tool_id': tool_id})
+        await callback.message.answer(
             f"Are you sure you want to delete:\n\n"
             f"<b>{tool.name}</b>\n"
             f"Price: ${tool.price_per_day}/day{warning}",
             reply_markup=InlineKeyboards.confirm_delete()
         )
         await state.set_state(DeleteToolStates.confirming)
+        await callback.answer()
 
 @router.callback_query(DeleteToolStates.confirming, F.data == "confirm_delete")
 async def execute_delete_tool(callback: CallbackQuery, state: FSMContext):
@@ -408,16 +737,19 @@ async def execute_delete_tool(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     tool_id = data.get('tool_id')
     
-    async with async_session() as session:
+    async def write(session: AsyncSession) -> Optional[str]:
         tool = await session.get(Tool, tool_id)
-        if tool:
-            tool_name = tool.name
-            await session.delete(tool)
-            await session.commit()
-            
-            await callback.message.edit_text(f"✅ Tool '{tool_name}' has been deleted.")
-        else:
-            await callback.message.edit_text("❌ Tool not found.")
+        if not tool:
+            return None
+        await session.delete(tool)
+        return tool.name
+    
+    tool_name = await writer.submit(write)
+    if tool_name:
+        catalog_cache.invalidate()
+        await callback.message.edit_text(f"✅ Tool '{tool_name}' has been deleted.")
+    else:
+        await callback.message.edit_text("❌ Tool not found.")
     
     await state.clear()
     await callback.answer("Tool deleted!")
@@ -433,28 +765,6 @@ async def cancel_delete_tool(callback: CallbackQuery, state: FSMContext):
 @router.message(Command("edittool"))
 @router.callback_query(F.data == "edit_tool")
 async def start_edit_tool(update: Message | CallbackQuery, state: FSMContext):
-    """Start tool editing process"""
-    async with async_session() as session:
-        result = await session.execute(select(Tool).order_by(Tool.id))
-        tools = result.scalars().all()
-        
-        if not tools:
-            text = "No tools to edit."
-            if isinstance(update, CallbackQuery):
-                await update.message.answer(text)
-                await update.answer()
-            else:
-                await update.answer(text)
-            return
-        
-        text = "Select a tool to edit:\n\n"
-        for tool in tools:
-            text += f"/edit_{tool.id} - {tool.name}\n"
-        
-        if isinstance(update, CallbackQuery):
-            await update.message.answer(text)
-            await update.answer()
-        else:
-            await update.answer(text)
-        
-        await state.set_state(EditToolStates.selecting_tool)
\ No newline at end of file
+    """Start tool editing process (picking a tool opens its owner card)"""
+    await state.clear()
+    await show_tool_picker(update, "tool_detail")
@@ -3,21 +3,24 @@ User handlers for browsing and booking tools - COMPLETE VERSION
 """
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InputMediaPhoto
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func
-from sqlalchemy.orm import selectinload
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import math
 
 from config import config
 from db import async_session
-from models import Tool, Booking, BookingStatus, Message as DBMessage
+from models import Booking, BookingStatus
 from bot.states import BookingStates, MessageStates, BrowsingStates
-from bot.keyboards.inline import InlineKeyboards
+from bot.keyboards.inline import InlineKeyboards, STATUS_EMOJI
 from bot.keyboards.calendar import CalendarKeyboard
+from bot.services import (
+    OutboxDispatcher, BookingScheduler, enqueue_notification, catalog_cache,
+    DuplicateSubmission, idempotency, new_flow_id, record_message, load_catalog_page, load_user_bookings,
+    get_tool
+)
 
 logger = logging.getLogger(__name__)
 router = Router(name="user")
@@ -35,43 +38,33 @@ async def browse_tools(update: Message | CallbackQuery, state: FSMContext):
     if isinstance(update, CallbackQuery) and update.data.startswith("tools_page:"):
         page = int(update.data.split(":")[1])
     
-    async with async_session() as session:
-        # Count total tools
-        total_count = await session.scalar(
-            select(func.count(Tool.id)).where(Tool.available == True)
-        )
-        
-        if total_count == 0:
-            text = "😔 No tools available for rent at the moment.\n\nPlease check back later!"
-            if isinstance(update, CallbackQuery):
-                await update.message.edit_text(text)
-                await update.answer()
-            else:
-                await update.answer(text)
-            return
-        
-        # Calculate pagination
-        total_pages = math.ceil(total_count / config.TOOLS_PER_PAGE)
-        offset = (page - 1) * config.TOOLS_PER_PAGE
-        
-        # Get tools for current page
-        result = await session.execute(
-            select(Tool)
-            .where(Tool.available == True)
-            .order_by(Tool.id)
-            .offset(offset)
-            .limit(config.TOOLS_PER_PAGE)
-        )
-        tools = result.scalars().all()
-        
-        text = "🛠 <b>Available Tools:</b>\n\nSelect a tool to view details:"
-        keyboard = InlineKeyboards.tools_list(tools, page, total_pages)
-        
+    # Pages are cached per shop; owner changes to tools invalidate them
+    cached = catalog_cache.get(page)
+    if cached is None:
+        cached = await load_catalog_page(page, config.TOOLS_PER_PAGE)
+        catalog_cache.set(page, cached)
+    total_count, tools = cached
+    
+    if total_count == 0:
+        text = "😔 No tools available for rent at the moment.\n\nPlease check back later!"
         if isinstance(update, CallbackQuery):
-            await update.message.edit_text(text, reply_markup=keyboard)
+            await update.message.edit_text(text)
             await update.answer()
         else:
-            await update.answer(text, reply_markup=keyboard)
+            await update.answer(text)
+        return
+    
+    # Calculate pagination
+    total_pages = math.ceil(total_count / config.TOOLS_PER_PAGE)
+    
+    text = "🛠 <b>Available Tools:</b>\n\nSelect a tool to view details:"
+    keyboard = InlineKeyboards.tools_list(tools, page, total_pages)
+    
+    if isinstance(update, CallbackQuery):
+        await update.message.edit_text(text, reply_markup=keyboard)
+        await update.answer()
+    else:
+        await update.answer(text, reply_markup=keyboard)
 
 # === VIEW TOOL DETAILS ===
 @router.callback_query(F.data.startswith("tool_detail:"))
@@ -80,7 +73,7 @@ async def view_tool_details(callback: CallbackQuery, state: FSMContext):
     tool_id = int(callback.data.split(":")[1])
     
     async with async_session() as session:
-        tool = await session.get(Tool, tool_id)
+        tool = await get_tool(session, tool_id)
         if not tool:
             await callback.answer("Tool not found!", show_alert=True)
             return
@@ -138,12 +131,13 @@ async def start_booking(callback: CallbackQuery, state: FSMContext):
     tool_id = int(callback.data.split(":")[1])
     
     async with async_session() as session:
-        tool = await session.get(Tool, tool_id)
+        tool = await get_tool(session, tool_id)
         if not tool or not tool.available:
             await callback.answer("This tool is not available!", show_alert=True)
             return
         
         await state.update_data(
+            flow_id=new_flow_id(),  # idempotency key of the booking submission
             tool_id=tool_id,
             tool_name=tool.name,
             tool_price=tool.price_per_day
@@ -345,12 +339,19 @@ async def show_booking_confirmation(message: Message, state: FSMContext):
 
 # === CONFIRM BOOKING ===
 @router.callback_query(BookingStates.confirming, F.data == "confirm_booking")
-async def confirm_booking(callback: CallbackQuery, state: FSMContext):
+async def confirm_booking(
+    callback: CallbackQuery,
+    state: FSMContext,
+    outbox: OutboxDispatcher,
+    scheduler: BookingScheduler
+):
     """Confirm and save booking"""
     data = await state.get_data()
     user = callback.from_user
+    # Double taps and redelivered updates carry the same flow id
+    key = f"booking:{data.get('flow_id') or callback.id}"
     
-    async with async_session() as session:
+    async def write(session: AsyncSession) -> Booking:
         # Create booking
         booking = Booking(
             user_id=user.id,
@@ -369,18 +370,16 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
         
         # Add user message if provided
         if data.get('user_message'):
-            message = DBMessage(
-                user_id=user.id,
+            await record_message(
+                session,
+                user.id,
+                data['user_message'],
                 booking_id=booking.id,
-                text=data['user_message'],
-                is_from_owner=False
+                user_fullname=user.full_name,
+                user_username=user.username
             )
-            session.add(message)
         
-        await session.commit()
-        
-        # Notify owner
-        bot = callback.bot
+        # Notify owner (delivered by the outbox after commit)
         owner_text = (
             f"🔔 <b>New Booking Request!</b>\n\n"
             f"Tool: <b>{data['tool_name']}</b>\n"
@@ -398,14 +397,23 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
         if data.get('user_message'):
             owner_text += f"\n\n💬 Message: {data['user_message']}"
         
-        try:
-            await bot.send_message(
-                config.OWNER_ID,
-                owner_text,
-                reply_markup=InlineKeyboards.booking_actions(booking, is_owner=True)
-            )
-        except Exception as e:
-            logger.error(f"Failed to notify owner: {e}")
+        enqueue_notification(
+            session,
+            config.owner_id(),
+            owner_text,
+            reply_markup=InlineKeyboards.booking_actions(booking, is_owner=True),
+            route=(user.id, booking.id)
+        )
+        return booking
+    
+    try:
+        booking = await idempotency.submit(key, write)
+    except DuplicateSubmission:
+        await callback.answer("This booking was already submitted.")
+        return
+    
+    outbox.wake()
+    scheduler.schedule_booking(booking)
     
     await callback.message.edit_text(
         "✅ <b>Booking confirmed!</b>\n\n"
@@ -424,55 +432,62 @@ async def cancel_booking_creation(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
+@router.callback_query(StateFilter(None), F.data.in_({"confirm_booking", "cancel_booking"}))
+async def booking_already_finished(callback: CallbackQuery):
+    """
+    Summary button tapped after the flow ended: a second tap after the booking
+    was submitted or cancelled, or a tap after the state expired
+
+    The message may already show the outcome ("Booking confirmed! #N"), so it
+    is left as it is.
+    """
+    await callback.answer(
+        "This booking was already submitted or its session has expired. See /mybookings for your bookings.",
+        show_alert=True
+    )
+
+@router.callback_query(StateFilter(None), F.data.startswith(("calendar", "delivery_")))
+async def booking_session_expired(callback: CallbackQuery):
+    """Booking flow button tapped after the flow's state expired (see BoundedMemoryStorage)"""
+    await callback.message.edit_text(
+        "⌛ <b>This booking session has expired.</b>\n\n"
+        "Please choose the tool again to start a new booking.",
+        reply_markup=InlineKeyboards.main_menu()
+    )
+    await callback.answer("Session expired")
+
 # === MY BOOKINGS ===
 @router.message(Command("mybookings"))
 @router.callback_query(F.data == "my_bookings")
 async def show_my_bookings(update: Message | CallbackQuery):
     """Show user's bookings"""
-    user_id = update.from_user.id
+    bookings = await load_user_bookings(update.from_user.id)
     
-    async with async_session() as session:
-        result = await session.execute(
-            select(Booking)
-            .options(selectinload(Booking.tool))
-            .where(Booking.user_id == user_id)
-            .order_by(Booking.created_at.desc())
-            .limit(10)
-        )
-        bookings = result.scalars().all()
-        
-        if not bookings:
-            text = "📭 You don't have any bookings yet.\n\nBrowse our tools catalog to make your first booking!"
-            if isinstance(update, CallbackQuery):
-                await update.message.answer(text)
-                await update.answer()
-            else:
-                await update.answer(text)
-            return
-        
-        text = "📅 <b>Your Bookings:</b>\n\n"
-        for booking in bookings:
-            status_emoji = {
-                BookingStatus.PENDING: "⏳",
-                BookingStatus.CONFIRMED: "✅",
-                BookingStatus.CANCELLED: "❌",
-                BookingStatus.COMPLETED: "✔️"
-            }
-            
-            text += (
-                f"{status_emoji.get(booking.status, '❓')} <b>Booking #{booking.id}</b>\n"
-                f"Tool: {booking.tool.name}\n"
-                f"Dates: {booking.start_date.strftime('%b %d')} - {booking.end_date.strftime('%b %d, %Y')}\n"
-                f"Status: {booking.status.value}\n"
-                f"Total: ${booking.total_price:.2f}\n"
-                f"/booking_{booking.id} - View details\n\n"
-            )
-        
+    if not bookings:
+        text = "📭 You don't have any bookings yet.\n\nBrowse our tools catalog to make your first booking!"
         if isinstance(update, CallbackQuery):
             await update.message.answer(text)
             await update.answer()
         else:
             await update.answer(text)
+        return
+    
+    text = "📅 <b>Your Bookings:</b>\n\n"
+    for booking in bookings:
+        text += (
+            f"{STATUS_EMOJI.get(booking.status, '❓')} <b>Booking #{booking.id}</b>\n"
+            f"Tool: {booking.tool_name}\n"
+            f"Dates: {booking.start_date.strftime('%b %d')} - {booking.end_date.strftime('%b %d, %Y')}\n"
+            f"Status: {booking.status.value}\n"
+            f"Total: ${booking.total_price:.2f}\n"
+            f"/booking_{booking.id} - View details\n\n"
+        )
+    
+    if isinstance(update, CallbackQuery):
+        await update.message.answer(text)
+        await update.answer()
+    else:
+        await update.answer(text)
 
 # === CONTACT OWNER ===
 @router.message(Command("contact"))
@@ -493,24 +508,14 @@ async def start_contact_owner(update: Message | CallbackQuery, state: FSMContext
     await state.set_state(MessageStates.writing_message)
 
 @router.message(MessageStates.writing_message)
-async def send_message_to_owner(message: Message, state: FSMContext):
+async def send_message_to_owner(message: Message, state: FSMContext, outbox: OutboxDispatcher):
     """Send message to owner"""
     if message.text == "/cancel":
         await message.answer("❌ Message cancelled.")
         await state.clear()
         return
     
-    # Save message to database
-    async with async_session() as session:
-        db_message = DBMessage(
-            user_id=message.from_user.id,
-            text=message.text,
-            is_from_owner=False
-        )
-        session.add(db_message)
-        await session.commit()
-    
-    # Send to owner
+    # Save message and owner notification in one transaction
     user = message.from_user
     owner_text = (
         f"💬 <b>New message from customer:</b>\n\n"
@@ -519,14 +524,34 @@ async def send_message_to_owner(message: Message, state: FSMContext):
         f"Message:\n{message.text}"
     )
     
-    try:
-        await message.bot.send_message(config.OWNER_ID, owner_text)
-        await message.answer(
-            "✅ Your message has been sent to the owner!\n\n"
-            "You'll receive a notification when they reply."
+    # A redelivered update has the same message id
+    key = f"message:{message.bot.id}:{message.chat.id}:{message.message_id}"
+    
+    async def write(session: AsyncSession):
+        await record_message(
+            session,
+            user.id,
+            message.text,
+            user_fullname=user.full_name,
+            user_username=user.username
         )
-    except Exception as e:
-        logger.error(f"Failed to send message to owner: {e}")
-        await message.answer("❌ Failed to send message. Please try again later.")
+        enqueue_notification(
+            session,
+            config.owner_id(),
+            owner_text,
+            reply_markup=InlineKeyboards.conversation(user.id),
+            route=(user.id, None)
+        )
+    
+    try:
+        await idempotency.submit(key, write)
+    except DuplicateSubmission:
+        return
     
+    outbox.wake()
+    
+    await message.answer(
+        "✅ Your message has been sent to the owner!\n\n"
+        "You'll receive a notification when they reply."
+    )
     await state.clear()
\ No newline at end of file
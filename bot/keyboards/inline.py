@@ -3,8 +3,18 @@ Inline keyboards for ToolBot
 """
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List, Optional
+from typing import List, Optional, Sequence, Set, Tuple
 from models import Tool, Booking, BookingStatus
+from bot.services.booking_console import CONSOLE_PERIODS, CONSOLE_STATUSES, ConsolePage, ConsoleView
+from bot.services.inbox import InboxPage, ThreadPage, pack_inbox_cursor
+from bot.services.read_models import ToolItem
+
+STATUS_EMOJI = {
+    BookingStatus.PENDING: "⏳",
+    BookingStatus.CONFIRMED: "✅",
+    BookingStatus.CANCELLED: "❌",
+    BookingStatus.COMPLETED: "✔️"
+}
 
 class InlineKeyboards:
     """Collection of inline keyboards"""
@@ -39,14 +49,17 @@ class InlineKeyboards:
             InlineKeyboardButton(text="📊 View Bookings", callback_data="view_bookings"),
             InlineKeyboardButton(text="📈 Statistics", callback_data="stats")
         )
+        builder.row(
+            InlineKeyboardButton(text="📥 Inbox", callback_data="inbox:")
+        )
         builder.row(
             InlineKeyboardButton(text="🔙 Back to User Menu", callback_data="user_menu")
         )
         return builder.as_markup()
     
     @staticmethod
-    def tools_list(tools: List[Tool], page: int = 1, total_pages: int = 1) -> InlineKeyboardMarkup:
-        """Tools list with pagination"""
+    def tools_list(tools: Sequence[ToolItem], page: int = 1, total_pages: int = 1) -> InlineKeyboardMarkup:
+        """Tools list with pagination (catalog rows, see read_models)"""
         builder = InlineKeyboardBuilder()
         
         # Tool buttons
@@ -214,4 +227,204 @@ class InlineKeyboards:
             InlineKeyboardButton(text="⏭ Skip", callback_data="skip"),
             InlineKeyboardButton(text="❌ Cancel", callback_data="cancel")
         )
-        return builder.as_markup()
\ No newline at end of file
+        return builder.as_markup()
+    
+    @staticmethod
+    def booking_console(view: ConsoleView, page: ConsolePage) -> InlineKeyboardMarkup:
+        """Owner booking console: status badges, filters and keyset navigation"""
+        builder = InlineKeyboardBuilder()
+        # The status and paging buttons carry the counts, so they are only counted again for new tool/date filters
+        view = view.with_counts(page.counts)
+        
+        # Status badges with counts for the current tool/date filters
+        badges = []
+        for key, status in CONSOLE_STATUSES.items():
+            count = sum(page.counts.values()) if status is None else page.counts.get(status, 0)
+            label = "All" if status is None else STATUS_EMOJI[status]
+            mark = "• " if key == view.status else ""
+            badges.append(InlineKeyboardButton(text=f"{mark}{label} {count}", callback_data=view.pack(status=key)))
+        builder.row(*badges)
+        
+        builder.row(
+            InlineKeyboardButton(
+                text=f"🛠 {page.tool_name or 'All tools'}",
+                callback_data=f"bkt:{view.status}:{view.tool_id}:{view.period}:0"
+            ),
+            InlineKeyboardButton(
+                text=f"📆 {CONSOLE_PERIODS[view.period][0]}",
+                callback_data=view.pack(period=view.next_period())
+            )
+        )
+        
+        if page.counts.get(BookingStatus.PENDING):
+            builder.row(
+                InlineKeyboardButton(text="☑️ Bulk Confirm / Reject", callback_data=view.pack('tri', status='p', counts=''))
+            )
+        
+        nav_buttons = []
+        if page.newer:
+            nav_buttons.append(InlineKeyboardButton(text="◀️ Newer", callback_data=view.pack(cursor=page.newer)))
+        if page.older:
+            nav_buttons.append(InlineKeyboardButton(text="Older ▶️", callback_data=view.pack(cursor=page.older)))
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        builder.row(
+            InlineKeyboardButton(text="🔙 Main Menu", callback_data="main_menu")
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def booking_console_tools(view: ConsoleView, tools: List[Tuple[int, str]], page: int, total_pages: int) -> InlineKeyboardMarkup:
+        """Tool filter picker of the booking console"""
+        builder = InlineKeyboardBuilder()
+        builder.row(
+            InlineKeyboardButton(text="🛠 All tools", callback_data=view.pack(tool_id=0))
+        )
+        for tool_id, name in tools:
+            builder.row(
+                InlineKeyboardButton(text=f"#{tool_id} {name}", callback_data=view.pack(tool_id=tool_id))
+            )
+        
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(
+                InlineKeyboardButton(text="◀️ Prev", callback_data=f"bkt:{view.status}:{view.tool_id}:{view.period}:{page-1}")
+            )
+        if page + 1 < total_pages:
+            nav_buttons.append(
+                InlineKeyboardButton(text="Next ▶️", callback_data=f"bkt:{view.status}:{view.tool_id}:{view.period}:{page+1}")
+            )
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        builder.row(
+            InlineKeyboardButton(text="🔙 Back", callback_data=view.pack())
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def booking_triage(view: ConsoleView, page: ConsolePage, selected: Set[int]) -> InlineKeyboardMarkup:
+        """Pending bookings with selection toggles and bulk decision buttons"""
+        builder = InlineKeyboardBuilder()
+        for booking_id, _, start_date, end_date, total_price, _, tool_name in page.rows:
+            mark = "☑️" if booking_id in selected else "⬜"
+            builder.row(
+                InlineKeyboardButton(
+                    text=f"{mark} #{booking_id} {tool_name} {start_date:%m-%d}→{end_date:%m-%d} ${total_price:.0f}",
+                    callback_data=f"tri_toggle:{booking_id}"
+                )
+            )
+        
+        if page.rows:
+            builder.row(
+                InlineKeyboardButton(text="☑️ Select Page", callback_data="tri_page:select"),
+                InlineKeyboardButton(text="⬜ Clear", callback_data="tri_page:clear")
+            )
+        
+        nav_buttons = []
+        if page.newer:
+            nav_buttons.append(InlineKeyboardButton(text="◀️ Newer", callback_data=view.pack('tri', cursor=page.newer)))
+        if page.older:
+            nav_buttons.append(InlineKeyboardButton(text="Older ▶️", callback_data=view.pack('tri', cursor=page.older)))
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        if selected:
+            builder.row(
+                InlineKeyboardButton(text=f"✅ Confirm {len(selected)}", callback_data="tri_decide:confirm"),
+                InlineKeyboardButton(text=f"❌ Reject {len(selected)}", callback_data="tri_decide:reject")
+            )
+        builder.row(
+            InlineKeyboardButton(text="🔙 Back", callback_data=view.pack(cursor=''))
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def tool_picker(tools: List[Tuple[int, str]], action: str, page: int, total_pages: int) -> InlineKeyboardMarkup:
+        """Paged tool selection; picking a tool sends {action}:{tool id}"""
+        builder = InlineKeyboardBuilder()
+        for tool_id, name in tools:
+            builder.row(
+                InlineKeyboardButton(text=f"#{tool_id} {name}", callback_data=f"{action}:{tool_id}")
+            )
+        
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(
+                InlineKeyboardButton(text="◀️ Prev", callback_data=f"tool_pick:{action}:{page-1}")
+            )
+        if total_pages > 1:
+            nav_buttons.append(
+                InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="ignore")
+            )
+        if page + 1 < total_pages:
+            nav_buttons.append(
+                InlineKeyboardButton(text="Next ▶️", callback_data=f"tool_pick:{action}:{page+1}")
+            )
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        builder.row(
+            InlineKeyboardButton(text="🔙 Main Menu", callback_data="main_menu")
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def inbox(page: InboxPage, is_first_page: bool) -> InlineKeyboardMarkup:
+        """Conversations by latest activity with unread badges"""
+        builder = InlineKeyboardBuilder()
+        for user_id, fullname, username, _, last_text, last_from_owner, unread in page.rows:
+            badge = f"🔴 {unread} " if unread else ""
+            preview = f"{'You: ' if last_from_owner else ''}{last_text or ''}"
+            builder.row(
+                InlineKeyboardButton(
+                    text=f"{badge}{fullname or username or user_id}: {preview[:40]}",
+                    callback_data=f"thread:{user_id}:"
+                )
+            )
+        
+        nav_buttons = []
+        if not is_first_page:
+            nav_buttons.append(InlineKeyboardButton(text="⏮ Latest", callback_data="inbox:"))
+        if page.older is not None:
+            nav_buttons.append(InlineKeyboardButton(text="Older ▶️", callback_data=f"inbox:{pack_inbox_cursor(page.older)}"))
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        builder.row(
+            InlineKeyboardButton(text="🔙 Main Menu", callback_data="main_menu")
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def conversation(user_id: int, page: Optional[ThreadPage] = None, is_first_page: bool = True) -> InlineKeyboardMarkup:
+        """Reply and paging buttons under a customer thread (or a new message notification)"""
+        builder = InlineKeyboardBuilder()
+        builder.row(
+            InlineKeyboardButton(text="💬 Reply", callback_data=f"reply_thread:{user_id}")
+        )
+        
+        nav_buttons = []
+        if page is not None and page.older is not None:
+            nav_buttons.append(InlineKeyboardButton(text="◀️ Older", callback_data=f"thread:{user_id}:{page.older}"))
+        if not is_first_page:
+            nav_buttons.append(InlineKeyboardButton(text="Latest ⏭", callback_data=f"thread:{user_id}:"))
+        if page is None:
+            nav_buttons.append(InlineKeyboardButton(text="📂 Open Thread", callback_data=f"thread:{user_id}:"))
+        if nav_buttons:
+            builder.row(*nav_buttons)
+        
+        builder.row(
+            InlineKeyboardButton(text="📥 Inbox", callback_data="inbox:")
+        )
+        return builder.as_markup()
+    
+    @staticmethod
+    def owner_reply() -> InlineKeyboardMarkup:
+        """Under an owner reply delivered to a customer"""
+        builder = InlineKeyboardBuilder()
+        builder.row(
+            InlineKeyboardButton(text="💬 Reply to Owner", callback_data="contact_owner")
+        )
+        return builder.as_markup()
@@ -0,0 +1,13 @@
+"""
+Bot middlewares package
+"""
+from .album import AlbumMiddleware
+from .recorder import UpdateRecorderMiddleware
+from .shop import ShopMiddleware
+from .state_proxy import StateProxy, StateProxyMiddleware
+from .throttling import ThrottlingMiddleware, parse_limits
+
+__all__ = [
+    'AlbumMiddleware', 'UpdateRecorderMiddleware', 'ShopMiddleware', 'StateProxy', 'StateProxyMiddleware',
+    'ThrottlingMiddleware', 'parse_limits'
+]
@@ -0,0 +1,71 @@
+"""
+Album middleware - one handler call per media group
+
+Telegram delivers an album as one update per photo, all sharing a
+media_group_id. The first update of a group waits until no new member has
+arrived for ALBUM_WINDOW seconds (or the group is full), then goes on to the
+handlers with every message of the group in `album`; the other updates are
+only added to the buffer and stop here. The photo handler then makes one
+state write and sends one reply for the whole album.
+
+Runs on updates ahead of the FSM middleware, so with event isolation the
+waiting update doesn't hold the chat's lock while the rest of its album
+arrives.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# Telegram albums hold at most 10 items
+ALBUM_MAX_SIZE = 10
+
+class AlbumMiddleware(BaseMiddleware):
+    """Collect the photo updates of a media group and hand them over as one"""
+
+    def __init__(self, window: float):
+        self.window = window
+        # (chat id, media_group_id) -> messages received so far
+        self.albums: Dict[Tuple[int, str], List[Message]] = {}
+
+        self.groups = 0
+        self.merged = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        message = event.message if isinstance(event, Update) else None
+        if message is None or message.media_group_id is None or not message.photo:
+            return await handler(event, data)
+
+        key = (message.chat.id, message.media_group_id)
+        album = self.albums.get(key)
+        if album is not None:
+            album.append(message)
+            self.merged += 1
+            return None
+
+        album = self.albums[key] = [message]
+        try:
+            received = 0
+            while received != len(album) and len(album) < ALBUM_MAX_SIZE:
+                received = len(album)
+                await asyncio.sleep(self.window)
+        finally:
+            del self.albums[key]
+
+        self.groups += 1
+        album.sort(key=lambda item: item.message_id)
+        data['album'] = album
+        return await handler(event, data)
+
+    async def close(self):
+        """Log the counters (dispatcher shutdown hook)"""
+        logger.info(f"Albums: {self.groups} groups, {self.merged} updates merged")
@@ -0,0 +1,124 @@
+"""
+Update recorder middleware - writes raw incoming updates to a compressed JSONL file
+
+Each line is {"ts": <arrival unix time>, "update": <Update JSON>} and can be
+fed back into the dispatcher with loadtest/replay.py.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+Scrubber = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Fields that identify a person but are not needed to route an update
+PERSONAL_FIELDS = ('first_name', 'last_name', 'username', 'phone_number', 'title', 'bio')
+# Fields with free text typed by customers
+TEXT_FIELDS = ('text', 'caption')
+
+def _pseudonym(value: str) -> str:
+    """Stable pseudonym so the same person maps to the same fake name"""
+    return "u" + hashlib.sha1(value.encode()).hexdigest()[:10]
+
+def _walk(obj: Any, fn: Callable[[str, Any], Any]) -> Any:
+    """Apply fn(key, value) to every key of nested dicts/lists"""
+    if isinstance(obj, dict):
+        return {key: fn(key, _walk(value, fn)) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_walk(item, fn) for item in obj]
+    return obj
+
+def scrub_personal_data(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace names, usernames and phone numbers with stable pseudonyms"""
+    def fn(key: str, value: Any) -> Any:
+        if key in PERSONAL_FIELDS and isinstance(value, str):
+            return _pseudonym(value)
+        return value
+    return _walk(update, fn)
+
+def scrub_free_text(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Mask customer-typed text but keep commands so routing stays the same"""
+    def fn(key: str, value: Any) -> Any:
+        if key in TEXT_FIELDS and isinstance(value, str) and not value.startswith('/'):
+            return 'x' * len(value)
+        if key == 'entities':
+            # Entity offsets refer to the original text
+            return None
+        return value
+    return _walk(update, fn)
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that records every incoming update
+
+    Serialization happens on the event loop, but scrubbing, compression and
+    disk writes are done by a background thread so handlers never wait on I/O.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        scrubbers: Optional[Sequence[Scrubber]] = None,
+        scrub_text: bool = False
+    ):
+        self.path = path
+        if scrubbers is None:
+            scrubbers = [scrub_personal_data]
+            if scrub_text:
+                scrubbers.append(scrub_free_text)
+        self.scrubbers: List[Scrubber] = list(scrubbers)
+        self.recorded = 0
+
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._writer, name="update-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Recording updates to {path}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            self._queue.put({
+                'ts': time.time(),
+                'update': event.model_dump(mode='json', exclude_none=True, by_alias=True)
+            })
+            self.recorded += 1
+        return await handler(event, data)
+
+    def _writer(self):
+        """Background thread: scrub, compress and append records"""
+        # Appending creates a new gzip member per run, which gzip.open reads transparently
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                try:
+                    update = record['update']
+                    for scrub in self.scrubbers:
+                        update = scrub(update)
+                    record['update'] = update
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                except Exception as e:
+                    logger.error(f"Failed to record update: {e}")
+
+                if self._queue.empty():
+                    f.flush()
+
+    async def close(self):
+        """Flush pending records and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        logger.info(f"Recorded {self.recorded} updates to {self.path}")
@@ -0,0 +1,35 @@
+"""
+Shop selection for multi-shop mode (see bot/shops.py)
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+class ShopMiddleware(BaseMiddleware):
+    """
+    Select the shop serving an update by the bot that received it
+
+    While the update is handled, async_session() is bound to the shop's
+    database and config.is_owner() checks the shop's owner; handlers asking
+    for `shop`, `outbox` or `scheduler` get the shop's own.
+    """
+
+    def __init__(self, shops: Dict[int, Any]):
+        self.shops = shops  # bot id -> Shop
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        shop = self.shops.get(data['bot'].id)
+        if shop is None:
+            return await handler(event, data)
+        
+        data['shop'] = shop
+        data['outbox'] = shop.outbox
+        data['scheduler'] = shop.scheduler
+        with shop.activate():
+            return await handler(event, data)
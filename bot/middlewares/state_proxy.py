@@ -0,0 +1,152 @@
+"""
+State proxy middleware - one FSM read and one write per update
+
+Handlers see `state` as an FSMContext, but reads and writes go to a copy
+held for the duration of the update: the data is loaded from the storage at
+most once (the state comes with the FSM middleware's raw_state), updates are
+applied in memory, and when the handler returns the changes are written back
+in one write (set_record when the storage has it, otherwise set_state and
+set_data).
+Handlers get deep copies: changing a returned list in place changes nothing
+until it is passed to update_data().
+
+Without event isolation another update of the same user can change the
+record in the meantime. Before writing, the stored data is read again and
+compared with what was loaded; the keys this update changed are merged on
+top of the current record, and keys both updates changed are logged as
+conflicts (this update's value wins, as it did with direct writes). With
+isolation, updates of a user never overlap and the check is skipped.
+"""
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class StateProxy(FSMContext):
+    """FSMContext buffering state and data changes until flush()"""
+
+    def __init__(self, context: FSMContext, raw_state: Optional[str]):
+        super().__init__(storage=context.storage, key=context.key)
+        self._state = raw_state
+        self._loaded_state = raw_state
+        self._data: Optional[Dict[str, Any]] = None
+        self._loaded: Optional[Dict[str, Any]] = None  # as read from the storage
+        self._changed: Dict[str, Any] = {}
+        self._replaced = False
+
+    async def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            # Nothing handed out may share objects with the storage's record
+            self._data = copy.deepcopy(await self.storage.get_data(key=self.key))
+            self._loaded = copy.deepcopy(self._data)
+        return self._data
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+
+    async def get_state(self) -> Optional[str]:
+        return self._state
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self._data = copy.deepcopy(data)
+        self._changed.clear()
+        self._replaced = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return copy.deepcopy(await self._load())
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        kwargs = copy.deepcopy(kwargs)
+        current = await self._load()
+        current.update(kwargs)
+        self._changed.update(kwargs)
+        return copy.deepcopy(current)
+
+    @property
+    def dirty(self) -> bool:
+        return self._replaced or bool(self._changed) or self._state != self._loaded_state
+
+    async def flush(self, verify: bool = True) -> bool:
+        """Write the buffered changes; returns False if another update changed the same keys"""
+        state_changed = self._state != self._loaded_state
+        if not self._replaced and not self._changed:
+            if state_changed:
+                await self.storage.set_state(key=self.key, state=self._state)
+                self._loaded_state = self._state
+            return True
+
+        data, clean = self._data, True
+        # A replacement of data never read (e.g. clear()) overwrites whatever is stored
+        if verify and self._loaded is not None:
+            stored = await self.storage.get_data(key=self.key)
+            if stored != self._loaded:
+                conflicts = [
+                    name for name in (stored if self._replaced else self._changed)
+                    if stored.get(name, _MISSING) != self._loaded.get(name, _MISSING)
+                ]
+                if conflicts:
+                    clean = False
+                    logger.warning(f"FSM data of {self.key.user_id} changed concurrently: {conflicts}")
+                if not self._replaced:
+                    data = {**stored, **self._changed}
+
+        set_record = getattr(self.storage, 'set_record', None)
+        if state_changed and set_record is not None:
+            await set_record(key=self.key, state=self._state, data=data)
+        else:
+            if state_changed:
+                await self.storage.set_state(key=self.key, state=self._state)
+            await self.storage.set_data(key=self.key, data=data)
+        self._loaded_state = self._state
+        self._loaded = copy.deepcopy(data)
+        self._changed.clear()
+        self._replaced = False
+        return clean
+
+class StateProxyMiddleware(BaseMiddleware):
+    """Hand handlers a StateProxy and flush it when the update is done"""
+
+    def __init__(self, verify: bool = True):
+        self.verify = verify
+        self.updates = 0
+        self.flushes = 0
+        self.conflicts = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        context = data.get('state')
+        if context is None:
+            return await handler(event, data)
+
+        proxy = StateProxy(context, data.get('raw_state'))
+        data['state'] = proxy
+        self.updates += 1
+        try:
+            return await handler(event, data)
+        finally:
+            # Changes made before an error are kept, as with direct writes
+            if proxy.dirty:
+                self.flushes += 1
+                if not await proxy.flush(self.verify):
+                    self.conflicts += 1
+
+    async def close(self):
+        """Log the counters (dispatcher shutdown hook)"""
+        logger.info(
+            f"State proxy: {self.updates} updates, {self.flushes} flushed, {self.conflicts} conflicts"
+        )
@@ -0,0 +1,140 @@
+"""
+Throttling middleware - per-user and per-action token buckets
+
+Every user has a general bucket (THROTTLE_RATE taps per second, bursts up to
+THROTTLE_BURST) and expensive actions get a bucket of their own (e.g.
+tool_detail, which can send a 10-photo album). An update passes only when
+both buckets have a token; otherwise it is dropped before any handler or
+query runs. Throttled callback queries get a short toast so the button stops
+spinning; throttled messages are dropped silently. The owner is never
+throttled.
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# (rate per second, burst)
+Limit = Tuple[float, float]
+
+THROTTLED_TEXT = "⏳ Too many taps - please wait a moment."
+
+def parse_limits(spec: str) -> Dict[str, Limit]:
+    """Parse "action=rate/burst,..." into {action: (rate, burst)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        action, _, value = item.partition('=')
+        rate, _, burst = value.partition('/')
+        limits[action.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+def action_of(event: TelegramObject) -> str:
+    """Callback data prefix ("tool_detail:5" -> "tool_detail") or command name"""
+    if isinstance(event, CallbackQuery):
+        return (event.data or '').split(':', 1)[0]
+    if isinstance(event, Message) and event.text and event.text.startswith('/'):
+        return event.text.split(maxsplit=1)[0].split('@', 1)[0]
+    return 'message'
+
+class TokenBucketTable:
+    """
+    Token buckets in one dict of (tokens, last refill) tuples
+
+    A bucket left idle long enough to refill completely is the same as a
+    missing one, so idle entries are swept out instead of kept forever.
+    """
+
+    def __init__(self, idle_ttl: float, sweep_interval: float = 60.0):
+        self.buckets: Dict[Tuple[int, Optional[str]], Tuple[float, float]] = {}
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+    def peek(self, key: Tuple[int, Optional[str]], limit: Limit, now: float) -> float:
+        """Tokens the bucket holds now"""
+        rate, burst = limit
+        entry = self.buckets.get(key)
+        if entry is None:
+            return burst
+        tokens, stamp = entry
+        return min(burst, tokens + (now - stamp) * rate)
+
+    def store(self, key: Tuple[int, Optional[str]], tokens: float, now: float):
+        self.buckets[key] = (tokens, now)
+
+    def sweep(self, now: float):
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + self.sweep_interval
+        cutoff = now - self.idle_ttl
+        # Rebuilding the dict also gives back the memory of removed entries
+        self.buckets = {key: entry for key, entry in self.buckets.items() if entry[1] > cutoff}
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drop messages and callback queries from users who exceed their buckets"""
+
+    def __init__(self, user_limit: Limit, action_limits: Dict[str, Limit]):
+        self.user_limit = user_limit
+        self.action_limits = action_limits
+        # Long enough for any bucket to refill completely
+        idle_ttl = max(burst / rate for rate, burst in [user_limit, *action_limits.values()])
+        self.table = TokenBucketTable(idle_ttl)
+
+        self.passed = 0
+        self.throttled: Dict[str, int] = {}
+
+    def allow(self, user_id: int, action: str, now: Optional[float] = None) -> bool:
+        """Take a token from the user's bucket and the action's bucket, if both have one"""
+        now = time.monotonic() if now is None else now
+        self.table.sweep(now)
+
+        user_key = (user_id, None)
+        user_tokens = self.table.peek(user_key, self.user_limit, now)
+        if user_tokens < 1:
+            return False
+
+        action_limit = self.action_limits.get(action)
+        if action_limit is not None:
+            action_key = (user_id, action)
+            action_tokens = self.table.peek(action_key, action_limit, now)
+            if action_tokens < 1:
+                return False
+            self.table.store(action_key, action_tokens - 1, now)
+
+        self.table.store(user_key, user_tokens - 1, now)
+        return True
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None or config.is_owner(user.id):
+            return await handler(event, data)
+
+        action = action_of(event)
+        if self.allow(user.id, action):
+            self.passed += 1
+            return await handler(event, data)
+
+        self.throttled[action] = self.throttled.get(action, 0) + 1
+        logger.debug(f"Throttled {action} from user {user.id}")
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLED_TEXT)
+        return None
+
+    async def close(self):
+        """Log the counters (dispatcher shutdown hook)"""
+        total = sum(self.throttled.values())
+        logger.info(f"Throttling: {self.passed} passed, {total} throttled {self.throttled}")
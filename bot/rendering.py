@@ -0,0 +1,115 @@
+"""
+Long message rendering within Telegram's 4096-character limit
+
+Lists are built as independent HTML blocks (one per item) and joined into
+as few messages as fit, so building is linear in the output size instead of
+growing one string with +=. Messages are only split between blocks; a block
+too long on its own is split between HTML tokens, closing the open tags at
+the cut and reopening them in the next part, so every part parses.
+
+Lengths are counted in UTF-16 code units over the HTML source, which is
+never shorter than the text Telegram counts after parsing.
+"""
+import re
+from typing import Iterable, List, Optional
+
+from aiogram.types import InlineKeyboardMarkup, Message
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Tags, entities and words (with their trailing space or line break)
+_PIECE = re.compile(r'<[^>]*>|&[#\w]+;|[^<&\s]*\s?|[<&]')
+_TAG_NAME = re.compile(r'</?\s*([a-zA-Z-]+)')
+_TAG = re.compile(r'<[^>]*>')
+
+def text_length(text: str) -> int:
+    """Length as Telegram counts it (UTF-16 code units)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _is_blank(html: str) -> bool:
+    """True when nothing but whitespace is left after parsing (Telegram rejects such a message)"""
+    return not _TAG.sub('', html).strip()
+
+def _split_block(block: str, limit: int) -> List[str]:
+    """Split one oversized HTML block between tags and words, keeping tags balanced"""
+    parts: List[str] = []
+    open_tags: List[str] = []  # opening tags of the elements around the cursor
+    current: List[str] = []
+    size = 0
+
+    def closing_tags() -> str:
+        return ''.join(f"</{_TAG_NAME.match(tag).group(1)}>" for tag in reversed(open_tags))
+
+    for piece in filter(None, _PIECE.findall(block)):
+        tag = _TAG_NAME.match(piece) if piece.startswith('<') else None
+        closing = tag is not None and piece.startswith('</')
+        opening = tag is not None and not closing and not piece.endswith('/>')
+        # Room for closing tags is kept free all along
+        while piece and not closing:
+            reopened = sum(map(text_length, open_tags))
+            room = limit - size - text_length(closing_tags())
+            # An opening tag also needs room for its closing tag
+            if text_length(piece) + (len(tag.group(1)) + 3 if opening else 0) <= room:
+                break
+            if size > reopened:
+                # Close the open elements here and reopen them in the next part
+                parts.append(''.join(current) + closing_tags())
+                current, size = list(open_tags), reopened
+                continue
+            if piece.startswith(('<', '&')):
+                break
+            # A word longer than a whole message: cut it
+            cut = max(1, room)
+            while cut > 1 and text_length(piece[:cut]) > room:
+                cut -= 1
+            current.append(piece[:cut])
+            size += text_length(piece[:cut])
+            piece = piece[cut:]
+        current.append(piece)
+        size += text_length(piece)
+        if opening:
+            open_tags.append(piece)
+        elif closing:
+            names = [_TAG_NAME.match(open_tag).group(1) for open_tag in open_tags]
+            if tag.group(1) in names:
+                del open_tags[len(names) - 1 - names[::-1].index(tag.group(1))]
+    if current:
+        parts.append(''.join(current) + closing_tags())
+    # A cut right before trailing whitespace leaves a part with nothing to show
+    return [part for part in parts if not _is_blank(part)]
+
+def chunk_blocks(
+    blocks: Iterable[str],
+    header: str = '',
+    separator: str = '\n',
+    limit: int = TELEGRAM_MESSAGE_LIMIT
+) -> List[str]:
+    """Join HTML blocks into messages of at most `limit` characters; the header starts the first one"""
+    chunks: List[str] = []
+    current: List[str] = [header] if header else []
+    size = text_length(header)
+    separator_length = text_length(separator)
+
+    for block in blocks:
+        length = text_length(block)
+        extra = length + (separator_length if current else 0)
+        if size + extra <= limit:
+            current.append(block)
+            size += extra
+            continue
+        if current:
+            chunks.append(separator.join(current))
+        if length <= limit:
+            current, size = [block], length
+        else:
+            *full, last = _split_block(block, limit) or [None]
+            chunks.extend(full)
+            current, size = ([last], text_length(last)) if last else ([], 0)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+async def answer_chunks(message: Message, chunks: List[str], reply_markup: Optional[InlineKeyboardMarkup] = None):
+    """Send a multi-part answer; the keyboard goes on the last part"""
+    for index, chunk in enumerate(chunks):
+        await message.answer(chunk, reply_markup=reply_markup if index == len(chunks) - 1 else None)
@@ -0,0 +1,36 @@
+"""
+Background services package
+"""
+from .outbox import OutboxDispatcher, outbox, enqueue_notification, create_outbox
+from .scheduler import BookingScheduler, scheduler, create_scheduler
+from .cache import ShopCache, catalog_cache
+from .writer import GroupCommitWriter, writer
+from .idempotency import DuplicateSubmission, idempotency, new_flow_id, prune_keys
+from .booking_console import (
+    CONSOLE_STATUSES, CONSOLE_PERIODS, ConsoleView, ConsolePage, load_console_page, load_tool_page
+)
+from .decisions import DecisionResult, decide_bookings
+from .export import EXPORT_FORMATS, ExportResult, export_bookings
+from .inbox import InboxPage, ThreadPage, record_message, load_inbox, load_thread, parse_inbox_cursor
+from .routing import ReplyRouter, reply_router, prune_routes
+from .maintenance import DatabaseMaintenance, maintenance, create_maintenance
+from .statements import HOT_STATEMENTS, get_tool, warm_up_statements
+from .read_models import (
+    ToolItem, OwnerToolItem, BookingItem, load_catalog_page, load_owner_tools, load_user_bookings
+)
+
+__all__ = [
+    'OutboxDispatcher', 'outbox', 'enqueue_notification', 'create_outbox',
+    'BookingScheduler', 'scheduler', 'create_scheduler',
+    'ShopCache', 'catalog_cache',
+    'GroupCommitWriter', 'writer',
+    'DuplicateSubmission', 'idempotency', 'new_flow_id', 'prune_keys',
+    'CONSOLE_STATUSES', 'CONSOLE_PERIODS', 'ConsoleView', 'ConsolePage', 'load_console_page', 'load_tool_page',
+    'DecisionResult', 'decide_bookings',
+    'EXPORT_FORMATS', 'ExportResult', 'export_bookings',
+    'InboxPage', 'ThreadPage', 'record_message', 'load_inbox', 'load_thread', 'parse_inbox_cursor',
+    'ReplyRouter', 'reply_router', 'prune_routes',
+    'DatabaseMaintenance', 'maintenance', 'create_maintenance',
+    'HOT_STATEMENTS', 'get_tool', 'warm_up_statements',
+    'ToolItem', 'OwnerToolItem', 'BookingItem', 'load_catalog_page', 'load_owner_tools', 'load_user_bookings'
+]
@@ -0,0 +1,195 @@
+"""
+Owner booking console - filtered, keyset-paginated booking lists
+
+The whole view state lives in the callback data, so any page can be
+reopened from any button without FSM state:
+
+    bk:{status}:{tool_id}:{period}:{cursor}[:{counts}]
+
+status is a key of CONSOLE_STATUSES ('a' = all), tool_id 0 means all tools,
+period is a key of CONSOLE_PERIODS and cursor is empty (newest page),
+"b{id}" (bookings older than id) or "a{id}" (bookings newer than id).
+counts are the per-status badge counts ("{pending}.{confirmed}.{cancelled}.
+{completed}"), counted when the tool or period filter changes and carried
+by the status and paging buttons, so paging doesn't count the bookings again.
+The tool picker pages through the tools with bk...-shaped data whose last
+field is the picker page: bkt:{status}:{tool_id}:{period}:{page}. Bulk
+triage pages (tri:...) use the same layout over pending bookings.
+
+Pages are ordered by booking id and read with a key range instead of an
+OFFSET, so every page costs the same however deep the owner goes. Each
+filter combination is served by one of the Booking indexes. Rows are plain
+column tuples - no ORM objects or relationships are loaded.
+"""
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from config import config
+from db import async_session
+from models import Booking, BookingStatus, Tool
+
+CONSOLE_STATUSES: Dict[str, Optional[BookingStatus]] = {
+    'a': None,
+    'p': BookingStatus.PENDING,
+    'c': BookingStatus.CONFIRMED,
+    'x': BookingStatus.CANCELLED,
+    'd': BookingStatus.COMPLETED,
+}
+
+# key -> (label, start_date range in days from today)
+CONSOLE_PERIODS: Dict[str, Tuple[str, Optional[Tuple[int, int]]]] = {
+    'a': ("All dates", None),
+    'w': ("Next 7 days", (0, 7)),
+    'm': ("Next 30 days", (0, 30)),
+    'r': ("Last 30 days", (-30, 0)),
+}
+
+# Statuses with a badge count, in the order they are packed
+COUNTED_STATUSES = [status for status in CONSOLE_STATUSES.values() if status is not None]
+
+CALLBACK_DATA_LIMIT = 64
+
+# (id, status, start_date, end_date, total_price, user_fullname, tool name)
+BookingRow = Tuple[int, BookingStatus, datetime, datetime, float, Optional[str], str]
+
+def _unpack_counts(text: str) -> Optional[Dict[BookingStatus, int]]:
+    values = text.split('.')
+    if len(values) != len(COUNTED_STATUSES) or not all(value.isdigit() for value in values):
+        return None
+    return {status: int(value) for status, value in zip(COUNTED_STATUSES, values)}
+
+@dataclass(frozen=True)
+class ConsoleView:
+    """Filters and cursor of one console page"""
+    status: str = 'a'
+    tool_id: int = 0
+    period: str = 'a'
+    cursor: str = ''
+    counts: str = ''
+
+    @classmethod
+    def parse(cls, data: str) -> "ConsoleView":
+        """Decode bk:... callback data; unknown values fall back to the defaults"""
+        parts = data.split(':')[1:] + [''] * 5
+        status, tool_id, period, cursor, counts = parts[:5]
+        return cls(
+            status=status if status in CONSOLE_STATUSES else 'a',
+            tool_id=int(tool_id) if tool_id.isdigit() else 0,
+            period=period if period in CONSOLE_PERIODS else 'a',
+            cursor=cursor if cursor[1:].isdigit() and cursor[:1] in ('a', 'b') else '',
+            counts=counts if _unpack_counts(counts) is not None else ''
+        )
+
+    def pack(self, prefix: str = 'bk', **changes) -> str:
+        """Callback data for this view with some fields changed (filters reset the cursor, tool and period the counts)"""
+        if changes and 'cursor' not in changes:
+            changes['cursor'] = ''
+        if 'tool_id' in changes or 'period' in changes:
+            changes.setdefault('counts', '')
+        view = replace(self, **changes)
+        data = f"{prefix}:{view.status}:{view.tool_id}:{view.period}:{view.cursor}"
+        # Telegram allows 64 bytes of callback data; without the counts they are counted again
+        if view.counts and len(data) + len(view.counts) < CALLBACK_DATA_LIMIT:
+            data += f":{view.counts}"
+        return data
+
+    def with_counts(self, counts: Dict[BookingStatus, int]) -> "ConsoleView":
+        """This view carrying the given badge counts"""
+        return replace(self, counts='.'.join(str(counts.get(status, 0)) for status in COUNTED_STATUSES))
+
+    def carried_counts(self) -> Optional[Dict[BookingStatus, int]]:
+        """Badge counts carried in the callback data, if any"""
+        return _unpack_counts(self.counts)
+
+    def next_period(self) -> str:
+        keys = list(CONSOLE_PERIODS)
+        return keys[(keys.index(self.period) + 1) % len(keys)]
+
+@dataclass
+class ConsolePage:
+    rows: List[BookingRow]
+    counts: Dict[BookingStatus, int]
+    tool_name: Optional[str]
+    newer: Optional[str]  # cursor of the newer page, if any
+    older: Optional[str]  # cursor of the older page, if any
+
+def _filters(view: ConsoleView, with_status: bool = True) -> list:
+    conditions = []
+    status = CONSOLE_STATUSES[view.status]
+    if with_status and status is not None:
+        conditions.append(Booking.status == status)
+    if view.tool_id:
+        conditions.append(Booking.tool_id == view.tool_id)
+    days = CONSOLE_PERIODS[view.period][1]
+    if days is not None:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        conditions.append(Booking.start_date >= today + timedelta(days=days[0]))
+        conditions.append(Booking.start_date < today + timedelta(days=days[1] + 1))
+    return conditions
+
+async def load_console_page(
+    view: ConsoleView,
+    page_size: Optional[int] = None,
+    with_counts: bool = True
+) -> ConsolePage:
+    """
+    One page of bookings (newest first) plus the per-status counts for the other filters
+
+    The counts are taken from the view when it carries them; with_counts=False
+    skips them (the triage pages don't show them).
+    """
+    page_size = page_size or config.BOOKINGS_PER_PAGE
+    query = (
+        select(
+            Booking.id, Booking.status, Booking.start_date, Booking.end_date,
+            Booking.total_price, Booking.user_fullname, Tool.name
+        )
+        .join(Tool, Tool.id == Booking.tool_id)
+        .where(*_filters(view))
+        .limit(page_size + 1)
+    )
+
+    direction, anchor = view.cursor[:1], int(view.cursor[1:] or 0)
+    if direction == 'a':
+        query = query.where(Booking.id > anchor).order_by(Booking.id.asc())
+    elif direction == 'b':
+        query = query.where(Booking.id < anchor).order_by(Booking.id.desc())
+    else:
+        query = query.order_by(Booking.id.desc())
+
+    async with async_session() as session:
+        rows = [tuple(row) for row in await session.execute(query)]
+        counts = view.carried_counts() if with_counts else {}
+        if counts is None:
+            counts = dict((await session.execute(
+                select(Booking.status, func.count())
+                .where(*_filters(view, with_status=False))
+                .group_by(Booking.status)
+            )).all())
+        tool_name = await session.scalar(select(Tool.name).where(Tool.id == view.tool_id)) if view.tool_id else None
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'a':
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = direction == 'b', has_more
+
+    return ConsolePage(
+        rows=rows,
+        counts=counts,
+        tool_name=tool_name,
+        newer=f"a{rows[0][0]}" if rows and has_newer else None,
+        older=f"b{rows[-1][0]}" if rows and has_older else None
+    )
+
+async def load_tool_page(offset: int, limit: int) -> Tuple[int, List[Tuple[int, str]]]:
+    """Tool count and one page of (id, name), for tool filters and pickers"""
+    async with async_session() as session:
+        total = await session.scalar(select(func.count(Tool.id)))
+        result = await session.execute(select(Tool.id, Tool.name).order_by(Tool.id).offset(offset).limit(limit))
+        return total, [tuple(row) for row in result]
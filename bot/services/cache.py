@@ -0,0 +1,101 @@
+"""
+In-process cache with a memory budget shared fairly between shops
+
+Entries are kept per database (one partition per shop in multi-shop mode,
+a single partition otherwise) and weighted by an estimated size in bytes.
+When the budget is exceeded, entries are evicted least recently used first
+from the partition using the most memory. A busy shop can use memory the
+others leave free, but never pushes a shop below its fair share
+(budget / shops).
+"""
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config import config
+from db import active_engine
+
+def estimate_size(value: Any) -> int:
+    """Rough deep size of plain data (rows, tuples, lists, dicts, scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, Mapping):
+        return size + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, Sequence):
+        return size + sum(estimate_size(item) for item in value)
+    return size
+
+class ShopCache:
+    """LRU cache with per-entry TTL and a fair per-shop memory budget"""
+
+    def __init__(self, budget_bytes: int, ttl: float):
+        self.budget = budget_bytes
+        self.ttl = ttl
+        # partition -> key -> (expires_at, size, value), least recently used first
+        self.partitions: Dict[Hashable, "OrderedDict[Hashable, Tuple[float, int, Any]]"] = {}
+        self.usage: Dict[Hashable, int] = {}
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _partition(self) -> Hashable:
+        return active_engine()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        partition = self.partitions.get(self._partition())
+        entry = partition.get(key) if partition else None
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(self._partition(), key)
+            self.misses += 1
+            return None
+        partition.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any):
+        name = self._partition()
+        size = estimate_size(value)
+        if size > self.budget:
+            return
+        self._remove(name, key)
+        partition = self.partitions.setdefault(name, OrderedDict())
+        partition[key] = (time.monotonic() + self.ttl, size, value)
+        self.usage[name] = self.usage.get(name, 0) + size
+        self.total += size
+        while self.total > self.budget:
+            self._evict()
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything cached for the current shop"""
+        name = self._partition()
+        if key is not None:
+            self._remove(name, key)
+            return
+        partition = self.partitions.pop(name, None)
+        if partition:
+            self.total -= self.usage.pop(name, 0)
+
+    def _remove(self, name: Hashable, key: Hashable):
+        partition = self.partitions.get(name)
+        entry = partition.pop(key, None) if partition else None
+        if entry is None:
+            return
+        self.usage[name] -= entry[1]
+        self.total -= entry[1]
+        if not partition:
+            del self.partitions[name]
+            del self.usage[name]
+
+    def _evict(self):
+        name = max(self.usage, key=self.usage.get)
+        key = next(iter(self.partitions[name]))
+        self._remove(name, key)
+        self.evictions += 1
+
+# Available-tools pages shown by /tools
+catalog_cache = ShopCache(config.CATALOG_CACHE_BYTES, config.CATALOG_CACHE_TTL)
@@ -0,0 +1,155 @@
+"""
+Owner booking decisions - confirm or reject pending requests
+
+A decision is a conditional UPDATE (... WHERE status = 'pending'), so a
+booking that was cancelled, expired or decided in another chat meanwhile is
+left alone, and any number of bookings are decided in one transaction.
+Confirming takes the selected bookings in (start_date, id) order and rejects
+those whose dates overlap a confirmed booking of the same tool, or one
+confirmed earlier in the same decision; then it rejects, in one set-based
+UPDATE, the other pending requests that overlap the newly confirmed ones.
+Customer notifications are queued in the outbox in the same transaction,
+which runs through the group-commit writer, so nothing is written between
+the overlap check and the updates.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import exists, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import Booking, BookingStatus, Tool
+from bot.services.outbox import enqueue_notification
+from bot.services.writer import writer
+
+# Columns BookingScheduler.schedule_booking() reads
+DECISION_COLUMNS = (
+    Booking.id, Booking.user_id, Booking.tool_id, Booking.status, Booking.created_at,
+    Booking.start_date, Booking.end_date, Booking.reminder_sent_at
+)
+
+@dataclass
+class DecisionResult:
+    decided: List[Row] = field(default_factory=list)  # still pending when decided
+    conflicting: List[Row] = field(default_factory=list)  # selected, but rejected for overlapping a confirmed booking
+    overlapping: List[Row] = field(default_factory=list)  # other pending requests auto-rejected by a confirmation
+
+    @property
+    def changed(self) -> List[Row]:
+        return self.decided + self.conflicting + self.overlapping
+
+async def decide_bookings(booking_ids: Iterable[int], confirm: bool) -> DecisionResult:
+    """Confirm or reject the given bookings that are still pending, in one transaction"""
+    booking_ids = list(set(booking_ids))
+    if not booking_ids:
+        return DecisionResult()
+
+    async def write(session: AsyncSession) -> DecisionResult:
+        result = DecisionResult()
+        now = datetime.utcnow()
+        if confirm:
+            accepted, conflicting = await _split_overlapping(session, booking_ids)
+            result.decided = await _set_status(session, accepted, BookingStatus.CONFIRMED, now)
+            result.conflicting = await _set_status(session, conflicting, BookingStatus.CANCELLED, now)
+        else:
+            result.decided = await _set_status(session, booking_ids, BookingStatus.CANCELLED, now)
+
+        confirmed_ids = [row.id for row in result.decided] if confirm else []
+        if confirmed_ids:
+            confirmed = aliased(Booking)
+            result.overlapping = (await session.execute(
+                update(Booking)
+                .where(
+                    Booking.status == BookingStatus.PENDING,
+                    exists().where(
+                        confirmed.id.in_(confirmed_ids),
+                        confirmed.tool_id == Booking.tool_id,
+                        confirmed.start_date <= Booking.end_date,
+                        confirmed.end_date >= Booking.start_date
+                    )
+                )
+                .values(status=BookingStatus.CANCELLED, updated_at=now)
+                .returning(*DECISION_COLUMNS)
+            )).all()
+
+        if result.changed:
+            tool_ids = {row.tool_id for row in result.changed}
+            names = dict((await session.execute(
+                select(Tool.id, Tool.name).where(Tool.id.in_(tool_ids))
+            )).all())
+            for row in result.decided:
+                enqueue_notification(session, row.user_id, _decision_text(row, names, confirm))
+            for row in result.conflicting + result.overlapping:
+                enqueue_notification(session, row.user_id, (
+                    f"😔 Your booking request #{row.id} for <b>{names.get(row.tool_id, 'your tool')}</b> "
+                    f"({row.start_date:%B %d} - {row.end_date:%B %d, %Y}) could not be accepted: "
+                    "the tool is already booked for those dates.\n\nPlease try other dates!"
+                ))
+        return result
+
+    return await writer.submit(write)
+
+async def _split_overlapping(session: AsyncSession, booking_ids: List[int]) -> Tuple[List[int], List[int]]:
+    """
+    Pending bookings among booking_ids that can be confirmed, and those that can't
+
+    Taken in (start_date, id) order, a booking can't be confirmed when its
+    dates overlap a confirmed booking of the same tool or one accepted before it.
+    """
+    candidates = (await session.execute(
+        select(Booking.id, Booking.tool_id, Booking.start_date, Booking.end_date)
+        .where(Booking.id.in_(booking_ids), Booking.status == BookingStatus.PENDING)
+        .order_by(Booking.start_date, Booking.id)
+    )).all()
+    if not candidates:
+        return [], []
+
+    taken: Dict[int, List[Tuple[datetime, datetime]]] = defaultdict(list)  # tool_id -> confirmed date ranges
+    confirmed = await session.execute(
+        select(Booking.tool_id, Booking.start_date, Booking.end_date)
+        .where(
+            Booking.tool_id.in_({row.tool_id for row in candidates}),
+            Booking.status == BookingStatus.CONFIRMED,
+            Booking.start_date <= max(row.end_date for row in candidates),
+            Booking.end_date >= min(row.start_date for row in candidates)
+        )
+    )
+    for tool_id, start_date, end_date in confirmed:
+        taken[tool_id].append((start_date, end_date))
+
+    accepted, conflicting = [], []
+    for row in candidates:
+        if any(start <= row.end_date and end >= row.start_date for start, end in taken[row.tool_id]):
+            conflicting.append(row.id)
+        else:
+            accepted.append(row.id)
+            taken[row.tool_id].append((row.start_date, row.end_date))
+    return accepted, conflicting
+
+async def _set_status(session: AsyncSession, booking_ids: List[int], status: BookingStatus, now: datetime) -> List[Row]:
+    """Set the status of those of booking_ids that are still pending; their rows"""
+    if not booking_ids:
+        return []
+    return (await session.execute(
+        update(Booking)
+        .where(Booking.id.in_(booking_ids), Booking.status == BookingStatus.PENDING)
+        .values(status=status, updated_at=now)
+        .returning(*DECISION_COLUMNS)
+    )).all()
+
+def _decision_text(row: Row, names: dict, confirm: bool) -> str:
+    tool_name = names.get(row.tool_id, "your tool")
+    dates = f"{row.start_date:%B %d} - {row.end_date:%B %d, %Y}"
+    if confirm:
+        return (
+            f"✅ <b>Booking confirmed!</b>\n\n"
+            f"Your booking #{row.id} for <b>{tool_name}</b> ({dates}) has been confirmed by the owner."
+        )
+    return (
+        f"❌ Your booking request #{row.id} for <b>{tool_name}</b> ({dates}) "
+        "was declined by the owner.\n\nYou're welcome to book other dates!"
+    )
@@ -0,0 +1,220 @@
+"""
+Bookings export for accounting (CSV or XLSX)
+
+Rows are streamed from the database in batches (server-side cursor with
+yield_per) and written to a compressed file as they arrive, so memory use is
+the same for a hundred bookings or ten million. CSV is gzipped; XLSX is a
+zip container by definition and is written directly with zipfile, one
+worksheet row at a time. File writes run in a thread so the event loop keeps
+serving updates during a long export.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+
+from db import async_session
+from models import Booking, BookingStatus, Tool
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_BATCH_SIZE = 1000
+
+HEADER = (
+    'booking_id', 'created_at', 'status', 'tool_id', 'tool', 'customer_id', 'customer',
+    'username', 'start_date', 'end_date', 'days', 'delivery', 'total_price'
+)
+
+# Revenue counts bookings the owner accepted
+REVENUE_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
+
+@dataclass
+class ExportResult:
+    path: str
+    filename: str
+    rows: int
+    revenue: float
+
+def _query(start: Optional[date], end: Optional[date], status: Optional[BookingStatus]):
+    """Bookings starting in [start, end], in start_date order (ix_bookings_start / ix_bookings_status_start)"""
+    query = (
+        select(
+            Booking.id, Booking.created_at, Booking.status, Booking.tool_id, Tool.name,
+            Booking.user_id, Booking.user_fullname, Booking.user_username,
+            Booking.start_date, Booking.end_date, Booking.delivery_required, Booking.total_price
+        )
+        .join(Tool, Tool.id == Booking.tool_id)
+        .order_by(Booking.start_date, Booking.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if start:
+        query = query.where(Booking.start_date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.where(Booking.start_date <= datetime.combine(end, datetime.max.time()))
+    if status:
+        query = query.where(Booking.status == status)
+    return query
+
+def _record(row: Sequence) -> tuple:
+    """Export columns of one result row"""
+    (booking_id, created_at, status, tool_id, tool_name, user_id, fullname, username,
+     start_date, end_date, delivery, total_price) = row
+    days = max(1, (end_date - start_date).days + 1)
+    return (
+        booking_id, created_at, status.value, tool_id, tool_name, user_id, fullname or '',
+        username or '', start_date.date(), end_date.date(), days, 'yes' if delivery else 'no', total_price
+    )
+
+class CSVWriter:
+    """Gzipped CSV"""
+    extension = 'csv.gz'
+
+    def __init__(self, path: str):
+        self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(HEADER)
+
+    def write(self, records: List[tuple]):
+        self.writer.writerows(
+            [value.isoformat(sep=' ', timespec='seconds') if isinstance(value, datetime) else value
+             for value in record]
+            for record in records
+        )
+
+    def close(self):
+        self.file.close()
+
+# Serial day numbers in spreadsheets count from 1899-12-30
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Bookings" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Style 1: date (built-in format 14), style 2: date and time (format 22)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font/></fonts>'
+        '<fills count="1"><fill/></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="3"><xf/>'
+        '<xf numFmtId="14" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" applyNumberFormat="1"/>'
+        '</cellXfs></styleSheet>'
+    ),
+}
+
+class XLSXWriter:
+    """Single-sheet workbook written row by row with inline strings"""
+    extension = 'xlsx'
+
+    def __init__(self, path: str):
+        self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        for name, content in XLSX_STATIC_PARTS.items():
+            self.zip.writestr(name, content)
+        self.sheet = io.TextIOWrapper(self.zip.open('xl/worksheets/sheet1.xml', 'w'), encoding='utf-8')
+        self.sheet.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self.write([HEADER])
+
+    @staticmethod
+    def _cell(value) -> str:
+        if value is None:
+            return '<c/>'
+        if isinstance(value, bool):
+            return f'<c t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c><v>{value}</v></c>'
+        if isinstance(value, datetime):
+            return f'<c s="2"><v>{(value - EXCEL_EPOCH).total_seconds() / 86400:.6f}</v></c>'
+        if isinstance(value, date):
+            return f'<c s="1"><v>{(value - EXCEL_EPOCH.date()).days}</v></c>'
+        return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+    def write(self, records: Iterable[tuple]):
+        self.sheet.write(''.join(
+            '<row>' + ''.join(map(self._cell, record)) + '</row>' for record in records
+        ))
+
+    def close(self):
+        self.sheet.write('</sheetData></worksheet>')
+        self.sheet.close()
+        self.zip.close()
+
+WRITERS = {'csv': CSVWriter, 'xlsx': XLSXWriter}
+
+async def export_bookings(
+    fmt: str = 'csv',
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[BookingStatus] = None
+) -> ExportResult:
+    """Write the matching bookings to a temporary file; the caller deletes it"""
+    writer_class = WRITERS[fmt]
+    fd, path = tempfile.mkstemp(prefix='bookings-', suffix=f'.{writer_class.extension}')
+    os.close(fd)
+
+    rows = 0
+    revenue = 0.0
+    writer = await asyncio.to_thread(writer_class, path)
+    try:
+        async with async_session() as session:
+            result = await session.stream(_query(start, end, status))
+            async for partition in result.partitions():
+                records = [_record(row) for row in partition]
+                rows += len(records)
+                revenue += sum(row.total_price for row in partition if row.status in REVENUE_STATUSES)
+                await asyncio.to_thread(writer.write, records)
+    except BaseException:
+        await asyncio.to_thread(writer.close)
+        os.unlink(path)
+        raise
+    await asyncio.to_thread(writer.close)
+
+    period = f"{start or 'start'}_{end or datetime.utcnow().date()}"
+    filename = f"bookings_{period}{'_' + status.value if status else ''}.{writer_class.extension}"
+    return ExportResult(path=path, filename=filename, rows=rows, revenue=revenue)
@@ -0,0 +1,118 @@
+"""
+Idempotent submissions
+
+A double tap on a confirm button or an update Telegram delivers again would
+otherwise run the same write (and its notification) twice. Handlers derive a
+key for the operation - the FSM flow id for multi-step flows, the message id
+for single messages - and submit the write with idempotency.submit(key,
+intent), which stores the key in the same savepoint of the group commit
+(see writer.py).
+
+Recently used keys are kept in a bounded in-memory table, so most duplicates
+are rejected without touching the DB; older ones cost one primary-key
+lookup. The key's primary key constraint settles races between processes.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Set, TypeVar
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from db import async_session
+from models import IdempotencyKey
+from bot.services.writer import Intent, writer
+
+T = TypeVar('T')
+
+class DuplicateSubmission(Exception):
+    """The operation with this key was already carried out"""
+
+def is_key_conflict(error: IntegrityError) -> bool:
+    """Whether the error is the unique violation of a stored key (SQLite and PostgreSQL wording)"""
+    message = str(error.orig)
+    return 'idempotency_keys.key' in message or 'idempotency_keys_pkey' in message
+
+def new_flow_id() -> str:
+    """Id for a multi-step FSM flow, stored in the FSM data when the flow starts"""
+    return uuid.uuid4().hex
+
+class IdempotencyGuard:
+    """Bounded TTL table of recent keys in front of the idempotency_keys table"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.recent: "OrderedDict[str, float]" = OrderedDict()  # key -> expiry, oldest first
+        self.in_flight: Set[str] = set()
+        self.duplicates = 0
+
+    def _is_recent(self, key: str) -> bool:
+        if key in self.in_flight:
+            return True
+        expires = self.recent.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self.recent[key]
+            return False
+        return True
+
+    def remember(self, key: str):
+        self.recent[key] = time.monotonic() + self.ttl
+        self.recent.move_to_end(key)
+        while len(self.recent) > self.maxsize:
+            self.recent.popitem(last=False)
+
+    def _duplicate(self, key: str) -> DuplicateSubmission:
+        self.duplicates += 1
+        return DuplicateSubmission(key)
+
+    async def submit(self, key: str, intent: Intent[T]) -> T:
+        """
+        Run intent(session) through the writer together with the key
+
+        Raises DuplicateSubmission (before the intent runs, or when another
+        process stored the key first) if the key was already used.
+        """
+        if self._is_recent(key):
+            raise self._duplicate(key)
+
+        async def write(session: AsyncSession) -> T:
+            if await session.get(IdempotencyKey, key) is not None:
+                raise DuplicateSubmission(key)
+            session.add(IdempotencyKey(key=key))
+            # A key stored meanwhile by another process fails here, in this intent's savepoint
+            try:
+                await session.flush()
+            except IntegrityError as e:
+                if is_key_conflict(e):
+                    raise DuplicateSubmission(key) from None
+                raise
+            # The intent's own errors (a NOT NULL or foreign key violation too) reach the caller as they are
+            return await intent(session)
+
+        # Concurrent duplicates in this process stop at _is_recent() from here on
+        self.in_flight.add(key)
+        try:
+            result = await writer.submit(write)
+        except DuplicateSubmission:
+            self.remember(key)
+            raise self._duplicate(key) from None
+        finally:
+            self.in_flight.discard(key)
+        self.remember(key)
+        return result
+
+async def prune_keys(before: datetime) -> int:
+    """Delete keys older than `before`; retries don't arrive that late"""
+    async with async_session() as session:
+        result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < before))
+        await session.commit()
+        return result.rowcount
+
+idempotency = IdempotencyGuard(maxsize=config.IDEMPOTENCY_CACHE_SIZE, ttl=config.IDEMPOTENCY_CACHE_TTL)
@@ -0,0 +1,179 @@
+"""
+Owner inbox - customer conversations and their unread counters
+
+Every message is stored with record_message(), which also upserts the
+customer's row in the conversations summary table (latest activity,
+preview, unread counter) and the inbox-wide unread total in inbox_totals,
+in the same transaction. The inbox list reads the summary table by its
+last_message_at index and never counts messages or sums counters; a thread
+is read page by page through the (user_id, timestamp) index on messages.
+Opening a thread clears its counter through the group-commit writer.
+
+Both lists are newest first with keyset cursors: a page is requested as
+"everything before this key", so deep pages cost the same as the first one.
+The inbox cursor carries the whole key - (last_message_at, user_id) - in the
+callback data, so a conversation that moves to the top between two page
+loads doesn't move the pages after it.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from db import async_session
+from models import Conversation, InboxTotals, Message
+from bot.services.writer import writer
+
+PREVIEW_LENGTH = 200
+
+# (last_message_at, user_id) of the last conversation on a page
+InboxCursor = Tuple[datetime, int]
+
+EPOCH = datetime(1970, 1, 1)
+TOTALS_ID = 1
+
+def pack_inbox_cursor(cursor: InboxCursor) -> str:
+    """'{microseconds since the epoch}.{user_id}' for callback data"""
+    last_message_at, user_id = cursor
+    return f"{(last_message_at - EPOCH) // timedelta(microseconds=1)}.{user_id}"
+
+def parse_inbox_cursor(text: str) -> Optional[InboxCursor]:
+    """Cursor from pack_inbox_cursor(); None (first page) for anything else"""
+    micros, _, user_id = text.partition('.')
+    if not micros.isdigit() or not user_id.isdigit():
+        return None
+    return EPOCH + timedelta(microseconds=int(micros)), int(user_id)
+
+@dataclass
+class InboxPage:
+    # (user_id, user_fullname, user_username, last_message_at, last_text, last_from_owner, unread)
+    rows: List[Tuple]
+    total_unread: int
+    older: Optional[InboxCursor]  # cursor of the next (older) page, if any
+
+@dataclass
+class ThreadPage:
+    conversation: Optional[Conversation]
+    # (id, timestamp, is_from_owner, text, booking_id), oldest first
+    rows: List[Tuple]
+    older: Optional[int]  # message id cursor of the next (older) page, if any
+
+async def record_message(
+    session: AsyncSession,
+    user_id: int,
+    text: str,
+    is_from_owner: bool = False,
+    booking_id: Optional[int] = None,
+    user_fullname: Optional[str] = None,
+    user_username: Optional[str] = None
+) -> Message:
+    """Add a message and update its conversation summary (committed by the caller)"""
+    now = datetime.utcnow()
+    message = Message(
+        user_id=user_id,
+        booking_id=booking_id,
+        text=text,
+        is_from_owner=is_from_owner,
+        timestamp=now
+    )
+    session.add(message)
+
+    upsert = insert(Conversation).values(
+        user_id=user_id,
+        user_fullname=user_fullname,
+        user_username=user_username,
+        last_message_at=now,
+        last_text=text[:PREVIEW_LENGTH],
+        last_from_owner=is_from_owner,
+        unread=0 if is_from_owner else 1,
+        message_count=1
+    )
+    await session.execute(upsert.on_conflict_do_update(
+        index_elements=[Conversation.user_id],
+        set_={
+            'user_fullname': func.coalesce(upsert.excluded.user_fullname, Conversation.user_fullname),
+            'user_username': func.coalesce(upsert.excluded.user_username, Conversation.user_username),
+            'last_message_at': upsert.excluded.last_message_at,
+            'last_text': upsert.excluded.last_text,
+            'last_from_owner': upsert.excluded.last_from_owner,
+            'unread': Conversation.unread + upsert.excluded.unread,
+            'message_count': Conversation.message_count + 1,
+        }
+    ))
+    if not is_from_owner:
+        totals = insert(InboxTotals).values(id=TOTALS_ID, unread=1)
+        await session.execute(totals.on_conflict_do_update(
+            index_elements=[InboxTotals.id],
+            set_={'unread': InboxTotals.unread + 1}
+        ))
+    return message
+
+async def load_inbox(before: Optional[InboxCursor] = None, page_size: Optional[int] = None) -> InboxPage:
+    """Conversations by latest activity, starting after the given cursor"""
+    page_size = page_size or config.INBOX_PAGE_SIZE
+    query = (
+        select(
+            Conversation.user_id, Conversation.user_fullname, Conversation.user_username,
+            Conversation.last_message_at, Conversation.last_text, Conversation.last_from_owner,
+            Conversation.unread
+        )
+        .order_by(Conversation.last_message_at.desc(), Conversation.user_id.desc())
+        .limit(page_size + 1)
+    )
+    if before is not None:
+        query = query.where(tuple_(Conversation.last_message_at, Conversation.user_id) < tuple_(*before))
+
+    async with async_session() as session:
+        rows = [tuple(row) for row in await session.execute(query)]
+        total_unread = await session.scalar(select(InboxTotals.unread).where(InboxTotals.id == TOTALS_ID)) or 0
+
+    last = rows[page_size - 1] if len(rows) > page_size else None
+    older = (last[3], last[0]) if last else None
+    return InboxPage(rows=rows[:page_size], total_unread=total_unread, older=older)
+
+async def load_thread(
+    user_id: int,
+    before_id: Optional[int] = None,
+    page_size: Optional[int] = None,
+    mark_read: bool = True
+) -> ThreadPage:
+    """One page of a customer's messages; opening a thread clears its unread counter"""
+    page_size = page_size or config.THREAD_PAGE_SIZE
+    query = (
+        select(Message.id, Message.timestamp, Message.is_from_owner, Message.text, Message.booking_id)
+        .where(Message.user_id == user_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(page_size + 1)
+    )
+    if before_id is not None:
+        anchor = select(Message.timestamp).where(Message.id == before_id).scalar_subquery()
+        query = query.where(tuple_(Message.timestamp, Message.id) < tuple_(anchor, before_id))
+
+    async with async_session() as session:
+        rows = [tuple(row) for row in await session.execute(query)]
+        conversation = await session.get(Conversation, user_id)
+
+    if mark_read and conversation is not None and conversation.unread:
+        async def write(session: AsyncSession):
+            # The total drops by the counter as it is when the write lock is held, not as read above
+            await session.execute(
+                update(InboxTotals)
+                .where(InboxTotals.id == TOTALS_ID)
+                .values(unread=InboxTotals.unread - (
+                    select(Conversation.unread).where(Conversation.user_id == user_id).scalar_subquery()
+                ))
+            )
+            await session.execute(
+                update(Conversation).where(Conversation.user_id == user_id).values(unread=0)
+            )
+
+        await writer.submit(write)
+
+    older = rows[page_size - 1][0] if len(rows) > page_size else None
+    rows = rows[:page_size]
+    rows.reverse()
+    return ThreadPage(conversation=conversation, rows=rows, older=older)
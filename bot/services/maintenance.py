@@ -0,0 +1,230 @@
+"""
+Database maintenance - online backups, statistics and vacuum
+
+Once a day, at the start of the quiet hours (MAINTENANCE_HOUR, UTC), the
+maintenance task runs these jobs against the SQLite file and logs how long
+each one took:
+
+  backup   - copies the live database with SQLite's backup API, a few pages
+             per step, in a worker thread. Each step holds the read lock only
+             briefly and the event loop keeps serving updates; when writes
+             keep restarting the copy, it is taken in one step instead. The
+             copy is written under a temporary name, checked with quick_check
+             and then renamed, so a backup file is never torn. Only the
+             newest BACKUP_KEEP backups of each database are kept.
+  analyze  - refreshes the query planner statistics (sqlite_stat1) with a
+             bounded ANALYZE. PRAGMA optimize only looks at tables the same
+             connection has queried, so it would do nothing on a fresh one.
+  vacuum   - returns free pages to the file system with incremental_vacuum,
+             then truncates the WAL. A database created before auto_vacuum
+             was enabled is converted once with a full VACUUM.
+
+Run it by hand with maintenance.py.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing, suppress
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import config
+from db import active_engine
+
+logger = logging.getLogger(__name__)
+
+JOBS = ('backup', 'analyze', 'vacuum')
+
+# PRAGMA auto_vacuum values
+AUTO_VACUUM_INCREMENTAL = 2
+
+class BackupRestarted(Exception):
+    """The database kept changing under a backup in steps (args: restarts)"""
+
+class DatabaseMaintenance:
+    """Nightly backup, ANALYZE and incremental vacuum of one SQLite database"""
+
+    def __init__(
+        self,
+        backup_dir: str = "data/backups",
+        keep: int = 7,
+        hour: int = 3,
+        pages_per_step: int = 256,
+        step_pause: float = 0.01,
+        max_restarts: int = 10,
+        analysis_limit: int = 1000,
+        busy_timeout: float = 30.0,
+        engine: Optional[AsyncEngine] = None
+    ):
+        self.backup_dir = Path(backup_dir)
+        self.keep = keep
+        self.hour = hour
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.max_restarts = max_restarts
+        self.analysis_limit = analysis_limit
+        self.busy_timeout = busy_timeout
+        self.engine = engine
+        self.last_run: Dict[str, float] = {}  # job -> duration in ms
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def database(self) -> Optional[str]:
+        """Path of the database file (None for anything but a file-backed SQLite database)"""
+        engine = self.engine or active_engine()
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return None
+        return engine.url.database
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit, so VACUUM and the pragmas don't run inside a transaction
+        return sqlite3.connect(self.database, timeout=self.busy_timeout, isolation_level=None)
+
+    # === LIFECYCLE ===
+    async def start(self):
+        """Start the nightly run (dispatcher startup hook; in multi-shop mode inside the shop's context)"""
+        if self.engine is None:
+            self.engine = active_engine()
+        if self.database is None:
+            logger.info("Database maintenance disabled: not a SQLite database file")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="database-maintenance")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def seconds_until_run(self, now: datetime) -> float:
+        """Seconds from now (UTC) until the next MAINTENANCE_HOUR"""
+        run_at = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return (run_at - now).total_seconds()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_run(datetime.utcnow()))
+            await self.run_jobs()
+
+    # === JOBS ===
+    async def run_jobs(self, jobs: List[str] = JOBS) -> Dict[str, float]:
+        """Run the jobs one after another; a failed job is logged and doesn't stop the rest"""
+        durations = {}
+        for job in jobs:
+            started = time.perf_counter()
+            try:
+                detail = await asyncio.to_thread(getattr(self, f"_{job}"))
+            except Exception as e:
+                logger.error(f"Maintenance job {job} failed on {self.database}: {e}")
+                continue
+            durations[job] = (time.perf_counter() - started) * 1000
+            logger.info(f"Maintenance job {job} took {durations[job]:.0f} ms ({detail})")
+        self.last_run = durations
+        return durations
+
+    def _backup(self) -> str:
+        source_path = Path(self.database)
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        target = self.backup_dir / f"{source_path.stem}-{datetime.utcnow():%Y%m%d-%H%M%S}.db"
+        partial = target.with_suffix('.db.partial')
+        try:
+            try:
+                steps, restarts = self._copy(partial, self.pages_per_step)
+            except BackupRestarted as e:
+                # Too busy to copy in steps: copy one snapshot in a single step
+                # (under WAL a reader doesn't block the writers)
+                partial.unlink()
+                steps, restarts = self._copy(partial, -1)
+                restarts = e.args[0]
+            with closing(sqlite3.connect(partial)) as copy:
+                check = copy.execute("PRAGMA quick_check").fetchone()[0]
+            if check != 'ok':
+                raise sqlite3.DatabaseError(f"backup failed quick_check: {check}")
+            os.replace(partial, target)
+        finally:
+            with suppress(FileNotFoundError):
+                partial.unlink()
+
+        removed = self._rotate(source_path.stem)
+        size_kb = target.stat().st_size / 1024
+        return f"{target.name}, {size_kb:.0f} KB in {steps} steps, {restarts} restarts, {removed} old removed"
+
+    def _copy(self, path: Path, pages: int) -> Tuple[int, int]:
+        """Copy the database to path `pages` at a time (-1: all at once); steps and restarts"""
+        steps = 0
+        restarts = 0
+        last_remaining = None
+
+        def progress(status: int, remaining: int, total: int):
+            nonlocal steps, restarts, last_remaining
+            steps += 1
+            # A write from another connection makes the copy start over
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if pages > 0 and restarts > self.max_restarts:
+                    raise BackupRestarted(restarts)
+            last_remaining = remaining
+            # Give writers the lock between steps
+            if self.step_pause:
+                time.sleep(self.step_pause)
+
+        with closing(self._connect()) as source, closing(sqlite3.connect(path)) as copy:
+            source.backup(copy, pages=pages, progress=progress)
+        return steps, restarts
+
+    def _rotate(self, stem: str) -> int:
+        """Delete all but the newest `keep` backups (timestamped names sort by age)"""
+        backups = sorted(self.backup_dir.glob(f"{stem}-????????-??????.db"))
+        old = backups[:-self.keep] if self.keep > 0 else []
+        for path in old:
+            path.unlink()
+        return len(old)
+
+    def _analyze(self) -> str:
+        with closing(self._connect()) as conn:
+            # Rows sampled per index, so the run stays short on big tables
+            conn.execute(f"PRAGMA analysis_limit={int(self.analysis_limit)}")
+            conn.execute("ANALYZE")
+            tables = conn.execute("SELECT count(DISTINCT tbl) FROM sqlite_stat1").fetchone()[0]
+        return f"statistics for {tables} tables"
+
+    def _vacuum(self) -> str:
+        with closing(self._connect()) as conn:
+            def size_kb() -> float:
+                pages = conn.execute("PRAGMA page_count").fetchone()[0]
+                return pages * conn.execute("PRAGMA page_size").fetchone()[0] / 1024
+
+            before = size_kb()
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                # Only a full VACUUM switches an existing database over
+                conn.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+                conn.execute("VACUUM")
+                action = "converted to incremental auto_vacuum"
+            else:
+                # execute() stops after the first step, which frees a single page
+                conn.executescript("PRAGMA incremental_vacuum")
+                action = "incremental_vacuum"
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            after = size_kb()
+        return f"{action}, {before:.0f} KB -> {after:.0f} KB"
+
+def create_maintenance() -> DatabaseMaintenance:
+    """Maintenance with the configured settings (one per shop in multi-shop mode)"""
+    return DatabaseMaintenance(
+        backup_dir=config.BACKUP_DIR,
+        keep=config.BACKUP_KEEP,
+        hour=config.MAINTENANCE_HOUR,
+        pages_per_step=config.BACKUP_PAGES_PER_STEP,
+        step_pause=config.BACKUP_STEP_PAUSE_MS / 1000
+    )
+
+maintenance = create_maintenance()
@@ -0,0 +1,214 @@
+"""
+Durable notification outbox
+
+Handlers add an OutboxMessage in the same transaction as the booking or
+message it belongs to, so the notification is stored exactly when the data
+is. The OutboxDispatcher drains pending rows in batches in the background
+and retries failures with exponential backoff, so customers never wait on
+Telegram and notifications survive restarts and network outages. Sends are
+paced to send_rate messages per second, so a burst (e.g. a bulk decision
+notifying many customers) stays under Telegram's flood limits.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
+)
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from db import async_session
+from models import OutboxMessage, OutboxStatus
+from bot.services.routing import Route, reply_router
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away by retrying
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+
+def enqueue_notification(
+    session: AsyncSession,
+    chat_id: int,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    route: Optional[Route] = None
+) -> OutboxMessage:
+    """
+    Add a notification to the outbox; it is sent after the caller commits
+
+    With a route (customer user_id, booking_id), a reply to the delivered
+    message is routed to that customer.
+    """
+    row = OutboxMessage(
+        chat_id=chat_id,
+        text=text,
+        reply_markup=reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        route_user_id=route[0] if route else None,
+        route_booking_id=route[1] if route else None
+    )
+    session.add(row)
+    return row
+
+class OutboxDispatcher:
+    """Background worker that delivers outbox rows"""
+
+    def __init__(
+        self,
+        batch_size: int = 20,
+        poll_interval: float = 5.0,
+        max_attempts: int = 10,
+        backoff_base: float = 2.0,
+        backoff_max: float = 600.0,
+        send_rate: float = 25.0
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.send_interval = 1.0 / send_rate if send_rate > 0 else 0.0
+        self._next_send = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+
+    def wake(self):
+        """Tell the worker new rows were committed (saves waiting for the next poll)"""
+        self._wakeup.set()
+
+    async def start(self, bot: Bot):
+        """Start draining in the background (registered as a dispatcher startup hook)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot), name="outbox-dispatcher")
+            logger.info("Outbox dispatcher started")
+
+    async def stop(self):
+        """Stop the worker; undelivered rows stay in the outbox for the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info(f"Outbox dispatcher stopped (sent {self.sent}, failed {self.failed})")
+
+    async def _run(self, bot: Bot):
+        while True:
+            try:
+                # Keep draining full batches, then wait for a wake-up or the poll interval
+                while await self.drain(bot) == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.backoff_max, self.backoff_base ** attempts))
+
+    async def drain(self, bot: Bot) -> int:
+        """
+        Send one batch of due rows; returns how many rows were processed
+
+        The batch is read in a short session of its own and each row's outcome
+        is committed right after its send, so no transaction stays open across
+        the paced sends and a crash mid-batch re-sends at most the message
+        that was in flight.
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.status == OutboxStatus.PENDING,
+                    OutboxMessage.next_attempt_at <= datetime.utcnow()
+                )
+                .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                .limit(self.batch_size)
+            )
+            rows = result.scalars().all()
+
+        for row in rows:
+            await self._pace()
+            async with async_session() as session:
+                session.add(row)
+                await self._deliver(bot, session, row)
+                await session.commit()
+        return len(rows)
+
+    async def _pace(self):
+        """Wait for the next send slot"""
+        now = time.monotonic()
+        if self._next_send > now:
+            await asyncio.sleep(self._next_send - now)
+            now = self._next_send
+        self._next_send = now + self.send_interval
+
+    async def _deliver(self, bot: Bot, session: AsyncSession, row: OutboxMessage):
+        """Send one row and record the outcome on it (and its reply route) in the caller's session"""
+        row.attempts += 1
+        try:
+            sent = await bot.send_message(
+                row.chat_id,
+                row.text,
+                reply_markup=InlineKeyboardMarkup.model_validate(row.reply_markup) if row.reply_markup else None
+            )
+        except TelegramRetryAfter as e:
+            # Flood control is not the message's fault - don't count the attempt
+            row.attempts -= 1
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=e.retry_after)
+            row.last_error = str(e)
+            return
+        except PERMANENT_ERRORS as e:
+            row.status = OutboxStatus.FAILED
+            row.last_error = str(e)
+            self.failed += 1
+            logger.error(f"Outbox message #{row.id} to {row.chat_id} dropped: {e}")
+            return
+        except Exception as e:  # network errors, 5xx, timeouts
+            row.last_error = str(e)
+            if row.attempts >= self.max_attempts:
+                row.status = OutboxStatus.FAILED
+                self.failed += 1
+                logger.error(f"Outbox message #{row.id} failed after {row.attempts} attempts: {e}")
+            else:
+                row.next_attempt_at = datetime.utcnow() + self._backoff(row.attempts)
+                logger.warning(f"Outbox message #{row.id} attempt {row.attempts} failed: {e}")
+            return
+
+        row.status = OutboxStatus.SENT
+        row.sent_at = datetime.utcnow()
+        row.last_error = None
+        self.sent += 1
+        if row.route_user_id is not None:
+            reply_router.add(session, bot.id, row.chat_id, sent.message_id, (row.route_user_id, row.route_booking_id))
+
+def create_outbox() -> OutboxDispatcher:
+    """Outbox dispatcher with the configured settings (one per shop in multi-shop mode)"""
+    return OutboxDispatcher(
+        batch_size=config.OUTBOX_BATCH_SIZE,
+        poll_interval=config.OUTBOX_POLL_INTERVAL,
+        max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+        backoff_max=config.OUTBOX_BACKOFF_MAX,
+        send_rate=config.OUTBOX_SEND_RATE
+    )
+
+outbox = create_outbox()
@@ -0,0 +1,67 @@
+"""
+Read models - lightweight rows for the list screens
+
+Lists print a few columns per item, so these queries select only those
+columns with Core statements and return NamedTuples: no ORM instances (no
+identity map or change tracking) are built, and the description text and
+the image_ids JSON are never loaded or decoded. Tools carry photo_count,
+kept in step with image_ids by the model, instead of the photo list.
+
+The catalog and "my bookings" run on most customer taps and use the
+prebuilt statements in statements.py. The owner booking console has its
+own column-tuple queries (see booking_console.py).
+"""
+from datetime import datetime
+from typing import List, NamedTuple, Tuple
+
+from sqlalchemy import select
+
+from db import async_session
+from models import BookingStatus, Tool
+from bot.services.statements import AVAILABLE_TOOLS_COUNT, CATALOG_PAGE, USER_BOOKINGS
+
+class ToolItem(NamedTuple):
+    """A tool in the customer catalog"""
+    id: int
+    name: str
+    price_per_day: float
+    available: bool
+
+class OwnerToolItem(NamedTuple):
+    """A tool in the owner's catalog listing"""
+    id: int
+    name: str
+    price_per_day: float
+    available: bool
+    photo_count: int
+
+class BookingItem(NamedTuple):
+    """A booking in a customer's booking list"""
+    id: int
+    status: BookingStatus
+    tool_name: str
+    start_date: datetime
+    end_date: datetime
+    total_price: float
+
+async def load_catalog_page(page: int, per_page: int) -> Tuple[int, Tuple[ToolItem, ...]]:
+    """Number of available tools and one page of them (pages start at 1)"""
+    async with async_session() as session:
+        total = await session.scalar(AVAILABLE_TOOLS_COUNT)
+        result = await session.execute(CATALOG_PAGE, {'offset': (page - 1) * per_page, 'limit': per_page})
+        return total, tuple(ToolItem._make(row) for row in result)
+
+async def load_owner_tools() -> List[OwnerToolItem]:
+    """Every tool, in id order"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(Tool.id, Tool.name, Tool.price_per_day, Tool.available, Tool.photo_count)
+            .order_by(Tool.id)
+        )
+        return [OwnerToolItem._make(row) for row in result]
+
+async def load_user_bookings(user_id: int, limit: int = 10) -> List[BookingItem]:
+    """A customer's latest bookings with their tool names"""
+    async with async_session() as session:
+        result = await session.execute(USER_BOOKINGS, {'user_id': user_id, 'limit': limit})
+        return [BookingItem._make(row) for row in result]
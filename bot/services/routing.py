@@ -0,0 +1,89 @@
+"""
+Reply routing - owner replies to notifications go to the right customer
+
+When the outbox delivers a notification about a customer (a new message, a
+booking request) to the owner, it records the sent message id together with
+the customer and booking in reply_routes, in the transaction that marks the
+row sent. When the owner answers with Telegram's Reply, the replied-to
+message id resolves to that customer through a bounded LRU in front of the
+table, so nothing is parsed out of the notification text. A message without
+a route is only remembered for a few seconds: its route may still be on its
+way from another worker's outbox.
+
+Routes older than REPLY_ROUTE_TTL_DAYS are pruned by the booking scheduler.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from db import async_session
+from models import ReplyRoute
+
+# (customer user_id, booking_id or None)
+Route = Tuple[int, Optional[int]]
+
+class ReplyRouter:
+    """LRU of (bot id, chat id, message id) -> route in front of the reply_routes table"""
+
+    def __init__(self, maxsize: int = 10000, ttl: timedelta = timedelta(days=30), miss_ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = timedelta(seconds=miss_ttl)
+        # key -> (route, created_at); routes past the TTL count as pruned, misses (None) expire after miss_ttl
+        self.routes: "OrderedDict[Tuple[int, int, int], Tuple[Optional[Route], datetime]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: Tuple[int, int, int], route: Optional[Route], created_at: datetime):
+        self.routes[key] = (route, created_at)
+        self.routes.move_to_end(key)
+        while len(self.routes) > self.maxsize:
+            self.routes.popitem(last=False)
+
+    def add(self, session: AsyncSession, bot_id: int, chat_id: int, message_id: int, route: Route):
+        """Record a sent notification's route (committed by the caller)"""
+        now = datetime.utcnow()
+        session.add(ReplyRoute(
+            chat_id=chat_id, message_id=message_id, user_id=route[0], booking_id=route[1], created_at=now
+        ))
+        self._remember((bot_id, chat_id, message_id), route, now)
+
+    async def resolve(self, bot_id: int, chat_id: int, message_id: int) -> Optional[Route]:
+        """Customer and booking behind a notification, or None if it has no (live) route"""
+        key = (bot_id, chat_id, message_id)
+        cached = self.routes.get(key)
+        if cached is not None and cached[0] is None and cached[1] < datetime.utcnow() - self.miss_ttl:
+            cached = None
+        if cached is not None:
+            self.routes.move_to_end(key)
+            self.hits += 1
+            route, created_at = cached
+        else:
+            self.misses += 1
+            async with async_session() as session:
+                row = (await session.execute(
+                    select(ReplyRoute.user_id, ReplyRoute.booking_id, ReplyRoute.created_at)
+                    .where(ReplyRoute.chat_id == chat_id, ReplyRoute.message_id == message_id)
+                )).first()
+            route, created_at = ((row.user_id, row.booking_id), row.created_at) if row else (None, datetime.utcnow())
+            # Replies to messages without a route are remembered too, briefly
+            self._remember(key, route, created_at)
+        if route is not None and created_at < datetime.utcnow() - self.ttl:
+            return None
+        return route
+
+async def prune_routes(before: datetime) -> int:
+    """Delete routes older than `before`; the owner doesn't reply to those any more"""
+    async with async_session() as session:
+        result = await session.execute(delete(ReplyRoute).where(ReplyRoute.created_at < before))
+        await session.commit()
+        return result.rowcount
+
+reply_router = ReplyRouter(
+    maxsize=config.REPLY_ROUTE_CACHE_SIZE,
+    ttl=timedelta(days=config.REPLY_ROUTE_TTL_DAYS)
+)
@@ -0,0 +1,255 @@
+"""
+Booking lifecycle scheduler
+
+Moves bookings through their lifecycle without polling the whole table:
+- PENDING requests expire (-> CANCELLED) after BOOKING_PENDING_TTL_HOURS
+- CONFIRMED bookings get a reminder BOOKING_REMINDER_HOURS before start_date
+- CONFIRMED bookings are COMPLETED once their end_date has passed
+
+Every SCHEDULER_WINDOW_MINUTES the scheduler loads only the events due
+before the end of the next window (index range scans on status + date) into
+a hierarchical timer wheel. Due events are applied in batched conditional
+UPDATEs, so bookings that changed in the meantime are left alone. Overdue
+events are picked up by the first load, which rebuilds the wheel after a
+restart.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+
+from config import config
+from db import async_session
+from models import Booking, BookingStatus, Tool
+from bot.services.outbox import OutboxDispatcher, outbox, enqueue_notification
+from bot.services.idempotency import prune_keys
+from bot.services.routing import prune_routes
+from bot.services.timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+EXPIRE = 'expire'
+REMIND = 'remind'
+COMPLETE = 'complete'
+
+def _timestamp(value: datetime) -> float:
+    """Booking datetimes are naive UTC"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class BookingScheduler:
+    """Timer-wheel driven booking lifecycle jobs"""
+
+    def __init__(
+        self,
+        pending_ttl: timedelta = timedelta(hours=48),
+        reminder_lead: timedelta = timedelta(hours=24),
+        window: timedelta = timedelta(minutes=60),
+        tick: float = 1.0,
+        notifier: Optional[OutboxDispatcher] = None,
+        key_ttl: Optional[timedelta] = None,
+        route_ttl: Optional[timedelta] = None
+    ):
+        self.notifier = notifier or outbox
+        # Idempotency keys and reply routes older than these are pruned once per window
+        self.key_ttl = key_ttl
+        self.route_ttl = route_ttl
+        self.pending_ttl = pending_ttl
+        self.reminder_lead = reminder_lead
+        self.window = window
+        self.tick = tick
+        # end_date is the last rental day at midnight; the rental ends a day later
+        self.rental_day = timedelta(days=1)
+
+        self.wheel: Optional[TimerWheel] = None
+        self.scheduled: Set[Tuple[str, int]] = set()
+        self.loaded_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.applied: Dict[str, int] = defaultdict(int)
+
+    # === LIFECYCLE ===
+    async def start(self):
+        """Rebuild the wheel from the DB and start ticking (dispatcher startup hook)"""
+        if self._task is None:
+            self.wheel = TimerWheel(start=datetime.now(timezone.utc).timestamp(), tick=self.tick)
+            self.scheduled.clear()
+            self.loaded_until = None
+            self._task = asyncio.create_task(self._run(), name="booking-scheduler")
+            logger.info("Booking scheduler started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info(f"Booking scheduler stopped (applied {dict(self.applied)})")
+
+    async def _run(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self.loaded_until is None or now + self.window / 2 >= self.loaded_until:
+                    await self.load_window(now)
+                    if self.key_ttl:
+                        await prune_keys(now - self.key_ttl)
+                    if self.route_ttl:
+                        await prune_routes(now - self.route_ttl)
+                due = self.wheel.advance(_timestamp(now))
+                if due:
+                    await self.apply(due)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Booking scheduler error: {e}")
+            await asyncio.sleep(self.tick)
+
+    # === LOADING ===
+    def _add(self, kind: str, booking_id: int, due: datetime):
+        key = (kind, booking_id)
+        if key in self.scheduled:
+            return
+        self.scheduled.add(key)
+        self.wheel.schedule(_timestamp(due), key)
+
+    async def load_window(self, now: datetime):
+        """Load events due before now + window (including overdue ones)"""
+        until = now + self.window
+        async with async_session() as session:
+            # ix_bookings_status_created
+            expiring = await session.execute(
+                select(Booking.id, Booking.created_at)
+                .where(
+                    Booking.status == BookingStatus.PENDING,
+                    Booking.created_at <= until - self.pending_ttl
+                )
+            )
+            for booking_id, created_at in expiring:
+                self._add(EXPIRE, booking_id, created_at + self.pending_ttl)
+
+            # ix_bookings_status_start
+            reminders = await session.execute(
+                select(Booking.id, Booking.start_date)
+                .where(
+                    Booking.status == BookingStatus.CONFIRMED,
+                    Booking.start_date > now,
+                    Booking.start_date <= until + self.reminder_lead,
+                    Booking.reminder_sent_at.is_(None)
+                )
+            )
+            for booking_id, start_date in reminders:
+                self._add(REMIND, booking_id, start_date - self.reminder_lead)
+
+            # ix_bookings_status_end
+            completing = await session.execute(
+                select(Booking.id, Booking.end_date)
+                .where(
+                    Booking.status == BookingStatus.CONFIRMED,
+                    Booking.end_date <= until - self.rental_day
+                )
+            )
+            for booking_id, end_date in completing:
+                self._add(COMPLETE, booking_id, end_date + self.rental_day)
+
+        self.loaded_until = until
+        logger.debug(f"Scheduler window loaded until {until}: {len(self.wheel)} timers")
+
+    def schedule_booking(self, booking: Booking):
+        """Register a booking created or changed during the current window"""
+        if self.wheel is None or self.loaded_until is None:
+            return
+        candidates = []
+        if booking.status == BookingStatus.PENDING and booking.created_at:
+            candidates.append((EXPIRE, booking.created_at + self.pending_ttl))
+        elif booking.status == BookingStatus.CONFIRMED:
+            if booking.reminder_sent_at is None and booking.start_date > datetime.utcnow():
+                candidates.append((REMIND, booking.start_date - self.reminder_lead))
+            candidates.append((COMPLETE, booking.end_date + self.rental_day))
+        for kind, due in candidates:
+            # Later events are picked up by the window that contains them
+            if due <= self.loaded_until:
+                self._add(kind, booking.id, due)
+
+    # === APPLYING ===
+    async def apply(self, due: List[Tuple[str, int]]):
+        """Apply due events in one transaction with one UPDATE per event kind"""
+        by_kind: Dict[str, List[int]] = defaultdict(list)
+        for key in due:
+            self.scheduled.discard(key)
+            by_kind[key[0]].append(key[1])
+
+        now = datetime.utcnow()
+        notify = False
+        async with async_session() as session:
+            if by_kind[EXPIRE]:
+                expired = (await session.execute(
+                    update(Booking)
+                    .where(Booking.id.in_(by_kind[EXPIRE]), Booking.status == BookingStatus.PENDING)
+                    .values(status=BookingStatus.CANCELLED, updated_at=now)
+                    .returning(Booking.id, Booking.user_id, Booking.tool_id)
+                )).all()
+                notify |= await self._notify(session, expired, lambda booking_id, tool_name, _: (
+                    f"⌛ Your booking request #{booking_id} for <b>{tool_name}</b> has expired "
+                    "because the owner did not respond in time.\n\nYou're welcome to book again!"
+                ))
+                self.applied[EXPIRE] += len(expired)
+
+            if by_kind[REMIND]:
+                reminded = (await session.execute(
+                    update(Booking)
+                    .where(
+                        Booking.id.in_(by_kind[REMIND]),
+                        Booking.status == BookingStatus.CONFIRMED,
+                        Booking.reminder_sent_at.is_(None)
+                    )
+                    .values(reminder_sent_at=now)
+                    .returning(Booking.id, Booking.user_id, Booking.tool_id, Booking.start_date)
+                )).all()
+                notify |= await self._notify(session, reminded, lambda booking_id, tool_name, start_date: (
+                    f"⏰ <b>Reminder:</b> your rental of <b>{tool_name}</b> (booking #{booking_id}) "
+                    f"starts on {start_date.strftime('%B %d, %Y')}."
+                ))
+                self.applied[REMIND] += len(reminded)
+
+            if by_kind[COMPLETE]:
+                completed = await session.execute(
+                    update(Booking)
+                    .where(Booking.id.in_(by_kind[COMPLETE]), Booking.status == BookingStatus.CONFIRMED)
+                    .values(status=BookingStatus.COMPLETED, updated_at=now)
+                )
+                self.applied[COMPLETE] += completed.rowcount
+
+            await session.commit()
+
+        if notify:
+            self.notifier.wake()
+
+    async def _notify(self, session, rows, render) -> bool:
+        """Queue one customer notification per returned row"""
+        if not rows:
+            return False
+        tool_ids = {row.tool_id for row in rows}
+        names = dict((await session.execute(
+            select(Tool.id, Tool.name).where(Tool.id.in_(tool_ids))
+        )).all())
+        for row in rows:
+            extra = getattr(row, 'start_date', None)
+            enqueue_notification(session, row.user_id, render(row.id, names.get(row.tool_id, "your tool"), extra))
+        return True
+
+def create_scheduler(notifier: Optional[OutboxDispatcher] = None) -> BookingScheduler:
+    """Scheduler with the configured settings (one per shop in multi-shop mode)"""
+    return BookingScheduler(
+        pending_ttl=timedelta(hours=config.BOOKING_PENDING_TTL_HOURS),
+        reminder_lead=timedelta(hours=config.BOOKING_REMINDER_HOURS),
+        window=timedelta(minutes=config.SCHEDULER_WINDOW_MINUTES),
+        notifier=notifier,
+        key_ttl=timedelta(hours=config.IDEMPOTENCY_KEY_TTL_HOURS),
+        route_ttl=timedelta(days=config.REPLY_ROUTE_TTL_DAYS)
+    )
+
+scheduler = create_scheduler()
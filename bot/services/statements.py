@@ -0,0 +1,71 @@
+"""
+Hot statements - the queries that run on almost every customer tap
+
+A select() built inline is a new construct each time: SQLAlchemy has to walk
+it to compute its cache key before it can find the compiled SQL in the
+engine's cache. These statements are built once, with bindparam()
+placeholders for the values, so their cache key is computed once and
+memoized; executing one is a cache lookup plus parameter binding.
+
+warm_up_statements() compiles them at startup, so the first customers don't
+pay for compilation either.
+"""
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
+
+from db import async_session
+from models import Booking, Tool
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE_TOOLS_COUNT = select(func.count(Tool.id)).where(Tool.available == True)
+
+# :offset, :limit
+CATALOG_PAGE = (
+    select(Tool.id, Tool.name, Tool.price_per_day, Tool.available)
+    .where(Tool.available == True)
+    .order_by(Tool.id)
+    .offset(bindparam('offset'))
+    .limit(bindparam('limit'))
+)
+
+# :tool_id
+TOOL_BY_ID = select(Tool).where(Tool.id == bindparam('tool_id'))
+
+# :user_id, :limit
+USER_BOOKINGS = (
+    select(
+        Booking.id, Booking.status, Tool.name, Booking.start_date,
+        Booking.end_date, Booking.total_price
+    )
+    .join(Tool, Tool.id == Booking.tool_id)
+    .where(Booking.user_id == bindparam('user_id'))
+    .order_by(Booking.created_at.desc())
+    .limit(bindparam('limit'))
+)
+
+# name -> (statement, parameters used for the warm-up)
+HOT_STATEMENTS: Dict[str, Tuple[Executable, Dict[str, Any]]] = {
+    'available_tools_count': (AVAILABLE_TOOLS_COUNT, {}),
+    'catalog_page': (CATALOG_PAGE, {'offset': 0, 'limit': 1}),
+    'tool_by_id': (TOOL_BY_ID, {'tool_id': 0}),
+    'user_bookings': (USER_BOOKINGS, {'user_id': 0, 'limit': 1}),
+}
+
+async def get_tool(session: AsyncSession, tool_id: int) -> Optional[Tool]:
+    """Tool by id (what session.get() does, through the prebuilt statement)"""
+    return await session.scalar(TOOL_BY_ID, {'tool_id': tool_id})
+
+async def warm_up_statements():
+    """Compile the hot statements into the engine's cache (startup hook)"""
+    started = time.perf_counter()
+    # Through a session, as the handlers run them (ORM statements compile differently)
+    async with async_session() as session:
+        for statement, params in HOT_STATEMENTS.values():
+            await session.execute(statement, params)
+    logger.info(f"Warmed up {len(HOT_STATEMENTS)} statements in {(time.perf_counter() - started) * 1000:.1f} ms")
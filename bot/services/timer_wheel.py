@@ -0,0 +1,82 @@
+"""
+Hierarchical timing wheel
+
+Scheduling and expiring a timer are O(1); advancing costs one slot per tick
+plus an occasional cascade of a coarser slot into the finer level below it.
+"""
+import math
+from typing import Any, List, Sequence, Tuple
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel keyed by unix timestamps
+
+    With tick=1 and sizes=(60, 60, 24) level 0 holds the next minute in 1 s
+    slots, level 1 the next hour in 1 min slots and level 2 the next day in
+    1 h slots. Timers beyond the last level wait in an overflow list.
+    """
+
+    def __init__(self, start: float, tick: float = 1.0, sizes: Sequence[int] = (60, 60, 24)):
+        self.tick = tick
+        self.sizes = list(sizes)
+        # Ticks covered by one slot of each level
+        self.spans = [math.prod(self.sizes[:level]) for level in range(len(self.sizes))]
+        self.levels: List[List[List[Tuple[int, Any]]]] = [[[] for _ in range(size)] for size in self.sizes]
+        self.overflow: List[Tuple[int, Any]] = []
+        self.current = int(start // tick)
+        self.count = 0
+
+    @property
+    def horizon(self) -> float:
+        """Seconds ahead the wheel can hold without using the overflow list"""
+        return self.spans[-1] * self.sizes[-1] * self.tick
+
+    def __len__(self) -> int:
+        return self.count
+
+    def schedule(self, due: float, item: Any):
+        """Add a timer; overdue timers fire at the next tick not yet advanced past"""
+        self._place(max(int(due // self.tick), self.current), item)
+        self.count += 1
+
+    def _place(self, due_tick: int, item: Any):
+        delta = due_tick - self.current
+        for level, size in enumerate(self.sizes):
+            span = self.spans[level]
+            if delta < span * size:
+                self.levels[level][(due_tick // span) % size].append((due_tick, item))
+                return
+        self.overflow.append((due_tick, item))
+
+    def advance(self, now: float) -> List[Any]:
+        """Move the wheel up to now and return the items whose time has come"""
+        target = int(now // self.tick)
+        fired: List[Any] = []
+        while self.current <= target:
+            slot = self.current % self.sizes[0]
+            bucket = self.levels[0][slot]
+            if bucket:
+                self.levels[0][slot] = []
+                fired.extend(item for _, item in bucket)
+            self.current += 1
+
+            # Crossing a boundary of a coarser level: spread its slot over the finer levels
+            for level in range(1, len(self.sizes)):
+                span = self.spans[level]
+                if self.current % span:
+                    break
+                slot = (self.current // span) % self.sizes[level]
+                bucket = self.levels[level][slot]
+                if bucket:
+                    self.levels[level][slot] = []
+                    for due_tick, item in bucket:
+                        self._place(due_tick, item)
+            else:
+                # Full revolution of the top level: pull in overflow timers now in range
+                if self.overflow and self.current % (self.spans[-1] * self.sizes[-1]) == 0:
+                    overflow, self.overflow = self.overflow, []
+                    for due_tick, item in overflow:
+                        self._place(due_tick, item)
+
+        self.count -= len(fired)
+        return fired
@@ -0,0 +1,164 @@
+"""
+Group commit - one writer task per database
+
+SQLite has a single write lock. When every handler opens its own write
+transaction, a burst of customers queues up on that lock (each waiter
+polling through busy_timeout), and every transaction pays for its own
+commit. Instead, handlers submit write intents - async functions that get a
+session and return a result - and a writer task commits them in groups.
+
+The writer takes whatever is queued, waiting up to max_delay for more once it
+has the first intent, then runs the group in one BEGIN IMMEDIATE transaction
+with each intent in its own SAVEPOINT, and commits once. A failing intent
+rolls back only its savepoint and its caller gets the exception; the others
+are committed. If the commit itself fails, every caller in the group gets
+that error.
+
+Results are handed back after the commit, so whatever must only happen once
+the data is stored (outbox wake-up, cache invalidation, the reply to the
+user) stays in the handler, after submit() returns. Returned ORM instances
+are detached but keep their loaded attributes.
+
+In multi-shop mode every shop's engine gets its own queue and writer task.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from config import config
+from db import active_engine, async_session
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+Intent = Callable[[AsyncSession], Awaitable[T]]
+
+# Takes the write lock up front. It also makes the savepoints nest in a real
+# transaction: pysqlite doesn't BEGIN before SAVEPOINT, so RELEASE would commit.
+BEGIN_IMMEDIATE = text("BEGIN IMMEDIATE")
+
+@dataclass
+class WriteLane:
+    """Queue and writer task of one database"""
+    queue: asyncio.Queue
+    task: asyncio.Task
+
+class GroupCommitWriter:
+    """Commits submitted write intents in groups of up to `max_batch`, waiting at most `max_delay` seconds for a group to fill"""
+
+    def __init__(self, max_batch: int = 64, max_delay: float = 0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.lanes: Dict[AsyncEngine, WriteLane] = {}
+        self.commits = 0
+        self.intents = 0
+        self.failed_commits = 0
+
+    async def submit(self, intent: Intent[T]) -> T:
+        """Run intent(session) in the next group commit; its result, or its exception"""
+        engine = active_engine()
+        lane = self.lanes.get(engine)
+        if lane is None or lane.task.done():
+            queue = asyncio.Queue()
+            # The task copies the current context, so a shop's writer runs as that shop
+            task = asyncio.create_task(self._run(engine, queue), name="group-commit-writer")
+            lane = self.lanes[engine] = WriteLane(queue, task)
+        future = asyncio.get_running_loop().create_future()
+        lane.queue.put_nowait((intent, future))
+        return await future
+
+    async def _collect(self, queue: asyncio.Queue) -> Tuple[List[Tuple[Intent, asyncio.Future]], bool]:
+        """The next group, and whether stop() was called"""
+        loop = asyncio.get_running_loop()
+        item = await queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            if queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self, engine: AsyncEngine, queue: asyncio.Queue):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect(queue)
+            if batch:
+                await self._commit(engine, batch)
+
+    async def _commit(self, engine: AsyncEngine, batch: List[Tuple[Intent, asyncio.Future]]):
+        # Callers that gave up (cancelled updates) don't get their writes run
+        batch = [(intent, future) for intent, future in batch if not future.cancelled()]
+        if not batch:
+            return
+        outcomes: List[Tuple[asyncio.Future, Optional[BaseException], Any]] = []
+        try:
+            async with async_session(bind=engine) as session:
+                if engine.dialect.name == 'sqlite':
+                    await session.execute(BEGIN_IMMEDIATE)
+                for intent, future in batch:
+                    try:
+                        async with session.begin_nested():
+                            outcomes.append((future, None, await intent(session)))
+                    except Exception as error:
+                        outcomes.append((future, error, None))
+                await session.commit()
+        except Exception as error:
+            self.failed_commits += 1
+            logger.error(f"Group commit of {len(batch)} writes failed: {error}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.commits += 1
+        self.intents += len(batch)
+        for future, error, result in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'commits': self.commits,
+            'intents': self.intents,
+            'failed_commits': self.failed_commits,
+            'per_commit': self.intents / self.commits if self.commits else 0.0,
+        }
+
+    async def stop(self):
+        """Commit what is queued and stop the writer tasks (dispatcher shutdown hook)"""
+        for lane in self.lanes.values():
+            lane.queue.put_nowait(None)
+        for lane in self.lanes.values():
+            with suppress(asyncio.CancelledError):
+                await lane.task
+        self.lanes.clear()
+        if self.commits:
+            stats = self.stats()
+            logger.info(
+                f"Group commit: {stats['intents']} writes in {stats['commits']} commits "
+                f"({stats['per_commit']:.1f} per commit), {stats['failed_commits']} failed commits"
+            )
+
+writer = GroupCommitWriter(max_batch=config.WRITE_BATCH_SIZE, max_delay=config.WRITE_BATCH_DELAY_MS / 1000)
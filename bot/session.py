@@ -0,0 +1,149 @@
+"""
+HTTP session for the Bot API
+
+aiogram's default AiohttpSession is sized and timed for nothing in
+particular: one 60 s timeout for every method, connections that go idle
+after 15 s, and a 10 s DNS cache. When a lookup of api.telegram.org fails,
+every request fails with it until DNS is back. TunedAiohttpSession instead
+has:
+
+- a connection pool of HTTP_POOL_SIZE keep-alive connections, idle for up to
+  HTTP_KEEPALIVE seconds, so requests rarely pay for a new TLS handshake
+- CachingResolver: addresses are cached for HTTP_DNS_TTL seconds and a
+  failed lookup falls back to the last known addresses for up to
+  HTTP_DNS_STALE seconds, so a DNS outage doesn't stall the bot
+- per-method timeouts (HTTP_METHOD_TIMEOUTS, HTTP_TIMEOUT for the rest) and a
+  short connect timeout, so a dead connection fails fast instead of holding
+  a callback answer for a minute; getUpdates gets its long-polling timeout
+  on top
+- orjson for request and response bodies when it is installed
+  (HTTP_JSON=auto; pip install orjson), the stdlib json otherwise
+"""
+import asyncio
+import json
+import logging
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import ClientTimeout
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+ResolveKey = Tuple[str, int, int]
+
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """'sendPhoto=60,sendDocument=120' -> {'sendPhoto': 60.0, 'sendDocument': 120.0}"""
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        method, _, seconds = item.partition('=')
+        timeouts[method.strip()] = float(seconds)
+    return timeouts
+
+def json_codec(name: str = "auto") -> Tuple[Callable[..., Any], Callable[..., str]]:
+    """(loads, dumps) for 'orjson', 'json', or 'auto' (orjson when installed)"""
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("HTTP_JSON=orjson needs the orjson package (pip install orjson)")
+    if name in ("orjson", "auto") and orjson is not None:
+        # aiogram wants text from dumps
+        return orjson.loads, lambda value: orjson.dumps(value).decode()
+    return json.loads, json.dumps
+
+class CachingResolver(AbstractResolver):
+    """DNS resolver with a TTL cache that serves the last good answer while lookups fail"""
+
+    def __init__(self, ttl: float = 300.0, stale_ttl: float = 86400.0, lookup_timeout: float = 5.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lookup_timeout = lookup_timeout
+        self.cache: Dict[ResolveKey, Tuple[float, List[Dict[str, Any]]]] = {}  # key -> (resolved at, hosts)
+        self.hits = 0
+        self.lookups = 0
+        self.stale_served = 0
+        self._resolver: Optional[AbstractResolver] = None
+        self._pending: Dict[ResolveKey, asyncio.Future] = {}
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        key = (host, port, family)
+        cached = self.cache.get(key)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+
+        # Connections opened at the same moment share one lookup
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._lookup(key))
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        try:
+            return await asyncio.shield(pending)
+        except (OSError, asyncio.TimeoutError) as e:
+            if cached is None or now - cached[0] > self.stale_ttl:
+                raise
+            self.stale_served += 1
+            logger.warning(f"DNS lookup of {host} failed ({e!r}); using addresses from {now - cached[0]:.0f} s ago")
+            return cached[1]
+
+    async def _lookup(self, key: ResolveKey) -> List[Dict[str, Any]]:
+        if self._resolver is None:
+            # Created here, inside the running loop
+            self._resolver = DefaultResolver()
+        self.lookups += 1
+        hosts = await asyncio.wait_for(self._resolver.resolve(*key), self.lookup_timeout)
+        self.cache[key] = (time.monotonic(), hosts)
+        return hosts
+
+    async def close(self) -> None:
+        # The cache outlives the connector: aiogram recreates it after close()
+        pass
+
+class TunedAiohttpSession(AiohttpSession):
+    """AiohttpSession with a keep-alive pool, cached DNS, per-method timeouts and a pluggable JSON codec"""
+
+    def __init__(
+        self,
+        limit: int = 100,
+        keepalive_timeout: float = 30.0,
+        resolver: Optional[AbstractResolver] = None,
+        timeout: float = 15.0,
+        connect_timeout: float = 5.0,
+        method_timeouts: Optional[Dict[str, float]] = None,
+        json_loads: Callable[..., Any] = json.loads,
+        json_dumps: Callable[..., str] = json.dumps,
+        **kwargs: Any
+    ):
+        super().__init__(timeout=timeout, json_loads=json_loads, json_dumps=json_dumps, **kwargs)
+        self.resolver = resolver or CachingResolver()
+        self.connect_timeout = connect_timeout
+        self.method_timeouts = method_timeouts or {}
+        self._connector_init.update(
+            limit=limit,
+            keepalive_timeout=keepalive_timeout,
+            resolver=self.resolver,
+            # CachingResolver caches; the connector's own cache has no stale fallback
+            use_dns_cache=False
+        )
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[float] = None
+    ) -> TelegramType:
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__, self.timeout)
+            if isinstance(method, GetUpdates) and method.timeout:
+                # A long poll is held open by the server for method.timeout seconds
+                timeout += method.timeout
+        # The connect limit applies to every method, long polls included
+        client_timeout = ClientTimeout(total=timeout, sock_connect=self.connect_timeout)
+        return await super().make_request(bot, method, timeout=client_timeout)
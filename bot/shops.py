@@ -0,0 +1,122 @@
+"""
+Multi-shop mode: many rental shops served by one process
+
+Each shop has its own bot token, owner and SQLite database, listed in the
+JSON file named by SHOPS_FILE:
+
+    [
+        {"name": "north", "bot_token": "123:abc", "owner_id": 111},
+        {"name": "south", "bot_token": "456:def", "owner_id": 222,
+         "database_url": "sqlite+aiosqlite:///data/south.db"}
+    ]
+
+All bots are polled by one dispatcher with one set of routers and share one
+aiohttp connection pool. ShopMiddleware selects the shop for every update,
+so the handlers work unchanged; the catalog cache shares its memory budget
+fairly between shops. An extra shop costs a Bot object, an engine (aiosqlite
+opens connections on demand), an outbox, a scheduler and a maintenance task
+instead of a whole process.
+"""
+import asyncio
+import json
+import logging
+from contextlib import contextmanager
+from typing import List
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import config, current_owner_id
+from db import current_engine, init_db, make_engine
+from bot.app import create_bot, create_dispatcher, create_session
+from bot.middlewares import ShopMiddleware
+from bot.services import create_maintenance, create_outbox, create_scheduler
+
+logger = logging.getLogger(__name__)
+
+class Shop:
+    """One rental shop: its bot, owner, database and background services"""
+
+    def __init__(self, name: str, bot: Bot, owner_id: int, engine: AsyncEngine):
+        self.name = name
+        self.bot = bot
+        self.owner_id = owner_id
+        self.engine = engine
+        self.outbox = create_outbox()
+        self.scheduler = create_scheduler(notifier=self.outbox)
+        self.maintenance = create_maintenance()
+
+    @contextmanager
+    def activate(self):
+        """Route DB sessions and owner checks to this shop (tasks started inside inherit it)"""
+        engine_token = current_engine.set(self.engine)
+        owner_token = current_owner_id.set(self.owner_id)
+        try:
+            yield self
+        finally:
+            current_owner_id.reset(owner_token)
+            current_engine.reset(engine_token)
+
+    async def start(self):
+        with self.activate():
+            await init_db(self.engine)
+            await self.outbox.start(self.bot)
+            await self.scheduler.start()
+            await self.maintenance.start()
+        logger.info(f"Shop '{self.name}' started (bot id {self.bot.id})")
+
+    async def stop(self):
+        await self.maintenance.stop()
+        await self.scheduler.stop()
+        await self.outbox.stop()
+        await self.engine.dispose()
+
+def load_shops(path: str, session: BaseSession) -> List[Shop]:
+    """Read the shops file; all bots share the given HTTP session"""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    shops = []
+    for entry in entries:
+        name = entry['name']
+        url = entry.get('database_url') or f"sqlite+aiosqlite:///data/shop-{name}.db"
+        shops.append(Shop(
+            name=name,
+            bot=create_bot(session=session, token=entry['bot_token']),
+            owner_id=int(entry['owner_id']),
+            engine=make_engine(url)
+        ))
+
+    bot_ids = [shop.bot.id for shop in shops]
+    if len(set(bot_ids)) != len(bot_ids):
+        raise ValueError(f"Duplicate bot tokens in {path}")
+    return shops
+
+async def run_shops(path: str):
+    """Poll every shop's bot with one dispatcher until stopped"""
+    session = create_session(limit=config.HTTP_POOL_SIZE)
+    shops = load_shops(path, session)
+
+    dp = create_dispatcher(background_services=False)
+    dp.update.outer_middleware(ShopMiddleware({shop.bot.id: shop for shop in shops}))
+
+    async def start_shops():
+        await asyncio.gather(*(shop.start() for shop in shops))
+
+    async def stop_shops():
+        await asyncio.gather(*(shop.stop() for shop in shops))
+
+    dp.startup.register(start_shops)
+    dp.shutdown.register(stop_shops)
+
+    logger.info(f"Serving {len(shops)} shops")
+    try:
+        await dp.start_polling(
+            *(shop.bot for shop in shops),
+            allowed_updates=dp.resolve_used_update_types(),
+            # The shared session is closed below, once
+            close_bot_session=False
+        )
+    finally:
+        await session.close()
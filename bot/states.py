@@ -26,6 +26,10 @@ class DeleteToolStates(StatesGroup):
     selecting_tool = State()
     confirming = State()
 
+class TriageStates(StatesGroup):
+    """States for deciding many pending bookings at once"""
+    selecting = State()
+
 class BookingStates(StatesGroup):
     """States for booking a tool"""
     viewing_tool = State()
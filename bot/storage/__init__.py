@@ -0,0 +1,7 @@
+"""
+FSM storage backends
+"""
+from .memory import BoundedMemoryStorage
+from .sqlite import SQLiteStorage
+
+__all__ = ['BoundedMemoryStorage', 'SQLiteStorage']
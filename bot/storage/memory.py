@@ -0,0 +1,160 @@
+"""
+FSM storage in process memory with TTL expiry and a memory cap
+
+aiogram's MemoryStorage keeps every user's state and data forever, so each
+visitor who walks away from a booking wizard leaves a record behind. Here
+records are kept in last-activity order: a record idle for longer than the
+TTL expires (on read, or when the sweeper task finds it), and when the
+estimated size of all records exceeds the cap, the least recently active
+ones are evicted first. A user whose record is gone simply has no state;
+handlers for stale buttons tell them the session expired.
+
+Reading the state counts as activity: the FSM middleware reads it for
+every update, so only users who stopped talking to the bot expire.
+"""
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot.services.cache import estimate_size
+
+logger = logging.getLogger(__name__)
+
+# Key, entry and dict slot overhead of one record
+RECORD_OVERHEAD = 400
+
+@dataclass
+class FSMEntry:
+    touched: float
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    size: int = 0
+
+class BoundedMemoryStorage(BaseStorage):
+    """In-process FSM storage whose records expire after `ttl` idle seconds and share `max_bytes`"""
+
+    def __init__(self, ttl: float, max_bytes: int, sweep_interval: float = 60.0):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # Least recently active first
+        self.records: "OrderedDict[StorageKey, FSMEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _live(self, key: StorageKey) -> Optional[FSMEntry]:
+        """The key's record, refreshed as active, unless it has expired"""
+        entry = self.records.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.touched < now - self.ttl:
+            self._remove(key)
+            self.expired += 1
+            return None
+        entry.touched = now
+        self.records.move_to_end(key)
+        return entry
+
+    def _remove(self, key: StorageKey):
+        entry = self.records.pop(key)
+        self.total_bytes -= entry.size
+
+    def _store(self, key: StorageKey, entry: FSMEntry):
+        """Resize an updated record, dropping it when empty and evicting past the cap"""
+        self.total_bytes -= entry.size
+        if entry.state is None and not entry.data:
+            self.records.pop(key, None)
+            return
+        entry.size = RECORD_OVERHEAD + estimate_size(entry.state) + estimate_size(entry.data)
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and len(self.records) > 1:
+            oldest = next(iter(self.records))
+            if oldest == key:
+                break
+            self._remove(oldest)
+            self.evicted += 1
+
+    def _entry(self, key: StorageKey) -> FSMEntry:
+        entry = self._live(key)
+        if entry is None:
+            entry = self.records[key] = FSMEntry(touched=time.monotonic())
+        return entry
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._store(key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = self._live(key)
+        return entry.state if entry else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = self._entry(key)
+        entry.data = copy.copy(data)
+        self._store(key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = self._live(key)
+        return copy.copy(entry.data) if entry else {}
+
+    async def set_record(self, key: StorageKey, state: StateType, data: Dict[str, Any]) -> None:
+        """State and data at once (see StateProxy)"""
+        entry = self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        entry.data = copy.copy(data)
+        self._store(key, entry)
+
+    def sweep(self) -> int:
+        """Drop the expired records; they are all at the front"""
+        cutoff = time.monotonic() - self.ttl
+        removed = 0
+        while self.records:
+            key, entry = next(iter(self.records.items()))
+            if entry.touched >= cutoff:
+                break
+            self._remove(key)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'states': len(self.records),
+            'bytes': self.total_bytes,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+    async def start(self):
+        """Start the sweeper task (dispatcher startup hook)"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+            stats = self.stats()
+            logger.info(
+                f"FSM storage: {stats['states']} states, {stats['bytes']} bytes, "
+                f"{stats['expired']} expired, {stats['evicted']} evicted"
+            )
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
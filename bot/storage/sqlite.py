@@ -0,0 +1,82 @@
+"""
+FSM storage in the bot's SQLite database
+
+MemoryStorage lives inside one process, so it can't be used when several
+worker processes handle updates (see supervisor.py). This storage keeps
+state and data in the fsm_states table instead, using Core statements on
+the shared engine (the shop's own database in multi-shop mode).
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from db import active_engine
+from models import FSMRecord
+
+def _encode(value: Any) -> Any:
+    """JSON fallback for the date/datetime values handlers keep in FSM data"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    return obj
+
+def dumps_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, ensure_ascii=False)
+
+def loads_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode) if raw else {}
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage shared between processes through the database"""
+
+    def __init__(self, key_builder: Optional[KeyBuilder] = None):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True)
+        self.table = FSMRecord.__table__
+
+    async def _upsert(self, key: StorageKey, **values):
+        record_key = self.key_builder.build(key)
+        statement = insert(self.table).values(key=record_key, updated_at=datetime.utcnow(), **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={**values, 'updated_at': statement.excluded.updated_at}
+        )
+        async with active_engine().begin() as conn:
+            await conn.execute(statement)
+
+    async def _get(self, key: StorageKey, column):
+        async with active_engine().connect() as conn:
+            return await conn.scalar(
+                select(column).where(self.table.c.key == self.key_builder.build(key))
+            )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(key, self.table.c.state)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._upsert(key, data=dumps_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return loads_data(await self._get(key, self.table.c.data))
+
+    async def set_record(self, key: StorageKey, state: StateType, data: Dict[str, Any]) -> None:
+        """State and data in one statement (see StateProxy)"""
+        await self._upsert(key, state=state.state if isinstance(state, State) else state, data=dumps_data(data))
+
+    async def close(self) -> None:
+        pass
@@ -2,24 +2,35 @@
 Configuration management for ToolBot
 """
 import os
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Owner of the shop serving the current update in multi-shop mode (see bot/shops.py)
+current_owner_id: ContextVar[Optional[int]] = ContextVar("current_owner_id", default=None)
+
 class Config:
     """Bot configuration"""
     
+    # Multi-shop mode: JSON list of shops (token, owner, database) served by one process
+    SHOPS_FILE = os.getenv("SHOPS_FILE", "")
+    
     # Bot settings
     BOT_TOKEN = os.getenv("BOT_TOKEN")
-    if not BOT_TOKEN:
+    if not BOT_TOKEN and not SHOPS_FILE:
         raise ValueError("BOT_TOKEN not found in environment variables!")
     
     # Owner settings
     OWNER_ID = int(os.getenv("OWNER_ID", "0"))
-    if OWNER_ID == 0:
+    if OWNER_ID == 0 and not SHOPS_FILE:
         raise ValueError("OWNER_ID not found in environment variables!")
     
+    # Bot API server (empty = api.telegram.org); point at loadtest/fake_api.py for load tests
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+    
     # Database settings
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///data/toolbot.db")
     
@@ -49,20 +60,120 @@ Available commands:
 /deltool - Delete tool
 /bookings - View all bookings
 /stats - View statistics
+/export - Export bookings (CSV/XLSX)
+/inbox - Customer messages
 """
     
     # Booking settings
     MAX_BOOKING_DAYS = 30  # Maximum days for a single booking
     MIN_BOOKING_DAYS = 1   # Minimum days for a booking
     
+    # Booking lifecycle scheduler
+    BOOKING_PENDING_TTL_HOURS = float(os.getenv("BOOKING_PENDING_TTL_HOURS", "48"))  # unanswered requests expire
+    BOOKING_REMINDER_HOURS = float(os.getenv("BOOKING_REMINDER_HOURS", "24"))  # reminder before start_date
+    SCHEDULER_WINDOW_MINUTES = float(os.getenv("SCHEDULER_WINDOW_MINUTES", "60"))  # events loaded ahead
+    
     # Pagination
     TOOLS_PER_PAGE = 5
     BOOKINGS_PER_PAGE = 10
+    INBOX_PAGE_SIZE = 10     # conversations per inbox page
+    THREAD_PAGE_SIZE = 8     # messages per thread page
+    
+    # Throttling (per user, plus per action for expensive taps); owner is exempt
+    THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"
+    THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "4"))  # updates per second per user
+    THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "10"))
+    THROTTLE_ACTION_LIMITS = os.getenv(  # action=rate/burst
+        "THROTTLE_ACTION_LIMITS", "tool_detail=0.5/3,tools_page=2/6,calendar_nav=3/8"
+    )
+    
+    # In-memory FSM storage (single process): abandoned flows expire, memory is capped
+    FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(6 * 3600)))  # seconds since the user's last update
+    FSM_MEMORY_BYTES = int(os.getenv("FSM_MEMORY_BYTES", str(32 * 1024 * 1024)))
+    FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "60"))  # seconds
+    
+    # Albums are handled as one update once no new photo arrived for this long
+    ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", "0.5"))  # seconds
+    
+    # Duplicate submission protection (double taps, retried updates)
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))  # recent keys kept in memory
+    IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "3600"))  # seconds
+    IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "72"))  # rows kept in the DB
+    
+    # Group commit of handler writes (one writer task per database)
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))  # writes per transaction at most
+    WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "2"))  # wait for more writes to join a group
+    
+    # Owner replies to notifications (message id -> customer)
+    REPLY_ROUTE_CACHE_SIZE = int(os.getenv("REPLY_ROUTE_CACHE_SIZE", "10000"))  # routes kept in memory
+    REPLY_ROUTE_TTL_DAYS = float(os.getenv("REPLY_ROUTE_TTL_DAYS", "30"))  # rows kept in the DB
+    
+    # Catalog page cache, shared fairly between shops in multi-shop mode
+    CATALOG_CACHE_BYTES = int(os.getenv("CATALOG_CACHE_BYTES", str(4 * 1024 * 1024)))
+    CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))  # seconds; bounds staleness across workers
+    
+    # Bot API HTTP session (bot/session.py)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))  # connections (shared by all bots in multi-shop mode)
+    HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))  # seconds an idle connection is kept
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # seconds per request, unless listed below
+    HTTP_METHOD_TIMEOUTS = os.getenv(  # method=seconds
+        "HTTP_METHOD_TIMEOUTS", "answerCallbackQuery=5,sendPhoto=60,sendMediaGroup=90,sendDocument=120"
+    )
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # seconds to open a connection
+    HTTP_DNS_TTL = float(os.getenv("HTTP_DNS_TTL", "300"))  # seconds a lookup is cached
+    HTTP_DNS_STALE = float(os.getenv("HTTP_DNS_STALE", "86400"))  # seconds old addresses are used while DNS fails
+    HTTP_JSON = os.getenv("HTTP_JSON", "auto")  # auto (orjson when installed), orjson or json
+    
+    # Notification outbox
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+    OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))  # seconds
+    OUTBOX_SEND_RATE = float(os.getenv("OUTBOX_SEND_RATE", "25"))  # messages per second (Telegram allows ~30)
+    
+    # Database maintenance (with the background services): online backup, ANALYZE, incremental vacuum
+    MAINTENANCE_HOUR = int(os.getenv("MAINTENANCE_HOUR", "3"))  # UTC hour the quiet hours start
+    BACKUP_DIR = os.getenv("BACKUP_DIR", "data/backups")
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))  # newest backups kept per database
+    BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))  # copied per lock hold
+    BACKUP_STEP_PAUSE_MS = float(os.getenv("BACKUP_STEP_PAUSE_MS", "10"))  # writers get the lock between steps
+    
+    # Logging
+    LOG_FILE = os.getenv("LOG_FILE", "toolbot.log")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_ROTATION = os.getenv("LOG_ROTATION", "size")  # size, time or none
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")  # for time rotation
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+    LOG_COMPRESS = os.getenv("LOG_COMPRESS", "1") == "1"  # gzip rotated files
+    LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+    LOG_UPDATE_SAMPLE_RATE = float(os.getenv("LOG_UPDATE_SAMPLE_RATE", "1.0"))  # share of per-update INFO lines kept
+    
+    # Supervisor mode (supervisor.py): one ingress, N worker processes
+    WORKER_COUNT = int(os.getenv("WORKER_COUNT", str(os.cpu_count() or 1)))
+    WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))  # updates buffered per worker
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "100"))  # updates handled at once per worker
+    METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "60"))  # seconds between aggregated reports
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # empty = long polling
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    
+    # Traffic recording for load testing (gzip JSONL, disabled when empty)
+    RECORD_UPDATES_PATH = os.getenv("RECORD_UPDATES_PATH", "")
+    RECORD_SCRUB_TEXT = os.getenv("RECORD_SCRUB_TEXT", "0") == "1"
+    
+    @classmethod
+    def owner_id(cls) -> int:
+        """Owner of the current shop (OWNER_ID outside multi-shop mode)"""
+        owner_id = current_owner_id.get()
+        return cls.OWNER_ID if owner_id is None else owner_id
     
     @classmethod
     def is_owner(cls, user_id: int) -> bool:
         """Check if user is the bot owner"""
-        return user_id == cls.OWNER_ID
+        return user_id == cls.owner_id()
 
 # Create config instance
 config = Config()
\ No newline at end of file
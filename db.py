@@ -1,37 +1,135 @@
 """
 Database configuration and session management
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from models import Base
+from contextvars import ContextVar
+from typing import Optional
+import logging
 import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # Ensure data directory exists
 Path("data").mkdir(exist_ok=True)
 
 # Get database URL from environment or use default
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///data/toolbot.db")
 
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; busy_timeout waits for the lock"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))}")
+    # Only takes effect before the first table is created; maintenance converts older files
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    if os.getenv("DB_WAL", "1") == "1":
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def make_engine(url: str, **kwargs) -> AsyncEngine:
+    """Create an async engine with the SQLite connection settings applied"""
+    new_engine = create_async_engine(
+        url,
+        echo=False,  # Set to True for SQL query logging
+        future=True,
+        **kwargs
+    )
+    if url.startswith("sqlite"):
+        event.listen(new_engine.sync_engine, "connect", _configure_sqlite)
+    return new_engine
+
 # Create async engine
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Set to True for SQL query logging
-    future=True
-)
+engine = make_engine(DATABASE_URL)
+
+# Multi-shop mode (bot/shops.py) gives every shop its own database; the engine
+# of the shop serving the current update is kept here
+current_engine: ContextVar[Optional[AsyncEngine]] = ContextVar("current_engine", default=None)
+
+def active_engine() -> AsyncEngine:
+    """Engine of the current shop, or the default engine"""
+    return current_engine.get() or engine
+
+class ShopSessionMaker(async_sessionmaker):
+    """Session factory that binds new sessions to the current shop's engine"""
+    
+    def __call__(self, **local_kw):
+        shop_engine = current_engine.get()
+        if shop_engine is not None:
+            local_kw.setdefault("bind", shop_engine)
+        return super().__call__(**local_kw)
 
 # Create async session maker
-async_session = async_sessionmaker(
+async_session = ShopSessionMaker(
     engine, 
     class_=AsyncSession, 
     expire_on_commit=False
 )
 
-async def init_db():
+# Values for columns added to existing tables, computed from the old columns
+COLUMN_BACKFILLS = {
+    ('tools', 'photo_count'): "UPDATE tools SET photo_count = coalesce(json_array_length(image_ids), 0)",
+}
+
+def upgrade_schema(sync_conn):
+    """Add columns and indexes that existing tables are missing (create_all skips them)"""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            # New columns must be nullable or carry a server_default
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            default = ''
+            if column.server_default is not None:
+                default = f" DEFAULT {column.server_default.arg}"
+            sync_conn.exec_driver_sql(
+                f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}'
+            )
+            logger.info(f"Added column {table.name}.{column.name}")
+            backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+            if backfill:
+                sync_conn.exec_driver_sql(backfill)
+        
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+def backfill_conversations(sync_conn):
+    """Build the inbox summary from the messages stored before it existed"""
+    sync_conn.exec_driver_sql(
+        "INSERT INTO conversations "
+        "(user_id, last_message_at, last_text, last_from_owner, unread, message_count) "
+        "SELECT m.user_id, m.timestamp, substr(m.text, 1, 200), coalesce(m.is_from_owner, 0), 0, g.n "
+        "FROM (SELECT user_id, max(id) AS last_id, count(*) AS n FROM messages GROUP BY user_id) AS g "
+        "JOIN messages AS m ON m.id = g.last_id"
+    )
+
+def backfill_inbox_totals(sync_conn):
+    """Sum the unread counters kept before the totals row existed"""
+    sync_conn.exec_driver_sql(
+        "INSERT INTO inbox_totals (id, unread) SELECT 1, coalesce(sum(unread), 0) FROM conversations"
+    )
+
+async def init_db(bind: Optional[AsyncEngine] = None):
     """Initialize database tables"""
-    async with engine.begin() as conn:
+    async with (bind or engine).begin() as conn:
+        had_conversations = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('conversations'))
+        had_totals = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('inbox_totals'))
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
+        # Bring tables created by older versions up to date
+        await conn.run_sync(upgrade_schema)
+        if not had_conversations:
+            await conn.run_sync(backfill_conversations)
+        if not had_totals:
+            await conn.run_sync(backfill_inbox_totals)
     print("Database initialized successfully!")
 
 async def get_session() -> AsyncSession:
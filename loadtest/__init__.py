@@ -0,0 +1,3 @@
+"""
+Load-testing tools: traffic replay, simulators and benchmarks
+"""
@@ -0,0 +1,245 @@
+"""
+Local stand-in for the Telegram Bot API used by end-to-end load tests
+
+Implements the methods this bot uses (getMe, getUpdates, sendMessage,
+editMessageText, editMessageReplyMarkup, sendPhoto, sendMediaGroup,
+answerCallbackQuery, ...) with configurable latency and error injection,
+plus a scripted update source served through getUpdates.
+
+Usage:
+    python -m loadtest.fake_api --port 8081 --updates updates.jsonl.gz --speed 5 \\
+        --latency-ms 40 --jitter-ms 20 --rate-429 0.01 --rate-5xx 0.005
+
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+
+Control endpoints:
+    POST /_control/updates   push a JSON update (or a list of them)
+    GET  /_control/stats     request counters and injected errors
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from loadtest.offline import fake_result
+from loadtest.replay import load_records
+
+logger = logging.getLogger(__name__)
+
+# Parameters that are sent as JSON-encoded strings in form requests
+JSON_PARAMS = ('reply_markup', 'media', 'allowed_updates', 'entities', 'caption_entities')
+
+class FakeTelegramAPI:
+    """In-memory Bot API server"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: int = 1,
+        rate_5xx: float = 0.0,
+        rate_timeout: float = 0.0,
+        timeout_s: float = 90.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_5xx = rate_5xx
+        self.rate_timeout = rate_timeout
+        self.timeout_s = timeout_s
+        self.random = random.Random(seed)
+
+        self.pending_updates: List[Dict[str, Any]] = []
+        self.next_update_id = 1
+        self._updates_available = asyncio.Event()
+
+        self.requests: Dict[str, int] = {}
+        self.injected: Dict[str, int] = {'429': 0, '5xx': 0, 'timeout': 0}
+
+    # === UPDATE SOURCE ===
+    def push_update(self, update: Dict[str, Any]):
+        """Queue an update for getUpdates, renumbering update_id to keep order"""
+        update = dict(update)
+        update['update_id'] = self.next_update_id
+        self.next_update_id += 1
+        self.pending_updates.append(update)
+        self._updates_available.set()
+
+    async def play_script(self, records: List[Dict[str, Any]], speed: float = 1.0):
+        """Release recorded updates with their original spacing scaled by speed"""
+        if not records:
+            return
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first_ts = records[0]['ts']
+        for record in records:
+            if speed > 0:
+                delay = (record['ts'] - first_ts) / speed - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.push_update(record['update'])
+        logger.info(f"Scripted source finished: {len(records)} updates")
+
+    async def get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Long-polling getUpdates honouring offset, limit and timeout"""
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+
+        if offset:
+            # Updates below offset are confirmed and can be forgotten
+            self.pending_updates = [u for u in self.pending_updates if u['update_id'] >= offset]
+        if not self.pending_updates and timeout > 0:
+            self._updates_available.clear()
+            try:
+                await asyncio.wait_for(self._updates_available.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.pending_updates[:limit]
+
+    # === REQUEST HANDLING ===
+    @staticmethod
+    async def _read_params(request: web.Request) -> Dict[str, Any]:
+        params: Dict[str, Any] = dict(request.query)
+        if request.content_type == 'application/json':
+            params.update(await request.json())
+        elif request.can_read_body:
+            form = await request.post()
+            for key, value in form.items():
+                # Uploaded files are accepted but their content is ignored
+                params[key] = value if isinstance(value, str) else f"upload:{key}"
+        for key in JSON_PARAMS:
+            if isinstance(params.get(key), str):
+                try:
+                    params[key] = json.loads(params[key])
+                except ValueError:
+                    pass
+        return params
+
+    def _inject_error(self, method: str) -> Optional[str]:
+        roll = self.random.random()
+        if roll < self.rate_429:
+            return '429'
+        roll -= self.rate_429
+        if roll < self.rate_5xx:
+            return '5xx'
+        roll -= self.rate_5xx
+        if roll < self.rate_timeout:
+            return 'timeout'
+        return None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.requests[method] = self.requests.get(method, 0) + 1
+
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        error = self._inject_error(method)
+        if error:
+            self.injected[error] += 1
+        if error == '429':
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after}
+            }, status=429)
+        if error == '5xx':
+            return web.json_response({
+                'ok': False,
+                'error_code': 502,
+                'description': "Bad Gateway"
+            }, status=502)
+        if error == 'timeout':
+            # Hold the connection longer than the client is willing to wait
+            await asyncio.sleep(self.timeout_s)
+
+        params = await self._read_params(request)
+        if method == 'getUpdates':
+            result = await self.get_updates(params)
+        else:
+            result = fake_result(method, params)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def handle_push(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        updates = payload if isinstance(payload, list) else [payload]
+        for update in updates:
+            self.push_update(update)
+        return web.json_response({'ok': True, 'queued': len(self.pending_updates)})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'requests': self.requests,
+            'injected': self.injected,
+            'pending_updates': len(self.pending_updates)
+        })
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/_control/updates', self.handle_push)
+        app.router.add_get('/_control/stats', self.handle_stats)
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        return app
+
+async def start_server(api: FakeTelegramAPI, host: str = '127.0.0.1', port: int = 8081) -> web.AppRunner:
+    """Start the fake API in the running loop; call runner.cleanup() to stop"""
+    runner = web.AppRunner(api.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Fake Telegram Bot API listening on http://{host}:{port}")
+    return runner
+
+async def serve(args):
+    api = FakeTelegramAPI(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        rate_5xx=args.rate_5xx,
+        rate_timeout=args.rate_timeout,
+        timeout_s=args.timeout_s,
+        seed=args.seed
+    )
+    runner = await start_server(api, args.host, args.port)
+    try:
+        if args.updates:
+            await api.play_script(load_records(args.updates), speed=args.speed)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for load tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--updates', help="Recorded updates served through getUpdates")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Speed of the scripted update source; 0 = all at once")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Base latency per request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Uniform random extra latency")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after sent with 429s")
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="Fraction of 502 responses")
+    parser.add_argument('--rate-timeout', type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument('--timeout-s', type=float, default=90.0, help="How long hanging requests hang")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for error injection")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Write-burst benchmark of the group-commit writer
+
+Fires bursts of concurrent booking submissions at a scratch database - each
+one the write confirm_booking does: idempotency key, booking, customer note
+and owner notification - in two ways:
+  direct   - every submission in its own transaction, as the handlers wrote before
+  grouped  - through bot/services/writer.py (one transaction per group)
+and reports committed writes per second, failed submissions ("database is
+locked") and the submitters' latency percentiles.
+
+Usage:
+    python -m loadtest.group_commit --burst 200 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+from loadtest.replay import configure_environment
+from loadtest.seed import DataGenerator, bulk_insert, chunks
+
+TOOLS = 20
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+async def run(args) -> List[Dict[str, Any]]:
+    from sqlalchemy.exc import OperationalError
+    from db import init_db, async_session
+    from models import Booking, BookingStatus, IdempotencyKey, Tool
+    from bot.services import enqueue_notification, record_message
+    from bot.services.writer import GroupCommitWriter
+
+    await init_db()
+    generator = DataGenerator(seed=0)
+    await bulk_insert(Tool.__table__, chunks(TOOLS, generator.tools, 1), TOOLS, 'tools')
+    start = datetime(2030, 1, 1)
+    submissions = iter(range(10 ** 9))
+
+    async def write(session, n: int):
+        session.add(IdempotencyKey(key=f"booking:bench-{n}"))
+        booking = Booking(
+            user_id=n, user_fullname=f"Customer {n}", tool_id=n % TOOLS + 1,
+            start_date=start, end_date=start + timedelta(days=2), delivery_required=False,
+            status=BookingStatus.PENDING, total_price=30.0
+        )
+        session.add(booking)
+        await session.flush()
+        await record_message(session, n, "Is it free?", booking_id=booking.id, user_fullname=f"Customer {n}")
+        enqueue_notification(session, 1, f"New booking #{booking.id}", route=(n, booking.id))
+        return booking.id
+
+    async def direct(n: int):
+        async with async_session() as session:
+            result = await write(session, n)
+            await session.commit()
+            return result
+
+    writer = GroupCommitWriter(max_batch=args.batch_size, max_delay=args.delay_ms / 1000)
+
+    async def grouped(n: int):
+        return await writer.submit(lambda session: write(session, n))
+
+    async def burst(submit: Callable[[int], Awaitable[Any]]) -> Dict[str, Any]:
+        latencies: List[float] = []
+        errors = 0
+
+        async def one():
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                await submit(next(submissions))
+            except OperationalError:  # "database is locked" once busy_timeout is used up
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.burst)))
+        return {'seconds': time.perf_counter() - started, 'latencies': latencies, 'errors': errors}
+
+    results = []
+    for name, submit in (('direct', direct), ('grouped', grouped)):
+        await burst(submit)  # warm up connections and statement caches
+        rounds = [await burst(submit) for _ in range(args.rounds)]
+        latencies = [value for item in rounds for value in item['latencies']]
+        errors = sum(item['errors'] for item in rounds)
+        results.append({
+            'mode': name,
+            'writes_per_s': (args.burst * args.rounds - errors) / sum(item['seconds'] for item in rounds),
+            'errors': errors,
+            'p50_ms': statistics.median(latencies),
+            'p95_ms': percentile(latencies, 0.95),
+            'max_ms': max(latencies),
+        })
+    stats = writer.stats()
+    await writer.stop()
+    results[-1]['per_commit'] = stats['per_commit']
+    return results
+
+def render_report(results: List[Dict[str, Any]]) -> str:
+    lines = [
+        "| mode | writes/s | errors | p50 ms | p95 ms | max ms | writes per commit |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for row in results:
+        per_commit = f"{row['per_commit']:.1f}" if 'per_commit' in row else "1.0"
+        lines.append(
+            f"| {row['mode']} | {row['writes_per_s']:.0f} | {row['errors']} | {row['p50_ms']:.1f} | {row['p95_ms']:.1f} | "
+            f"{row['max_ms']:.1f} | {per_commit} |"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-handler transactions with group commit on write bursts")
+    parser.add_argument('--burst', type=int, default=200, help="Concurrent submissions per burst")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=64, help="Writes per group commit at most")
+    parser.add_argument('--delay-ms', type=float, default=2.0, help="Wait for a group to fill")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-group-commit-') as workdir:
+        configure_environment(f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+        results = asyncio.run(run(args))
+    print(render_report(results))
+
+if __name__ == '__main__':
+    main()
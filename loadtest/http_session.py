@@ -0,0 +1,165 @@
+"""
+Bot API client benchmark: aiogram's default session versus the tuned one
+
+Starts loadtest/fake_api.py in-process and, for each session, measures:
+  send     - sendMessage calls with an inline keyboard, `--concurrency` at
+             a time: requests per second and latency percentiles
+  updates  - getUpdates returning `--batch` callback updates (what a busy
+             bot's polling loop parses): milliseconds per batch
+  outage   - requests that succeed while every DNS lookup fails and each
+             request needs a new connection
+The fake API is addressed by host name, so DNS lookups are part of the path.
+
+Usage:
+    python -m loadtest.http_session --requests 3000 --concurrency 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from typing import Any, Dict, List
+
+from loadtest.replay import configure_environment
+
+BATCH_CHAT = 1000
+
+def callback_update(n: int) -> Dict[str, Any]:
+    user = {'id': BATCH_CHAT + n, 'is_bot': False, 'first_name': f"Customer {n}", 'username': f"customer{n}"}
+    return {
+        'callback_query': {
+            'id': str(n),
+            'from': user,
+            'chat_instance': str(n),
+            'data': f"tool_detail:{n % 50}",
+            'message': {
+                'message_id': n,
+                'date': 1700000000,
+                'chat': {'id': user['id'], 'type': 'private', 'first_name': user['first_name']},
+                'from': {'id': 42, 'is_bot': True, 'first_name': 'ToolBot'},
+                'text': "🛠 Available tools (page 1/4)\n\nChoose a tool to see its details:",
+                'reply_markup': {'inline_keyboard': [
+                    [{'text': f"🔨 Tool {i} - $12.50/day", 'callback_data': f"tool_detail:{i}"}] for i in range(5)
+                ] + [[{'text': "Next ➡️", 'callback_data': 'tools_page:2'}]]},
+            },
+        }
+    }
+
+async def run(args) -> List[Dict[str, Any]]:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.exceptions import TelegramNetworkError
+    from aiogram.methods import GetUpdates
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
+    from bot.app import create_session
+    from bot.session import CachingResolver
+    from loadtest.fake_api import FakeTelegramAPI, start_server
+
+    api = FakeTelegramAPI(latency_ms=args.latency_ms, seed=0)
+    runner = await start_server(api, '127.0.0.1', args.port)
+    server = TelegramAPIServer.from_base(f"http://localhost:{args.port}")
+
+    keyboard = InlineKeyboardBuilder()
+    for i in range(5):
+        keyboard.button(text=f"🔨 Tool {i} - $12.50/day", callback_data=f"tool_detail:{i}")
+    keyboard.adjust(1)
+    markup = keyboard.as_markup()
+
+    sessions = {
+        'default': lambda: AiohttpSession(api=server),
+        'tuned': create_session,
+    }
+    results = []
+    try:
+        for name, make_session in sessions.items():
+            session = make_session()
+            session.api = server
+            bot = Bot(token='42:benchmark', session=session)
+            row: Dict[str, Any] = {'session': name}
+
+            latencies: List[float] = []
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def send(n: int):
+                async with semaphore:
+                    started = time.perf_counter()
+                    await bot.send_message(chat_id=BATCH_CHAT + n, text=f"Message {n}", reply_markup=markup)
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            await asyncio.gather(*(send(n) for n in range(args.concurrency)))  # open the pool
+            latencies.clear()
+            started = time.perf_counter()
+            await asyncio.gather(*(send(n) for n in range(args.requests)))
+            row['send_rps'] = args.requests / (time.perf_counter() - started)
+            row['send_p50'] = statistics.median(latencies)
+            row['send_p95'] = sorted(latencies)[int(len(latencies) * 0.95)]
+
+            timings = []
+            for _ in range(args.rounds):
+                for n in range(args.batch):
+                    api.push_update(callback_update(n))
+                started = time.perf_counter()
+                updates = await bot(GetUpdates(offset=api.next_update_id - args.batch, limit=args.batch))
+                timings.append((time.perf_counter() - started) * 1000)
+                assert len(updates) == args.batch
+            row['updates_ms'] = statistics.median(timings)
+            api.pending_updates.clear()
+
+            # DNS outage: every lookup fails and each request needs a new connection
+            loop = asyncio.get_running_loop()
+            resolve = loop.getaddrinfo
+
+            async def no_dns(*a, **kw):
+                raise socket.gaierror(socket.EAI_AGAIN, "Temporary failure in name resolution")
+
+            if isinstance(getattr(session, 'resolver', None), CachingResolver):
+                session.resolver.ttl = 0  # the cached addresses are stale by now
+            loop.getaddrinfo = no_dns
+            row['outage_ok'] = 0
+            try:
+                for n in range(args.outage_requests):
+                    await session.close()
+                    try:
+                        await bot.send_message(chat_id=BATCH_CHAT, text=f"During the outage {n}")
+                        row['outage_ok'] += 1
+                    except TelegramNetworkError:
+                        pass
+            finally:
+                loop.getaddrinfo = resolve
+
+            await session.close()
+            results.append(row)
+    finally:
+        await runner.cleanup()
+    return results
+
+def render_report(results: List[Dict[str, Any]], args) -> str:
+    lines = [
+        f"| session | sendMessage req/s | p50 ms | p95 ms | getUpdates x{args.batch} ms | ok during DNS outage |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for row in results:
+        lines.append(
+            f"| {row['session']} | {row['send_rps']:.0f} | {row['send_p50']:.1f} | {row['send_p95']:.1f} | "
+            f"{row['updates_ms']:.1f} | {row['outage_ok']}/{args.outage_requests} |"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the default and the tuned Bot API session against the fake API")
+    parser.add_argument('--requests', type=int, default=3000, help="sendMessage calls per session")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Fake API latency per request")
+    parser.add_argument('--batch', type=int, default=100, help="Updates per getUpdates response")
+    parser.add_argument('--rounds', type=int, default=20, help="getUpdates calls (median reported)")
+    parser.add_argument('--outage-requests', type=int, default=20, help="Requests sent during the DNS outage")
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args(argv)
+
+    configure_environment("sqlite+aiosqlite:///:memory:")
+    results = asyncio.run(run(args))
+    print(render_report(results, args))
+
+if __name__ == '__main__':
+    main()
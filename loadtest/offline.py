@@ -0,0 +1,112 @@
+"""
+Offline Bot API session - answers every request locally without network I/O
+
+Used by the replayer and the simulator so handlers can run at full speed
+against a scratch database without talking to api.telegram.org.
+"""
+import itertools
+import json
+import time
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+FAKE_BOT_USER = {
+    'id': 42,
+    'is_bot': True,
+    'first_name': 'ToolBot',
+    'username': 'toolbot_fake_bot'
+}
+
+_message_ids = itertools.count(1000)
+
+def _chat(chat_id: Any) -> Dict[str, Any]:
+    try:
+        chat_id = int(chat_id)
+    except (TypeError, ValueError):
+        chat_id = 0
+    return {'id': chat_id, 'type': 'private'}
+
+def _message(params: Dict[str, Any], message_id: Optional[int] = None, **extra) -> Dict[str, Any]:
+    message = {
+        'message_id': message_id or next(_message_ids),
+        'date': int(time.time()),
+        'chat': _chat(params.get('chat_id')),
+        'from': FAKE_BOT_USER
+    }
+    for key in ('text', 'caption', 'reply_markup'):
+        if params.get(key) is not None:
+            message[key] = params[key]
+    message.update(extra)
+    return message
+
+def fake_result(api_method: str, params: Dict[str, Any]) -> Any:
+    """
+    Build a plausible Bot API result for the given method and parameters
+
+    Args:
+        api_method: Bot API method name (e.g. "sendMessage")
+        params: Request parameters; nested objects are plain dicts
+    """
+    if api_method == 'getMe':
+        return FAKE_BOT_USER
+    if api_method == 'getUpdates':
+        return []
+    if api_method in ('sendMessage', 'sendPhoto', 'sendDocument'):
+        extra = {}
+        if api_method == 'sendPhoto':
+            extra['photo'] = [{'file_id': str(params.get('photo')), 'file_unique_id': 'p', 'width': 1, 'height': 1}]
+        if api_method == 'sendDocument':
+            extra['document'] = {'file_id': 'document', 'file_unique_id': 'd'}
+        return _message(params, **extra)
+    if api_method == 'sendMediaGroup':
+        media = params.get('media') or []
+        if isinstance(media, str):
+            media = json.loads(media)
+        group_id = str(next(_message_ids))
+        return [
+            _message(
+                {'chat_id': params.get('chat_id'), 'caption': item.get('caption')},
+                media_group_id=group_id,
+                photo=[{'file_id': str(item.get('media')), 'file_unique_id': 'p', 'width': 1, 'height': 1}]
+            )
+            for item in media
+        ]
+    if api_method in ('editMessageText', 'editMessageReplyMarkup', 'editMessageCaption'):
+        if params.get('inline_message_id'):
+            return True
+        return _message(params, message_id=params.get('message_id'))
+    # answerCallbackQuery, deleteMessage, deleteWebhook, setMyCommands, ...
+    return True
+
+class OfflineSession(BaseSession):
+    """Bot session that never leaves the process"""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.calls: Dict[str, int] = {}
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        api_method = method.__api_method__
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+
+        params = self.prepare_value(
+            method.model_dump(warnings=False), bot=bot, files={}, _dumps_json=False
+        )
+        content = json.dumps({'ok': True, 'result': fake_result(api_method, params)})
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result
+
+    async def stream_content(
+        self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+        chunk_size: int = 65536, raise_for_status: bool = True
+    ) -> AsyncGenerator[bytes, None]:
+        yield b''
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,138 @@
+"""
+Per-page allocation benchmark of the list-view read models
+
+Seeds a scratch database and builds each list page both ways: with the
+queries the handlers ran before (Row tuples for the catalog, image_ids
+decoded for the owner's list, ORM Booking entities with their tools for
+"my bookings") and with the read-model queries in bot/services/read_models.py.
+For every page it reports the memory allocated while building it
+(tracemalloc peak above the starting point), the memory the result keeps,
+and the median time.
+
+Usage:
+    python -m loadtest.read_models --tools 2000 --bookings 50 --repeat 20
+"""
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List
+
+from loadtest.replay import configure_environment
+from loadtest.seed import DataGenerator, bulk_insert, chunks
+
+CUSTOMER_ID = 1
+
+async def measure(build: Callable[[], Awaitable[Any]], repeat: int) -> Dict[str, float]:
+    """Allocation and timing of one page build"""
+    await build()  # warm up statement caches and connections
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = await build()
+    _, peak = tracemalloc.get_traced_memory()
+    gc.collect()
+    kept, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await build()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'peak_kb': (peak - start_size) / 1024,
+        'kept_kb': (kept - start_size) / 1024,
+        'ms': statistics.median(timings),
+    }
+
+async def run(args) -> List[Dict[str, Any]]:
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import selectinload
+    from config import config
+    from db import init_db, async_session
+    from models import Booking, Tool
+    from bot.services.read_models import load_catalog_page, load_owner_tools, load_user_bookings
+
+    await init_db()
+    generator = DataGenerator(seed=args.seed)
+    await bulk_insert(Tool.__table__, chunks(args.tools, generator.tools, 1), args.tools, 'tools')
+    rows = generator.bookings(1, args.bookings, args.tools, 1)
+    for row in rows:
+        row['user_id'] = CUSTOMER_ID
+    await bulk_insert(Booking.__table__, iter([rows]), args.bookings, 'bookings')
+
+    async def before_catalog_page():
+        async with async_session() as session:
+            total = await session.scalar(select(func.count(Tool.id)).where(Tool.available == True))
+            result = await session.execute(
+                select(Tool.id, Tool.name, Tool.price_per_day, Tool.available)
+                .where(Tool.available == True).order_by(Tool.id).limit(config.TOOLS_PER_PAGE)
+            )
+            return total, tuple(result.all())
+
+    async def before_owner_tools():
+        async with async_session() as session:
+            result = await session.execute(
+                select(Tool.id, Tool.name, Tool.price_per_day, Tool.available, Tool.image_ids).order_by(Tool.id)
+            )
+            return [
+                (tool_id, name, price_per_day, available, len(image_ids or []))
+                for tool_id, name, price_per_day, available, image_ids in result
+            ]
+
+    async def before_user_bookings():
+        async with async_session() as session:
+            result = await session.execute(
+                select(Booking).options(selectinload(Booking.tool))
+                .where(Booking.user_id == CUSTOMER_ID).order_by(Booking.created_at.desc()).limit(10)
+            )
+            return result.scalars().all()
+
+    pages = [
+        ('catalog page', before_catalog_page, lambda: load_catalog_page(1, config.TOOLS_PER_PAGE)),
+        (f'owner tools ({args.tools})', before_owner_tools, load_owner_tools),
+        ('my bookings', before_user_bookings, lambda: load_user_bookings(CUSTOMER_ID)),
+    ]
+    results = []
+    for name, before_build, after_build in pages:
+        results.append({
+            'page': name,
+            'before': await measure(before_build, args.repeat),
+            'after': await measure(after_build, args.repeat),
+        })
+    return results
+
+def render_report(results: List[Dict[str, Any]]) -> str:
+    lines = [
+        "| page | peak KB before | peak KB after | kept KB before | kept KB after | ms before | ms after |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for item in results:
+        before, after = item['before'], item['after']
+        lines.append(
+            f"| {item['page']} | {before['peak_kb']:.1f} | {after['peak_kb']:.1f} | {before['kept_kb']:.1f} | "
+            f"{after['kept_kb']:.1f} | {before['ms']:.2f} | {after['ms']:.2f} |"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare list-page allocations before and after the read models")
+    parser.add_argument('--tools', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=50, help="Bookings of the benchmarked customer")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per page (median reported)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-read-models-') as workdir:
+        configure_environment(f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+        results = asyncio.run(run(args))
+    print(render_report(results))
+
+if __name__ == '__main__':
+    main()
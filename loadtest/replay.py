@@ -0,0 +1,205 @@
+"""
+Replay recorded update traffic through the dispatcher against a scratch database
+
+Usage:
+    python -m loadtest.replay updates.jsonl.gz --speed 1     # real time
+    python -m loadtest.replay updates.jsonl.gz --speed 10    # 10x faster
+    python -m loadtest.replay updates.jsonl.gz --speed 0     # as fast as possible
+
+Record traffic by starting the bot with RECORD_UPDATES_PATH=updates.jsonl.gz.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Read a recorded (optionally gzipped) JSONL file"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of a list of latencies in milliseconds"""
+    return {
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p90_ms': round(percentile(latencies_ms, 90), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+        'max_ms': round(max(latencies_ms, default=0.0), 2)
+    }
+
+def prepare_scratch_db(seed_from: Optional[str], workdir: str) -> str:
+    """Create a scratch SQLite file (optionally a copy of an existing DB) and return its URL"""
+    path = os.path.join(workdir, 'replay.db')
+    if seed_from and os.path.exists(seed_from):
+        shutil.copyfile(seed_from, path)
+    return f"sqlite+aiosqlite:///{path}"
+
+def configure_environment(database_url: str, owner_id: Optional[int] = None):
+    """Point config/db at the scratch database - must run before they are imported"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('BOT_TOKEN', '42:replay-token')
+    if owner_id:
+        os.environ['OWNER_ID'] = str(owner_id)
+    elif not os.getenv('OWNER_ID', '').isdigit():
+        os.environ['OWNER_ID'] = '1'
+    os.environ['RECORD_UPDATES_PATH'] = ''
+    # Replays run faster than real time, which would trip the per-user limits
+    os.environ.setdefault('THROTTLE_ENABLED', '0')
+
+class Replayer:
+    """Feeds recorded updates into a dispatcher and measures handler latency"""
+
+    def __init__(self, dp, bot, speed: float = 1.0, concurrency: int = 100):
+        self.dp = dp
+        self.bot = bot
+        self.speed = speed
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.latencies: List[float] = []
+        self.by_type: Dict[str, List[float]] = {}
+        self.handled = 0
+        self.unhandled = 0
+        self.errors = 0
+        self.error_types: Dict[str, int] = {}
+
+    async def _feed(self, update):
+        from aiogram.dispatcher.event.bases import UNHANDLED
+
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.dp.feed_update(self.bot, update)
+                if response is UNHANDLED:
+                    self.unhandled += 1
+                else:
+                    self.handled += 1
+            except Exception as e:
+                self.errors += 1
+                self.error_types[type(e).__name__] = self.error_types.get(type(e).__name__, 0) + 1
+            elapsed = (time.perf_counter() - started) * 1000
+        self.latencies.append(elapsed)
+        self.by_type.setdefault(update.event_type, []).append(elapsed)
+
+    async def run(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        from aiogram.types import Update
+
+        updates = [
+            (record['ts'], Update.model_validate(record['update'], context={'bot': self.bot}))
+            for record in records
+        ]
+        tasks = []
+        first_ts = updates[0][0] if updates else 0.0
+        started = time.perf_counter()
+
+        for ts, update in updates:
+            if self.speed > 0:
+                # Keep the recorded inter-arrival gaps, scaled by speed
+                due = (ts - first_ts) / self.speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Max speed: only wait for a free concurrency slot
+                await self.semaphore.acquire()
+                self.semaphore.release()
+            tasks.append(asyncio.create_task(self._feed(update)))
+
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+        return self.report(wall)
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        """Throughput and latency summary"""
+        total = len(self.latencies)
+        return {
+            'updates': total,
+            'handled': self.handled,
+            'unhandled': self.unhandled,
+            'errors': self.errors,
+            'error_types': self.error_types,
+            'wall_s': round(wall, 3),
+            'throughput_ups': round(total / wall, 1) if wall else 0.0,
+            'latency': latency_summary(self.latencies),
+            'by_type': {
+                event_type: {'count': len(values), **latency_summary(values)}
+                for event_type, values in sorted(self.by_type.items())
+            }
+        }
+
+def print_report(report: Dict[str, Any], title: str = "Replay report"):
+    """Human readable report"""
+    latency = report['latency']
+    print(f"\n{title}")
+    print("=" * len(title))
+    print(f"Updates:     {report['updates']} "
+          f"(handled {report['handled']}, unhandled {report['unhandled']}, errors {report['errors']})")
+    for error_type, count in report['error_types'].items():
+        print(f"  error {error_type}: {count}")
+    print(f"Wall time:   {report['wall_s']} s")
+    print(f"Throughput:  {report['throughput_ups']} updates/s")
+    print(f"Latency:     p50 {latency['p50_ms']} ms, p90 {latency['p90_ms']} ms, "
+          f"p99 {latency['p99_ms']} ms, max {latency['max_ms']} ms")
+    for event_type, stats in report['by_type'].items():
+        print(f"  {event_type:<16} n={stats['count']:<6} p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms")
+
+async def replay(args) -> Dict[str, Any]:
+    """Set up a scratch bot/dispatcher and replay the recording"""
+    # Imported late so the scratch DATABASE_URL is picked up
+    from db import init_db, engine
+    from bot.app import create_bot, create_dispatcher
+    from loadtest.offline import OfflineSession
+
+    await init_db()
+    bot = create_bot(session=OfflineSession())
+    dp = create_dispatcher()
+
+    records = load_records(args.path)
+    replayer = Replayer(dp, bot, speed=args.speed, concurrency=args.concurrency)
+    try:
+        report = await replayer.run(records)
+    finally:
+        await bot.session.close()
+        await engine.dispose()
+    report['api_calls'] = bot.session.calls
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded ToolBot update traffic")
+    parser.add_argument('path', help="Recorded updates (.jsonl or .jsonl.gz)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed multiplier; 0 = as fast as possible")
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help="Maximum updates processed at the same time")
+    parser.add_argument('--seed-from', default='data/toolbot.db',
+                        help="SQLite file copied into the scratch DB before replay")
+    parser.add_argument('--owner-id', type=int, default=None,
+                        help="Owner Telegram ID the recording was made with")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-replay-') as workdir:
+        configure_environment(prepare_scratch_db(args.seed_from, workdir), args.owner_id)
+        report = asyncio.run(replay(args))
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
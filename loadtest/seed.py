@@ -0,0 +1,334 @@
+"""
+Large-dataset generator and query-latency scaling report
+
+Grows a scratch database through a series of scale points, inserting a
+realistic catalog and history with bulk executemany inserts (Zipf-skewed
+tool and customer popularity, seasonal booking dates), and times the hot
+queries the handlers run at every point. The report shows how each query
+grows with data size next to its SQLite query plan, so O(n) paths stand out.
+
+Usage:
+    python -m loadtest.seed --tools 100000 --bookings 10000000 --messages 2000000 \\
+        --scales 0.001,0.01,0.1,1 --db data/loadtest.db --output scaling.md
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from loadtest.replay import configure_environment
+
+CHUNK_SIZE = 10_000
+
+class DataGenerator:
+    """Produces rows for tools, bookings and messages"""
+
+    def __init__(self, seed: int = 0, skew: float = 1.1):
+        self.random = random.Random(seed)
+        self.skew = skew
+        self.now = datetime.utcnow().replace(microsecond=0)
+        # Two years of history plus three months of future bookings
+        self.first_day = self.now - timedelta(days=730)
+        self.days = 730 + 90
+        # Summer peak: weight 1.8 in July, 0.2 in January
+        self.day_weights = list(itertools.accumulate(
+            1.0 + 0.8 * math.sin(2 * math.pi * ((self.first_day + timedelta(days=d)).timetuple().tm_yday - 105) / 365)
+            for d in range(self.days)
+        ))
+
+    def _zipf_cum_weights(self, n: int) -> List[float]:
+        return list(itertools.accumulate(1 / (rank ** self.skew) for rank in range(1, n + 1)))
+
+    def tools(self, start_id: int, count: int) -> List[Dict[str, Any]]:
+        rows = []
+        for tool_id in range(start_id, start_id + count):
+            photos = self.random.randint(0, 4)
+            rows.append({
+                'id': tool_id,
+                'name': f"Tool {tool_id}",
+                'description': "Heavy duty rental tool. " * self.random.randint(2, 12),
+                'price_per_day': round(self.random.uniform(5, 120), 2),
+                'image_ids': [f"photo-{tool_id}-{i}" for i in range(photos)],
+                'photo_count': photos,
+                'available': self.random.random() < 0.9,
+                'created_at': self.first_day,
+                'updated_at': self.first_day
+            })
+        return rows
+
+    def bookings(self, start_id: int, count: int, tool_count: int, user_count: int) -> List[Dict[str, Any]]:
+        from models import BookingStatus
+
+        tool_weights = self._zipf_cum_weights(tool_count)
+        user_weights = self._zipf_cum_weights(user_count)
+        tool_ids = self.random.choices(range(1, tool_count + 1), cum_weights=tool_weights, k=count)
+        user_ids = self.random.choices(range(1, user_count + 1), cum_weights=user_weights, k=count)
+        day_offsets = self.random.choices(range(self.days), cum_weights=self.day_weights, k=count)
+
+        rows = []
+        for i in range(count):
+            start = self.first_day + timedelta(days=day_offsets[i])
+            days = self.random.randint(1, 7)
+            end = start + timedelta(days=days - 1)
+            if end < self.now:
+                status = BookingStatus.CANCELLED if self.random.random() < 0.1 else BookingStatus.COMPLETED
+            else:
+                status = BookingStatus.PENDING if self.random.random() < 0.3 else BookingStatus.CONFIRMED
+            created = start - timedelta(days=self.random.randint(0, 30), minutes=self.random.randint(0, 1439))
+            rows.append({
+                'id': start_id + i,
+                'user_id': 1_000_000 + user_ids[i],
+                'user_username': f"user{user_ids[i]}",
+                'user_fullname': f"Customer {user_ids[i]}",
+                'tool_id': tool_ids[i],
+                'start_date': start,
+                'end_date': end,
+                'delivery_required': self.random.random() < 0.3,
+                'delivery_address': None,
+                'status': status,
+                'total_price': round(days * self.random.uniform(5, 120), 2),
+                'created_at': created,
+                'updated_at': created
+            })
+        return rows
+
+    def messages(self, start_id: int, count: int, booking_count: int, user_count: int) -> List[Dict[str, Any]]:
+        user_weights = self._zipf_cum_weights(user_count)
+        user_ids = self.random.choices(range(1, user_count + 1), cum_weights=user_weights, k=count)
+        rows = []
+        for i in range(count):
+            timestamp = self.first_day + timedelta(minutes=self.random.randint(0, self.days * 1440))
+            rows.append({
+                'id': start_id + i,
+                'user_id': 1_000_000 + user_ids[i],
+                'booking_id': self.random.randint(1, booking_count) if booking_count and self.random.random() < 0.5 else None,
+                'text': "Hello, is this tool available next weekend?",
+                'is_from_owner': self.random.random() < 0.3,
+                'timestamp': timestamp
+            })
+        return rows
+
+async def bulk_insert(table, rows_iter, total: int, label: str):
+    """Insert rows with executemany in chunks inside one transaction"""
+    from sqlalchemy import insert
+    from db import engine
+
+    if total <= 0:
+        return
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        inserted = 0
+        for rows in rows_iter:
+            await conn.execute(insert(table), rows)
+            inserted += len(rows)
+    print(f"  inserted {inserted} {label} in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+def chunks(total: int, make: Callable[[int, int], List[Dict[str, Any]]], first_id: int):
+    """Yield generated rows chunk by chunk so memory stays flat"""
+    for offset in range(0, total, CHUNK_SIZE):
+        yield make(first_id + offset, min(CHUNK_SIZE, total - offset))
+
+# === HOT QUERIES ===
+# Statements kept identical to the ones the handlers run
+def hot_queries(params: Dict[str, Any]) -> Dict[str, List[Any]]:
+    from sqlalchemy import select, func, exists
+    from sqlalchemy.orm import selectinload
+    from config import config
+    from models import Tool, Booking, BookingStatus
+
+    active = [BookingStatus.PENDING, BookingStatus.CONFIRMED]
+    start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0)
+    probe_start = datetime.utcnow() + timedelta(days=10)
+    probe_end = probe_start + timedelta(days=3)
+    return {
+        'browse_count': [
+            select(func.count(Tool.id)).where(Tool.available == True)
+        ],
+        'browse_page_first': [
+            select(Tool).where(Tool.available == True).order_by(Tool.id).offset(0).limit(config.TOOLS_PER_PAGE)
+        ],
+        'browse_page_last': [
+            select(Tool).where(Tool.available == True).order_by(Tool.id)
+            .offset(params['last_page_offset']).limit(config.TOOLS_PER_PAGE)
+        ],
+        'my_bookings': [
+            select(Booking).options(selectinload(Booking.tool))
+            .where(Booking.user_id == params['hot_user_id'])
+            .order_by(Booking.created_at.desc()).limit(10)
+        ],
+        'stats': [
+            select(func.count(Tool.id)),
+            select(func.count(Booking.id)),
+            select(func.count(Booking.id)).where(Booking.status == BookingStatus.PENDING),
+            select(func.count(Booking.id)).where(Booking.status == BookingStatus.CONFIRMED),
+            select(func.count(Booking.id)).where(Booking.status == BookingStatus.COMPLETED),
+            select(func.sum(Booking.total_price)).where(
+                Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.COMPLETED])),
+            select(func.count(Booking.id)).where(Booking.created_at >= start_of_month),
+            select(func.sum(Booking.total_price)).where(
+                Booking.created_at >= start_of_month,
+                Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.COMPLETED]))
+        ],
+        'active_bookings_check': [
+            select(func.count(Booking.id)).where(
+                Booking.tool_id == params['hot_tool_id'], Booking.status.in_(active))
+        ],
+        'overlap_check': [
+            select(exists().where(
+                Booking.tool_id == params['hot_tool_id'],
+                Booking.status.in_(active),
+                Booking.start_date <= probe_end,
+                Booking.end_date >= probe_start))
+        ]
+    }
+
+async def time_queries(params: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Median latency and query plan of every hot query"""
+    from db import async_session, engine
+
+    results = {}
+    for name, statements in hot_queries(params).items():
+        timings = []
+        for _ in range(repeat):
+            async with async_session() as session:
+                started = time.perf_counter()
+                for statement in statements:
+                    result = await session.execute(statement)
+                    result.all()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        plans = []
+        async with engine.connect() as conn:
+            for statement in statements:
+                compiled = statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+                rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+                plans.extend(row[-1] for row in rows)
+        results[name] = {
+            'ms': round(statistics.median(timings), 3),
+            'plan': '; '.join(dict.fromkeys(plans))
+        }
+    return results
+
+def growth_exponent(sizes: List[int], timings: List[float]) -> float:
+    """Slope of log(time) over log(size): ~0 constant, ~1 linear"""
+    points = [(math.log(s), math.log(max(t, 1e-3))) for s, t in zip(sizes, timings) if s > 0]
+    if len(points) < 2:
+        return 0.0
+    (x0, y0), (x1, y1) = points[0], points[-1]
+    return round((y1 - y0) / (x1 - x0), 2) if x1 != x0 else 0.0
+
+def render_report(points: List[Dict[str, Any]]) -> str:
+    """Markdown table: queries x scale points, growth exponent and plan"""
+    sizes = [point['bookings'] for point in points]
+    header = "| query | " + " | ".join(f"{p['tools']} tools / {p['bookings']} bookings" for p in points)
+    header += " | growth | plan at largest scale |"
+    lines = [
+        "# Query latency scaling report (median ms)",
+        "",
+        header,
+        "|" + "---|" * (len(points) + 3)
+    ]
+    for name in points[-1]['queries']:
+        timings = [point['queries'][name]['ms'] for point in points]
+        exponent = growth_exponent(sizes, timings)
+        flag = " **O(n)**" if exponent >= 0.5 else ""
+        lines.append(
+            f"| {name} | " + " | ".join(f"{t:.2f}" for t in timings)
+            + f" | {exponent}{flag} | {points[-1]['queries'][name]['plan']} |"
+        )
+    lines.append("")
+    lines.append("growth = log-log slope between the smallest and largest scale (≈0 constant, ≈1 linear).")
+    return "\n".join(lines)
+
+async def run(args) -> List[Dict[str, Any]]:
+    from sqlalchemy import select, func
+    from db import init_db, engine, async_session
+    from models import Tool, Booking, Message
+
+    await init_db()
+    generator = DataGenerator(seed=args.seed, skew=args.skew)
+    scales = sorted(float(s) for s in args.scales.split(','))
+    have = {'tools': 0, 'bookings': 0, 'messages': 0}
+    points = []
+
+    for scale in scales:
+        want = {
+            'tools': max(1, int(args.tools * scale)),
+            'bookings': int(args.bookings * scale),
+            'messages': int(args.messages * scale)
+        }
+        users = max(1, want['bookings'] // args.bookings_per_user)
+        print(f"Scale {scale}: {want}", file=sys.stderr)
+
+        # Grow the dataset by the missing rows only
+        new_tools = want['tools'] - have['tools']
+        await bulk_insert(Tool.__table__, chunks(
+            new_tools, generator.tools, have['tools'] + 1), new_tools, 'tools')
+        new_bookings = want['bookings'] - have['bookings']
+        await bulk_insert(Booking.__table__, chunks(
+            new_bookings, lambda first, n: generator.bookings(first, n, want['tools'], users),
+            have['bookings'] + 1), new_bookings, 'bookings')
+        new_messages = want['messages'] - have['messages']
+        await bulk_insert(Message.__table__, chunks(
+            new_messages, lambda first, n: generator.messages(first, n, want['bookings'], users),
+            have['messages'] + 1), new_messages, 'messages')
+        have = want
+
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+        async with async_session() as session:
+            available = await session.scalar(select(func.count(Tool.id)).where(Tool.available == True))
+        params = {
+            'hot_tool_id': 1,
+            'hot_user_id': 1_000_001,
+            'last_page_offset': max(0, available - 5)
+        }
+        points.append({**want, 'queries': await time_queries(params, args.repeat)})
+
+    await engine.dispose()
+    return points
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a large dataset and report hot-query scaling")
+    parser.add_argument('--tools', type=int, default=100_000, help="Tools at scale 1")
+    parser.add_argument('--bookings', type=int, default=10_000_000, help="Bookings at scale 1")
+    parser.add_argument('--messages', type=int, default=2_000_000, help="Messages at scale 1")
+    parser.add_argument('--bookings-per-user', type=int, default=5)
+    parser.add_argument('--scales', default='0.001,0.01,0.1', help="Comma separated scale factors")
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of tool/customer popularity")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query (median reported)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default='', help="Keep the generated SQLite file at this path (must not exist)")
+    parser.add_argument('--output', default='', help="Write the markdown report to this file")
+    parser.add_argument('--json', action='store_true', help="Print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-seed-') as workdir:
+        path = os.path.abspath(args.db) if args.db else os.path.join(workdir, 'seed.db')
+        if os.path.exists(path):
+            parser.error(f"{path} already exists")
+        configure_environment(f"sqlite+aiosqlite:///{path}")
+        points = asyncio.run(run(args))
+
+    if args.json:
+        json.dump(points, sys.stdout, indent=2)
+        print()
+        return
+    report = render_report(points)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+    print(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Synthetic customer population driving the full booking funnel through the dispatcher
+
+Every simulated customer browses the catalog, opens a tool, walks the
+calendar and confirms a booking (BookingStates), and some of them contact
+the owner (MessageStates). Tool choice is Zipf-skewed so a handful of
+popular tools receive most of the traffic.
+
+Usage:
+    python -m loadtest.simulate --customers 5000 --tools 40 --hot-skew 1.2 --think-ms 300
+    python -m loadtest.simulate --customers 500 --api-url http://127.0.0.1:8081
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from loadtest.replay import configure_environment, latency_summary, prepare_scratch_db
+
+FUNNEL = [
+    'browse', 'page', 'detail', 'book', 'calendar_nav',
+    'start_date', 'end_date', 'delivery', 'message', 'confirm'
+]
+CONTACT_FUNNEL = ['contact', 'contact_message']
+
+class DBWriteProbe:
+    """Times write statements on the engine; SQLite lock waits are spent inside them"""
+
+    WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'COMMIT')
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.durations: List[float] = []
+        self.lock_errors = 0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, 'before_cursor_execute', self._before)
+        event.listen(sync_engine, 'after_cursor_execute', self._after)
+        event.listen(sync_engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_probe_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_probe_started'].pop()
+        if statement.lstrip().upper().startswith(self.WRITE_PREFIXES):
+            self.durations.append((time.perf_counter() - started) * 1000)
+
+    def _error(self, context):
+        if 'locked' in str(context.original_exception):
+            self.lock_errors += 1
+
+class Simulation:
+    """Runs the customer population and collects funnel metrics"""
+
+    def __init__(self, dp, bot, tool_ids: List[int], args):
+        self.dp = dp
+        self.bot = bot
+        self.tool_ids = tool_ids
+        self.args = args
+        self.random = random.Random(args.seed)
+        # Zipf weights: rank r gets 1 / r^skew
+        self.tool_weights = [1 / (rank ** args.hot_skew) for rank in range(1, len(tool_ids) + 1)]
+
+        self.ids = itertools.count(1)
+        self.reached: Dict[str, int] = {stage: 0 for stage in FUNNEL + CONTACT_FUNNEL}
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in FUNNEL + CONTACT_FUNNEL}
+        self.errors = 0
+        self.unhandled = 0
+
+    # === UPDATE BUILDERS ===
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"Customer {user_id}"}
+
+    def _message(self, user_id: int, text: str) -> Dict[str, Any]:
+        return {
+            'update_id': next(self.ids),
+            'message': {
+                'message_id': next(self.ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': self._user(user_id),
+                'text': text
+            }
+        }
+
+    def _callback(self, user_id: int, data: str) -> Dict[str, Any]:
+        return {
+            'update_id': next(self.ids),
+            'callback_query': {
+                'id': str(next(self.ids)),
+                'chat_instance': str(user_id),
+                'from': self._user(user_id),
+                'data': data,
+                'message': {
+                    'message_id': 1,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': 42, 'is_bot': True, 'first_name': 'ToolBot'},
+                    'text': '...'
+                }
+            }
+        }
+
+    async def _step(self, stage: str, raw_update: Dict[str, Any]) -> bool:
+        """Feed one update, record its latency and whether a handler took it"""
+        from aiogram.dispatcher.event.bases import UNHANDLED
+        from aiogram.types import Update
+
+        update = Update.model_validate(raw_update, context={'bot': self.bot})
+        started = time.perf_counter()
+        try:
+            response = await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+            return False
+        finally:
+            self.latencies[stage].append((time.perf_counter() - started) * 1000)
+        if response is UNHANDLED:
+            self.unhandled += 1
+            return False
+        self.reached[stage] += 1
+        return True
+
+    async def _think(self):
+        if self.args.think_ms > 0:
+            await asyncio.sleep(self.random.expovariate(1000 / self.args.think_ms))
+
+    def _abandons(self) -> bool:
+        return self.random.random() < self.args.abandon
+
+    # === CUSTOMER FLOWS ===
+    async def booking_flow(self, user_id: int):
+        """BookingStates funnel from /tools to confirm_booking"""
+        tool_id = self.random.choices(self.tool_ids, weights=self.tool_weights)[0]
+        start = date.today() + timedelta(days=self.random.randint(1, 28))
+        end = start + timedelta(days=self.random.randint(0, 6))
+        total_pages = max(1, -(-len(self.tool_ids) // self.args.tools_per_page))
+
+        steps = [
+            ('browse', self._message(user_id, '/tools')),
+            ('page', self._callback(user_id, f"tools_page:{self.random.randint(1, total_pages)}")),
+            ('detail', self._callback(user_id, f"tool_detail:{tool_id}")),
+            ('book', self._callback(user_id, f"book_tool:{tool_id}")),
+            ('calendar_nav', self._callback(user_id, f"calendar_nav:{start.year}:{start.month}")),
+            ('start_date', self._callback(user_id, f"calendar:{start.year}:{start.month}:{start.day}")),
+            ('end_date', self._callback(user_id, f"calendar:{end.year}:{end.month}:{end.day}")),
+            ('delivery', self._callback(user_id, 'delivery_no')),
+            ('message', self._message(user_id, '/skip')),
+            ('confirm', self._callback(user_id, 'confirm_booking'))
+        ]
+        for stage, update in steps:
+            if not await self._step(stage, update):
+                return
+            if stage != 'confirm' and self._abandons():
+                return
+            await self._think()
+
+    async def contact_flow(self, user_id: int):
+        """MessageStates funnel: /contact then the message text"""
+        if await self._step('contact', self._message(user_id, '/contact')):
+            await self._think()
+            await self._step('contact_message', self._message(user_id, "Is the saw free this weekend?"))
+
+    async def customer(self, index: int):
+        user_id = 10_000_000 + index
+        # Spread arrivals over the ramp-up period
+        await asyncio.sleep(self.random.uniform(0, self.args.ramp_s))
+        await self.booking_flow(user_id)
+        if self.random.random() < self.args.contact_rate:
+            await self.contact_flow(user_id)
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        await asyncio.gather(*(self.customer(i) for i in range(self.args.customers)))
+        return time.perf_counter() - started
+
+async def seed_tools(count: int) -> List[int]:
+    """Create a catalog of available tools in the scratch DB"""
+    from db import async_session
+    from models import Tool
+
+    async with async_session() as session:
+        tools = [
+            Tool(
+                name=f"Load Test Tool {i}",
+                description="Synthetic tool for load testing",
+                price_per_day=10.0 + i,
+                image_ids=[],
+                available=True
+            )
+            for i in range(count)
+        ]
+        session.add_all(tools)
+        await session.commit()
+        return [tool.id for tool in tools]
+
+async def conflict_stats() -> Dict[str, Any]:
+    """Bookings whose dates overlap another booking of the same tool"""
+    from sqlalchemy import select, func, and_
+    from sqlalchemy.orm import aliased
+    from db import async_session
+    from models import Booking
+
+    other = aliased(Booking)
+    async with async_session() as session:
+        total = await session.scalar(select(func.count(Booking.id)))
+        conflicting = await session.scalar(
+            select(func.count(func.distinct(Booking.id)))
+            .join(other, and_(
+                other.tool_id == Booking.tool_id,
+                other.id != Booking.id,
+                other.start_date <= Booking.end_date,
+                other.end_date >= Booking.start_date
+            ))
+        )
+    return {
+        'bookings': total,
+        'conflicting': conflicting,
+        'conflict_rate': round(conflicting / total, 4) if total else 0.0
+    }
+
+def build_report(sim: Simulation, wall: float, probe: DBWriteProbe, conflicts: Dict[str, Any]) -> Dict[str, Any]:
+    all_latencies = [value for values in sim.latencies.values() for value in values]
+    funnel = []
+    previous = sim.args.customers
+    for stage in FUNNEL + CONTACT_FUNNEL:
+        count = sim.reached[stage]
+        base = previous if stage != 'contact' else sim.args.customers
+        funnel.append({
+            'stage': stage,
+            'reached': count,
+            'conversion': round(count / base, 3) if base else 0.0,
+            **latency_summary(sim.latencies[stage])
+        })
+        previous = count
+    return {
+        'customers': sim.args.customers,
+        'wall_s': round(wall, 3),
+        'updates': len(all_latencies),
+        'throughput_ups': round(len(all_latencies) / wall, 1) if wall else 0.0,
+        'bookings_per_s': round(sim.reached['confirm'] / wall, 2) if wall else 0.0,
+        'errors': sim.errors,
+        'unhandled': sim.unhandled,
+        'latency': latency_summary(all_latencies),
+        'funnel': funnel,
+        'conflicts': conflicts,
+        'db_writes': {
+            'statements': len(probe.durations),
+            'total_ms': round(sum(probe.durations), 1),
+            'lock_errors': probe.lock_errors,
+            **latency_summary(probe.durations)
+        }
+    }
+
+def print_report(report: Dict[str, Any]):
+    latency = report['latency']
+    print("\nBooking funnel simulation")
+    print("=========================")
+    print(f"Customers:   {report['customers']}  wall {report['wall_s']} s  "
+          f"errors {report['errors']}  unhandled {report['unhandled']}")
+    print(f"Throughput:  {report['throughput_ups']} updates/s, {report['bookings_per_s']} bookings/s")
+    print(f"Latency:     p50 {latency['p50_ms']} ms, p90 {latency['p90_ms']} ms, p99 {latency['p99_ms']} ms")
+    print(f"\n{'stage':<16}{'reached':>9}{'conv':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in report['funnel']:
+        print(f"{row['stage']:<16}{row['reached']:>9}{row['conversion']:>8}{row['p50_ms']:>10}{row['p99_ms']:>10}")
+    conflicts = report['conflicts']
+    print(f"\nBooking conflicts: {conflicts['conflicting']} of {conflicts['bookings']} "
+          f"({conflicts['conflict_rate'] * 100:.2f}%)")
+    writes = report['db_writes']
+    print(f"DB writes (incl. lock wait): {writes['statements']} statements, total {writes['total_ms']} ms, "
+          f"p99 {writes['p99_ms']} ms, max {writes['max_ms']} ms, lock errors {writes['lock_errors']}")
+
+async def simulate(args) -> Dict[str, Any]:
+    # Imported late so the scratch DATABASE_URL is picked up
+    from config import config
+    from db import init_db, engine
+    from bot.app import create_bot, create_dispatcher
+    from loadtest.offline import OfflineSession
+
+    await init_db()
+    tool_ids = await seed_tools(args.tools)
+    probe = DBWriteProbe(engine)
+
+    bot = create_bot(session=None if args.api_url else OfflineSession())
+    dp = create_dispatcher()
+    args.tools_per_page = config.TOOLS_PER_PAGE
+
+    sim = Simulation(dp, bot, tool_ids, args)
+    try:
+        wall = await sim.run()
+        conflicts = await conflict_stats()
+    finally:
+        await bot.session.close()
+        await engine.dispose()
+    return build_report(sim, wall, probe, conflicts)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a customer population against the booking funnel")
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--tools', type=int, default=40, help="Catalog size")
+    parser.add_argument('--hot-skew', type=float, default=1.2, help="Zipf exponent of tool popularity")
+    parser.add_argument('--think-ms', type=float, default=300.0, help="Mean think time between steps")
+    parser.add_argument('--ramp-s', type=float, default=5.0, help="Arrivals are spread over this period")
+    parser.add_argument('--abandon', type=float, default=0.05, help="Probability of leaving after each step")
+    parser.add_argument('--contact-rate', type=float, default=0.2, help="Share of customers who message the owner")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--api-url', default='', help="Use a (fake) Bot API server instead of the offline session")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-sim-') as workdir:
+        configure_environment(prepare_scratch_db(None, workdir))
+        os.environ['TELEGRAM_API_URL'] = args.api_url
+        report = asyncio.run(simulate(args))
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-query Python overhead of inline select() versus the prebuilt statements
+
+For each hot query it measures, in microseconds per call:
+  build  - constructing the statement and computing its cache key (the part
+           the prebuilt statements skip; their key is memoized)
+  run    - a full execution through a session, as the handlers do it
+against a small scratch database, so the numbers are dominated by Python
+overhead rather than SQLite.
+
+Usage:
+    python -m loadtest.statements --calls 5000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from loadtest.replay import configure_environment
+from loadtest.seed import DataGenerator, bulk_insert, chunks
+
+TOOLS = 50
+
+async def run(args) -> List[Dict[str, Any]]:
+    from sqlalchemy import func, select
+    from db import init_db, async_session
+    from models import Booking, Tool
+    from bot.services.statements import AVAILABLE_TOOLS_COUNT, CATALOG_PAGE, TOOL_BY_ID, USER_BOOKINGS
+
+    await init_db()
+    generator = DataGenerator(seed=0)
+    await bulk_insert(Tool.__table__, chunks(TOOLS, generator.tools, 1), TOOLS, 'tools')
+
+    # name -> (inline builder, prebuilt statement, parameters of call i)
+    queries: Dict[str, Tuple[Callable[[int], Any], Any, Callable[[int], Dict[str, Any]]]] = {
+        'available tools count': (
+            lambda i: select(func.count(Tool.id)).where(Tool.available == True),
+            AVAILABLE_TOOLS_COUNT,
+            lambda i: {},
+        ),
+        'catalog page': (
+            lambda i: select(Tool.id, Tool.name, Tool.price_per_day, Tool.available)
+            .where(Tool.available == True).order_by(Tool.id).offset(i % 5 * 5).limit(5),
+            CATALOG_PAGE,
+            lambda i: {'offset': i % 5 * 5, 'limit': 5},
+        ),
+        'tool by id': (
+            lambda i: select(Tool).where(Tool.id == i % TOOLS + 1),
+            TOOL_BY_ID,
+            lambda i: {'tool_id': i % TOOLS + 1},
+        ),
+        'user bookings': (
+            lambda i: select(
+                Booking.id, Booking.status, Tool.name, Booking.start_date, Booking.end_date, Booking.total_price
+            ).join(Tool, Tool.id == Booking.tool_id).where(Booking.user_id == i)
+            .order_by(Booking.created_at.desc()).limit(10),
+            USER_BOOKINGS,
+            lambda i: {'user_id': i, 'limit': 10},
+        ),
+    }
+
+    def per_call(started: float) -> float:
+        return (time.perf_counter() - started) / args.calls * 1e6
+
+    results = []
+    async with async_session() as session:
+        for name, (inline, prebuilt, params) in queries.items():
+            row = {'query': name}
+            started = time.perf_counter()
+            for i in range(args.calls):
+                inline(i)._generate_cache_key()
+            row['inline_build'] = per_call(started)
+            started = time.perf_counter()
+            for i in range(args.calls):
+                prebuilt._generate_cache_key()
+                params(i)
+            row['prebuilt_build'] = per_call(started)
+
+            started = time.perf_counter()
+            for i in range(args.calls):
+                (await session.execute(inline(i))).all()
+                session.expunge_all()
+            row['inline_run'] = per_call(started)
+            started = time.perf_counter()
+            for i in range(args.calls):
+                (await session.execute(prebuilt, params(i))).all()
+                session.expunge_all()
+            row['prebuilt_run'] = per_call(started)
+            results.append(row)
+
+        # The previous way to load a tool
+        started = time.perf_counter()
+        for i in range(args.calls):
+            await session.get(Tool, i % TOOLS + 1)
+            session.expunge_all()
+        results.append({'query': 'session.get(Tool)', 'inline_run': per_call(started)})
+    return results
+
+def render_report(results: List[Dict[str, Any]]) -> str:
+    def cell(row: Dict[str, Any], key: str) -> str:
+        return f"{row[key]:.1f}" if key in row else "-"
+
+    lines = [
+        "| query | build µs inline | build µs prebuilt | run µs inline | run µs prebuilt |",
+        "|---|---:|---:|---:|---:|",
+    ]
+    for row in results:
+        lines.append(
+            f"| {row['query']} | {cell(row, 'inline_build')} | {cell(row, 'prebuilt_build')} | "
+            f"{cell(row, 'inline_run')} | {cell(row, 'prebuilt_run')} |"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare inline select() with the prebuilt hot statements")
+    parser.add_argument('--calls', type=int, default=5000, help="Calls per measurement")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='toolbot-statements-') as workdir:
+        configure_environment(f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+        results = asyncio.run(run(args))
+    print(render_report(results))
+
+if __name__ == '__main__':
+    main()
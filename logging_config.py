@@ -0,0 +1,114 @@
+"""
+Logging setup: records are queued on the event loop thread and written by a
+background listener thread with rotation, compression and optional JSON output
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from config import config
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# aiogram logs one INFO line per update ("Update id=... is handled. Duration ...")
+UPDATE_LOGGER = 'aiogram.event'
+
+class UpdateLogSampler(logging.Filter):
+    """Keep 1 in N per-update INFO lines; WARNING and above always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or record.name != UPDATE_LOGGER:
+            return True
+        if not self.every:
+            return False
+        self.seen += 1
+        record.sample_every = self.every
+        return (self.seen - 1) % self.every == 0
+
+class LoopQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Snapshot the message so mutable args can't change before it is written;
+        # tracebacks (exc_info) are still formatted on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if getattr(record, 'sample_every', 1) > 1:
+            entry['sample_every'] = record.sample_every
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _gzip_rotator(source: str, dest: str):
+    """Compress the rotated file instead of renaming it"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def _file_handler() -> logging.Handler:
+    if config.LOG_ROTATION == 'time':
+        handler = TimedRotatingFileHandler(
+            config.LOG_FILE,
+            when=config.LOG_ROTATE_WHEN,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    elif config.LOG_ROTATION == 'size':
+        handler = RotatingFileHandler(
+            config.LOG_FILE,
+            maxBytes=config.LOG_MAX_BYTES,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    else:
+        return logging.FileHandler(config.LOG_FILE, encoding='utf-8')
+
+    if config.LOG_COMPRESS:
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = _gzip_rotator
+    return handler
+
+def setup_logging() -> QueueListener:
+    """Route all logging through a queue; returns the started listener (stop it on exit)"""
+    formatter = JsonFormatter() if config.LOG_JSON else logging.Formatter(LOG_FORMAT)
+    handlers = [_file_handler(), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = LoopQueueHandler(log_queue)
+    # Sampling runs before enqueueing, so dropped lines cost almost nothing
+    queue_handler.addFilter(UpdateLogSampler(config.LOG_UPDATE_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
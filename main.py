@@ -3,52 +3,40 @@ ToolBot Mini - Main entry point
 """
 import asyncio
 import logging
-import sys
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
 
 from config import config
 from db import init_db
-from bot.handlers import owner_router, user_router, common_router
+from bot.app import create_bot, create_dispatcher
+from bot.shops import run_shops
+from logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('toolbot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (written from a background thread)
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
 async def main():
     """Initialize and start the bot"""
+    if config.SHOPS_FILE:
+        logger.info(f"Starting in multi-shop mode ({config.SHOPS_FILE})...")
+        await run_shops(config.SHOPS_FILE)
+        return
+    
     # Initialize database
     logger.info("Initializing database...")
     await init_db()
     
     # Initialize bot and dispatcher
-    bot = Bot(
-        token=config.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    dp = Dispatcher(storage=MemoryStorage())
+    bot = create_bot()
     
     # Register handlers
     logger.info("Registering handlers...")
-    
-    # Register routers in order of priority
-    dp.include_router(owner_router)   # Owner-specific handlers FIRST
-    dp.include_router(user_router)    # User handlers
-    dp.include_router(common_router)  # Common handlers LAST (includes fallback)
+    dp = create_dispatcher()
     
     # Start bot
     logger.info("Starting bot...")
     try:
-        await dp.start_polling(bot)
+        # Telegram only sends the update types the routers handle
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     except Exception as e:
         logger.error(f"Error occurred: {e}")
     finally:
@@ -58,4 +46,6 @@ if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
\ No newline at end of file
+        logger.info("Bot stopped by user")
+    finally:
+        log_listener.stop()
@@ -0,0 +1,44 @@
+"""
+ToolBot Mini - run the database maintenance jobs now
+
+The bot runs them every night by itself (see bot/services/maintenance.py);
+this is for a backup before an upgrade, or after a large cleanup. It is safe
+while the bot is running.
+
+Usage:
+    python maintenance.py [--jobs backup analyze vacuum] [--database-url URL]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from config import config
+from db import make_engine
+from bot.services.maintenance import JOBS, create_maintenance
+
+async def run(jobs, database_url: str) -> bool:
+    engine = make_engine(database_url)
+    maintenance = create_maintenance()
+    maintenance.engine = engine
+    try:
+        if maintenance.database is None:
+            logging.error(f"Not a SQLite database file: {database_url}")
+            return False
+        durations = await maintenance.run_jobs(jobs)
+        return len(durations) == len(jobs)
+    finally:
+        await engine.dispose()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up, ANALYZE and vacuum the database now")
+    parser.add_argument('--jobs', nargs='+', choices=JOBS, default=list(JOBS))
+    parser.add_argument('--database-url', default=config.DATABASE_URL, help="A shop's database in multi-shop mode")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not asyncio.run(run(args.jobs, args.database_url)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,11 @@ Database models for ToolBot Mini
 from datetime import datetime
 from typing import List, Optional
 from sqlalchemy import (
-    Column, Integer, String, Text, Float, Boolean, 
-    DateTime, ForeignKey, JSON, Enum
+    Column, Integer, BigInteger, String, Text, Float, Boolean, 
+    DateTime, ForeignKey, JSON, Enum, Index
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 import enum
 
 Base = declarative_base()
@@ -19,6 +19,11 @@ class BookingStatus(enum.Enum):
     CANCELLED = "cancelled"
     COMPLETED = "completed"
 
+class OutboxStatus(enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
 class Tool(Base):
     __tablename__ = 'tools'
     
@@ -27,6 +32,7 @@ class Tool(Base):
     description = Column(Text, nullable=False)
     price_per_day = Column(Float, nullable=False)
     image_ids = Column(JSON, default=list)  # List of Telegram file_ids
+    photo_count = Column(Integer, nullable=False, default=0, server_default='0')  # len(image_ids), for lists
     available = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -34,6 +40,12 @@ class Tool(Base):
     # Relationships
     bookings = relationship("Booking", back_populates="tool", cascade="all, delete-orphan")
     
+    @validates('image_ids')
+    def _count_photos(self, key, image_ids):
+        # Lists read photo_count instead of decoding image_ids
+        self.photo_count = len(image_ids or [])
+        return image_ids
+    
     def __repr__(self):
         return f"<Tool(id={self.id}, name='{self.name}', price={self.price_per_day})>"
     
@@ -61,6 +73,7 @@ class Booking(Base):
     delivery_address = Column(Text, nullable=True)
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     total_price = Column(Float, nullable=False)
+    reminder_sent_at = Column(DateTime, nullable=True)  # Set by the lifecycle scheduler
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -68,6 +81,18 @@ class Booking(Base):
     tool = relationship("Tool", back_populates="bookings")
     messages = relationship("Message", back_populates="booking", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Lifecycle scheduler window queries (see bot/services/scheduler.py)
+        Index('ix_bookings_status_created', 'status', 'created_at'),
+        Index('ix_bookings_status_start', 'status', 'start_date'),
+        Index('ix_bookings_status_end', 'status', 'end_date'),
+        # Owner booking console filters, paged by id (see bot/services/booking_console.py)
+        Index('ix_bookings_status_id', 'status', 'id'),
+        Index('ix_bookings_tool_id', 'tool_id', 'id'),
+        Index('ix_bookings_tool_status', 'tool_id', 'status', 'id'),
+        Index('ix_bookings_start', 'start_date'),
+    )
+    
     def __repr__(self):
         return f"<Booking(id={self.id}, user_id={self.user_id}, tool_id={self.tool_id}, status={self.status.value})>"
     
@@ -95,5 +120,102 @@ class Message(Base):
     # Relationships
     booking = relationship("Booking", back_populates="messages")
     
+    __table_args__ = (
+        # Owner inbox thread pages (see bot/services/inbox.py)
+        Index('ix_messages_user_timestamp', 'user_id', 'timestamp'),
+    )
+    
+    def __repr__(self):
+        return f"<Message(id={self.id}, user_id={self.user_id}, timestamp={self.timestamp})>"
+
+class Conversation(Base):
+    """Per-customer inbox summary, updated with every message (see bot/services/inbox.py)"""
+    __tablename__ = 'conversations'
+    
+    user_id = Column(Integer, primary_key=True)  # Telegram user ID
+    user_fullname = Column(String(255), nullable=True)
+    user_username = Column(String(255), nullable=True)
+    last_message_at = Column(DateTime, nullable=False)
+    last_text = Column(String(200), nullable=True)  # preview of the latest message
+    last_from_owner = Column(Boolean, default=False, nullable=False)
+    unread = Column(Integer, default=0, nullable=False)  # customer messages the owner hasn't opened
+    message_count = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        # Inbox list: latest activity first
+        Index('ix_conversations_last_message', 'last_message_at'),
+    )
+    
+    def __repr__(self):
+        return f"<Conversation(user_id={self.user_id}, unread={self.unread})>"
+
+class InboxTotals(Base):
+    """Inbox-wide counters, updated with the conversations (one row, see bot/services/inbox.py)"""
+    __tablename__ = 'inbox_totals'
+    
+    id = Column(Integer, primary_key=True)  # always 1
+    unread = Column(Integer, default=0, nullable=False)  # sum of conversations.unread
+    
+    def __repr__(self):
+        return f"<InboxTotals(unread={self.unread})>"
+
+class OutboxMessage(Base):
+    """Notification waiting to be sent by the outbox dispatcher"""
+    __tablename__ = 'outbox'
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    reply_markup = Column(JSON, nullable=True)  # InlineKeyboardMarkup as dict
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    # Customer an owner reply to this notification goes to (see bot/services/routing.py)
+    route_user_id = Column(BigInteger, nullable=True)
+    route_booking_id = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        # Drain query: pending rows that are due, oldest first
+        Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, chat_id={self.chat_id}, status={self.status.value})>"
+
+class ReplyRoute(Base):
+    """Customer behind an owner notification, by the notification's message id"""
+    __tablename__ = 'reply_routes'
+    
+    chat_id = Column(BigInteger, primary_key=True)
+    message_id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    booking_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<ReplyRoute(message_id={self.message_id}, user_id={self.user_id})>"
+
+class IdempotencyKey(Base):
+    """Submission that was already carried out (see bot/services/idempotency.py)"""
+    __tablename__ = 'idempotency_keys'
+    
+    key = Column(String(128), primary_key=True)  # the primary key is the unique constraint
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(key={self.key}, created_at={self.created_at})>"
+
+class FSMRecord(Base):
+    """FSM state and data shared by all worker processes (see bot/storage/sqlite.py)"""
+    __tablename__ = 'fsm_states'
+    
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # JSON with date/datetime markers
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
     def __repr__(self):
-        return f"<Message(id={self.id}, user_id={self.user_id}, timestamp={self.timestamp})>"
\ No newline at end of file
+        return f"<FSMRecord(key='{self.key}', state='{self.state}')>"
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+ToolBot Mini - supervisor entry point (multi-process mode)
+
+main.py runs one polling process, so every handler shares one event loop
+and one core. In supervisor mode a single ingress (long polling, or a
+webhook server when WEBHOOK_URL is set) receives updates and routes each one
+to one of WORKER_COUNT worker processes over a pipe.
+
+Updates are partitioned by chat id, so all updates of a chat are handled by
+the same worker in arrival order and per-user FSM ordering holds. Workers
+share the SQLite database (WAL mode) and keep FSM state in it through
+SQLiteStorage. The outbox, the booking scheduler and the database
+maintenance run in worker 0 only.
+
+The supervisor restarts workers that die (updates still queued for them are
+kept; updates the dead worker was handling are lost), forwards their log
+records to its own handlers and logs aggregated throughput and latency
+every METRICS_INTERVAL seconds.
+
+Usage:
+    WORKER_COUNT=4 python supervisor.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry a chat (checked in this order)
+CHAT_FIELDS = ('message', 'edited_message', 'channel_post', 'edited_channel_post')
+
+def partition_key(update: Dict[str, Any]) -> int:
+    """Chat id of a raw update; falls back to the sender, then the update id"""
+    for field in CHAT_FIELDS:
+        if field in update:
+            return update[field]['chat']['id']
+    callback = update.get('callback_query')
+    if callback and callback.get('message'):
+        return callback['message']['chat']['id']
+    for value in update.values():
+        if isinstance(value, dict):
+            if 'chat' in value:
+                return value['chat']['id']
+            if 'from' in value:
+                return value['from']['id']
+    return update['update_id']
+
+class WorkerChannel:
+    """
+    Update pipe from the supervisor to one worker that survives restarts
+
+    multiprocessing.Queue guards reads with a lock shared between processes,
+    so a worker killed while waiting in get() leaves it locked for its
+    replacement. Here each worker has a pipe of its own (one reader, no lock)
+    and a feeder thread moves updates into it from a bounded local buffer.
+    """
+
+    def __init__(self, context, maxsize: int):
+        self.reader, self.writer = context.Pipe(duplex=False)
+        self.buffer: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize)
+        self.feeder = threading.Thread(target=self._feed, name="worker-feeder", daemon=True)
+        self.feeder.start()
+
+    def put_nowait(self, item: Optional[dict]):
+        self.buffer.put_nowait(item)
+
+    def qsize(self) -> int:
+        return self.buffer.qsize()
+
+    def _feed(self):
+        while True:
+            item = self.buffer.get()
+            self.writer.send(item)
+            if item is None:
+                return
+
+# === WORKER PROCESS ===
+def worker_main(index: int, updates, metrics, log_queue):
+    """Worker process entry point"""
+    # Ctrl+C reaches the whole process group; workers stop on the supervisor's sentinel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from logging_config import UpdateLogSampler
+    handler = QueueHandler(log_queue)
+    handler.addFilter(UpdateLogSampler(config.LOG_UPDATE_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    root.handlers = [handler]
+
+    asyncio.run(_run_worker(index, updates, metrics))
+
+async def _run_worker(index: int, updates, metrics):
+    from aiogram.fsm.storage.memory import SimpleEventIsolation
+    from bot.app import create_bot, create_dispatcher
+    from bot.storage import SQLiteStorage
+
+    if config.RECORD_UPDATES_PATH:
+        # One recording per worker: updates.jsonl.gz -> updates.w0.jsonl.gz
+        base, _, ext = config.RECORD_UPDATES_PATH.partition('.')
+        config.RECORD_UPDATES_PATH = f"{base}.w{index}.{ext}" if ext else f"{base}.w{index}"
+
+    bot = create_bot()
+    dp = create_dispatcher(
+        storage=SQLiteStorage(),
+        events_isolation=SimpleEventIsolation(),
+        background_services=index == 0
+    )
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    logger.info(f"Worker {index} started")
+
+    loop = asyncio.get_running_loop()
+    inbox: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+    # Bounds the updates in flight; the reader stops taking from the IPC queue when full
+    slots = threading.Semaphore(config.WORKER_CONCURRENCY)
+
+    def read_updates():
+        while True:
+            slots.acquire()
+            try:
+                raw = updates.recv()
+            except EOFError:
+                raw = None
+            loop.call_soon_threadsafe(inbox.put_nowait, raw)
+            if raw is None:
+                return
+
+    reader = threading.Thread(target=read_updates, name=f"worker-{index}-reader", daemon=True)
+    reader.start()
+
+    stats = {'worker': index, 'processed': 0, 'errors': 0, 'latency_sum': 0.0, 'latency_max': 0.0}
+
+    async def handle(raw: dict):
+        started = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception as e:
+            stats['errors'] += 1
+            logger.exception(f"Worker {index} failed on update {raw.get('update_id')}: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            stats['processed'] += 1
+            stats['latency_sum'] += elapsed
+            stats['latency_max'] = max(stats['latency_max'], elapsed)
+            slots.release()
+
+    def flush_metrics():
+        if stats['processed']:
+            metrics.put(dict(stats))
+            stats.update(processed=0, errors=0, latency_sum=0.0, latency_max=0.0)
+
+    async def report_metrics():
+        while True:
+            await asyncio.sleep(1)
+            flush_metrics()
+
+    reporter = asyncio.create_task(report_metrics())
+    tasks = set()
+    try:
+        while True:
+            raw = await inbox.get()
+            if raw is None:
+                break
+            task = asyncio.create_task(handle(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        reporter.cancel()
+        flush_metrics()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await dp.storage.close()
+        await bot.session.close()
+        logger.info(f"Worker {index} stopped")
+
+# === SUPERVISOR ===
+class Supervisor:
+    """Runs the ingress and keeps the worker processes alive"""
+
+    def __init__(self, worker_count: int):
+        self.context = multiprocessing.get_context('spawn')
+        self.worker_count = max(1, worker_count)
+        self.channels = [WorkerChannel(self.context, config.WORKER_QUEUE_SIZE) for _ in range(self.worker_count)]
+        self.metrics_queue = self.context.Queue()
+        self.log_queue = self.context.Queue()
+        self.processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * self.worker_count
+        self.restarts = [0] * self.worker_count
+        self.stopping = False
+
+        # Aggregated metrics (updated by the collector thread)
+        self.metrics_lock = threading.Lock()
+        self.window = self._empty_window()
+        self.window_started = time.monotonic()
+        self.total_processed = 0
+        self.total_errors = 0
+        self.routed = 0
+
+    def _empty_window(self) -> Dict[str, Any]:
+        return {
+            'processed': [0] * self.worker_count,
+            'errors': 0,
+            'latency_sum': 0.0,
+            'latency_max': 0.0
+        }
+
+    # === WORKERS ===
+    def start_worker(self, index: int):
+        process = self.context.Process(
+            target=worker_main,
+            args=(index, self.channels[index].reader, self.metrics_queue, self.log_queue),
+            name=f"toolbot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    async def monitor(self):
+        """Restart workers that exited while the supervisor is running"""
+        while not self.stopping:
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive() and not self.stopping:
+                    self.restarts[index] += 1
+                    logger.error(
+                        f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}, "
+                        f"restarting (restart #{self.restarts[index]})"
+                    )
+                    self.start_worker(index)
+            await asyncio.sleep(1)
+
+    async def stop_workers(self, timeout: float = 30.0):
+        """Send each worker the stop sentinel and wait for it to drain its queue"""
+        self.stopping = True
+        for channel in self.channels:
+            await self._put(channel, None)
+        deadline = time.monotonic() + timeout
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in time, terminating")
+                process.terminate()
+                process.join()
+
+    # === ROUTING ===
+    async def _put(self, channel: WorkerChannel, item: Optional[dict]):
+        # Waiting here pushes back on the ingress instead of buffering without limit
+        while True:
+            try:
+                channel.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    async def route(self, update: Dict[str, Any]):
+        index = partition_key(update) % self.worker_count
+        await self._put(self.channels[index], update)
+        self.routed += 1
+
+    async def poll(self, bot, allowed_updates: List[str]):
+        """Long-polling ingress"""
+        await bot.delete_webhook()
+        offset = None
+        failures = 0
+        while True:
+            try:
+                batch = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(30, 2 ** failures)
+                logger.error(f"Failed to fetch updates: {e}; retrying in {delay}s")
+                await asyncio.sleep(delay)
+                continue
+            for update in batch:
+                offset = update.update_id + 1
+                await self.route(update.model_dump(mode='json', exclude_none=True, by_alias=True))
+
+    async def serve_webhook(self, bot, allowed_updates: List[str]) -> web.AppRunner:
+        """Webhook ingress; Telegram posts raw update JSON to WEBHOOK_PATH"""
+        async def receive(request: web.Request) -> web.Response:
+            if config.WEBHOOK_SECRET and \
+                    request.headers.get('X-Telegram-Bot-Api-Secret-Token') != config.WEBHOOK_SECRET:
+                return web.Response(status=401)
+            await self.route(await request.json())
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, receive)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+        await bot.set_webhook(
+            config.WEBHOOK_URL,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates
+        )
+        logger.info(f"Webhook listening on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        return runner
+
+    # === LOGS AND METRICS ===
+    def forward_logs(self):
+        """Hand worker log records to the supervisor's handlers (runs in a thread)"""
+        while True:
+            record = self.log_queue.get()
+            if record is None:
+                return
+            logging.getLogger(record.name).handle(record)
+
+    def collect_metrics(self):
+        """Fold worker metric deltas into the current window (runs in a thread)"""
+        while True:
+            delta = self.metrics_queue.get()
+            if delta is None:
+                return
+            with self.metrics_lock:
+                self.window['processed'][delta['worker']] += delta['processed']
+                self.window['errors'] += delta['errors']
+                self.window['latency_sum'] += delta['latency_sum']
+                self.window['latency_max'] = max(self.window['latency_max'], delta['latency_max'])
+
+    def report(self):
+        now = time.monotonic()
+        elapsed = max(now - self.window_started, 1e-9)
+        with self.metrics_lock:
+            window, self.window = self.window, self._empty_window()
+        self.window_started = now
+        processed = sum(window['processed'])
+        self.total_processed += processed
+        self.total_errors += window['errors']
+        mean_ms = window['latency_sum'] / processed * 1000 if processed else 0.0
+        alive = sum(1 for process in self.processes if process is not None and process.is_alive())
+        logger.info(
+            f"Workers {alive}/{self.worker_count}: {processed} updates ({processed / elapsed:.1f}/s), "
+            f"{window['errors']} errors, latency mean {mean_ms:.1f} ms max {window['latency_max'] * 1000:.1f} ms; "
+            f"per worker {window['processed']}, queued {[channel.qsize() for channel in self.channels]}, "
+            f"restarts {self.restarts}; total {self.total_processed} handled of {self.routed} routed"
+        )
+
+    async def report_metrics(self):
+        while True:
+            await asyncio.sleep(config.METRICS_INTERVAL)
+            self.report()
+
+    # === MAIN ===
+    async def run(self):
+        from db import init_db, engine
+        from bot.app import create_bot, resolve_used_update_types
+
+        # Schema changes happen once here, not concurrently in every worker
+        await init_db()
+        await engine.dispose()
+
+        threads = [
+            threading.Thread(target=self.forward_logs, name="worker-logs", daemon=True),
+            threading.Thread(target=self.collect_metrics, name="worker-metrics", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        for index in range(self.worker_count):
+            self.start_worker(index)
+        logger.info(f"Started {self.worker_count} workers")
+
+        bot = create_bot()
+        allowed_updates = resolve_used_update_types()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        background = [
+            asyncio.create_task(self.monitor()),
+            asyncio.create_task(self.report_metrics())
+        ]
+        runner = None
+        if config.WEBHOOK_URL:
+            runner = await self.serve_webhook(bot, allowed_updates)
+        else:
+            background.append(asyncio.create_task(self.poll(bot, allowed_updates)))
+
+        try:
+            await stop.wait()
+        finally:
+            logger.info("Stopping...")
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            if runner is not None:
+                await runner.cleanup()
+            await bot.session.close()
+
+            await self.stop_workers()
+            self.metrics_queue.put(None)
+            self.log_queue.put(None)
+            for thread in threads:
+                thread.join(timeout=5)
+            self.report()
+
+if __name__ == "__main__":
+    from logging_config import setup_logging
+
+    log_listener = setup_logging()
+    try:
+        asyncio.run(Supervisor(config.WORKER_COUNT).run())
+    finally:
+        log_listener.stop()
@@ -0,0 +1,14 @@
+"""
+Unit tests - run from the repository root with:
+
+    python -m unittest discover -s tests -t .
+
+config and db read the environment when they are imported, so the tests
+point them at a scratch database first.
+"""
+import os
+import tempfile
+
+from loadtest.replay import configure_environment
+
+configure_environment(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='toolbot-tests-'), 'test.db')}")
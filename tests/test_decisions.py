@@ -0,0 +1,94 @@
+"""
+Owner booking decisions in bot.services.decisions
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from db import engine, init_db, async_session
+from models import Booking, BookingStatus, OutboxMessage, Tool
+from bot.services.decisions import decide_bookings
+from bot.services.writer import writer
+
+START = datetime(2030, 6, 1)
+
+class DecideBookingsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        async with async_session() as session:
+            await session.execute(delete(OutboxMessage))
+            await session.execute(delete(Booking))
+            tool = Tool(name="Drill", description="Cordless drill", price_per_day=10.0)
+            session.add(tool)
+            await session.commit()
+            self.tool_id = tool.id
+
+    async def asyncTearDown(self):
+        await writer.stop()
+        await engine.dispose()
+
+    async def add_booking(self, user_id: int, first_day: int, days: int, status=BookingStatus.PENDING) -> int:
+        async with async_session() as session:
+            booking = Booking(
+                user_id=user_id, tool_id=self.tool_id, status=status, total_price=10.0 * days,
+                start_date=START + timedelta(days=first_day), end_date=START + timedelta(days=first_day + days - 1)
+            )
+            session.add(booking)
+            await session.commit()
+            return booking.id
+
+    async def statuses(self, *booking_ids: int):
+        async with async_session() as session:
+            rows = dict((await session.execute(
+                select(Booking.id, Booking.status).where(Booking.id.in_(booking_ids))
+            )).all())
+        return [rows[booking_id] for booking_id in booking_ids]
+
+    async def test_overlapping_selection_confirms_the_earliest(self):
+        later = await self.add_booking(101, first_day=2, days=3)
+        earlier = await self.add_booking(102, first_day=0, days=3)
+
+        result = await decide_bookings([later, earlier], confirm=True)
+
+        self.assertEqual([row.id for row in result.decided], [earlier])
+        self.assertEqual([row.id for row in result.conflicting], [later])
+        self.assertEqual(await self.statuses(earlier, later), [BookingStatus.CONFIRMED, BookingStatus.CANCELLED])
+
+    async def test_selection_overlapping_a_confirmed_booking(self):
+        confirmed = await self.add_booking(101, first_day=0, days=5, status=BookingStatus.CONFIRMED)
+        clashing = await self.add_booking(102, first_day=4, days=2)
+        free = await self.add_booking(103, first_day=5, days=2)
+
+        result = await decide_bookings([clashing, free], confirm=True)
+
+        self.assertEqual([row.id for row in result.decided], [free])
+        self.assertEqual([row.id for row in result.conflicting], [clashing])
+        self.assertEqual(
+            await self.statuses(confirmed, clashing, free),
+            [BookingStatus.CONFIRMED, BookingStatus.CANCELLED, BookingStatus.CONFIRMED]
+        )
+
+    async def test_unselected_overlapping_requests_are_rejected(self):
+        selected = await self.add_booking(101, first_day=0, days=3)
+        other = await self.add_booking(102, first_day=2, days=3)
+
+        result = await decide_bookings([selected], confirm=True)
+
+        self.assertEqual([row.id for row in result.overlapping], [other])
+        self.assertEqual(await self.statuses(selected, other), [BookingStatus.CONFIRMED, BookingStatus.CANCELLED])
+        async with async_session() as session:
+            notified = (await session.execute(select(OutboxMessage.chat_id).order_by(OutboxMessage.chat_id))).scalars().all()
+        self.assertEqual(notified, [101, 102])
+
+    async def test_reject(self):
+        first = await self.add_booking(101, first_day=0, days=3)
+        second = await self.add_booking(102, first_day=1, days=3)
+
+        result = await decide_bookings([first, second], confirm=False)
+
+        self.assertEqual(sorted(row.id for row in result.decided), [first, second])
+        self.assertEqual(await self.statuses(first, second), [BookingStatus.CANCELLED, BookingStatus.CANCELLED])
+
+if __name__ == '__main__':
+    unittest.main()
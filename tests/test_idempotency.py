@@ -0,0 +1,58 @@
+"""
+Duplicate submissions through bot.services.idempotency
+"""
+import unittest
+
+from sqlalchemy.exc import IntegrityError
+
+from db import engine, init_db, async_session
+from models import Booking, IdempotencyKey
+from bot.services.idempotency import DuplicateSubmission, IdempotencyGuard
+from bot.services.writer import writer
+
+class IdempotencyGuardTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        self.guard = IdempotencyGuard()
+
+    async def asyncTearDown(self):
+        await writer.stop()
+        await engine.dispose()
+
+    async def test_second_submission_is_a_duplicate(self):
+        async def intent(session):
+            return 'done'
+
+        self.assertEqual(await self.guard.submit('test:twice', intent), 'done')
+        with self.assertRaises(DuplicateSubmission):
+            await self.guard.submit('test:twice', intent)
+
+    async def test_key_stored_by_another_process(self):
+        async with async_session() as session:
+            session.add(IdempotencyKey(key='test:elsewhere'))
+            await session.commit()
+
+        async def intent(session):
+            return 'done'
+
+        with self.assertRaises(DuplicateSubmission):
+            await self.guard.submit('test:elsewhere', intent)
+
+    async def test_failing_intent_is_not_a_duplicate(self):
+        async def invalid_booking(session):
+            # user_id, tool_id and the dates are NOT NULL
+            session.add(Booking(total_price=10.0))
+            await session.flush()
+
+        with self.assertRaises(IntegrityError):
+            await self.guard.submit('test:invalid', invalid_booking)
+        self.assertEqual(self.guard.duplicates, 0)
+
+        # Nothing was stored and the key isn't remembered, so a retry runs
+        async def intent(session):
+            return 'done'
+
+        self.assertEqual(await self.guard.submit('test:invalid', intent), 'done')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Owner inbox pages and unread counters in bot.services.inbox
+"""
+import unittest
+
+from sqlalchemy import delete
+
+from db import engine, init_db, async_session
+from models import Conversation, InboxTotals, Message
+from bot.services.inbox import load_inbox, load_thread, pack_inbox_cursor, parse_inbox_cursor, record_message
+from bot.services.writer import writer
+
+class InboxTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        async with async_session() as session:
+            for model in (Message, Conversation, InboxTotals):
+                await session.execute(delete(model))
+            await session.commit()
+
+    async def asyncTearDown(self):
+        await writer.stop()
+        await engine.dispose()
+
+    async def write(self, user_id: int, text: str, is_from_owner: bool = False):
+        async with async_session() as session:
+            await record_message(session, user_id, text, is_from_owner=is_from_owner)
+            await session.commit()
+
+    async def test_paging_is_stable_when_a_conversation_moves_up(self):
+        for user_id in range(1, 6):
+            await self.write(user_id, f"Hello from {user_id}")
+
+        first = await load_inbox(page_size=2)
+        self.assertEqual([row[0] for row in first.rows], [5, 4])
+
+        # The last conversation on the page writes again before "Older" is tapped
+        await self.write(4, "Still there?")
+        cursor = parse_inbox_cursor(pack_inbox_cursor(first.older))
+        self.assertEqual(cursor, first.older)
+        second = await load_inbox(cursor, page_size=2)
+        self.assertEqual([row[0] for row in second.rows], [3, 2])
+
+    async def test_total_unread(self):
+        await self.write(1, "First")
+        await self.write(1, "Second")
+        await self.write(2, "Hi")
+        await self.write(2, "Sure", is_from_owner=True)
+        self.assertEqual((await load_inbox()).total_unread, 3)
+
+        await load_thread(1)
+        self.assertEqual((await load_inbox()).total_unread, 1)
+        await load_thread(1)
+        self.assertEqual((await load_inbox()).total_unread, 1)
+
+    def test_malformed_cursor_means_the_first_page(self):
+        for text in ('', '17', 'x.1', '1.', '.2'):
+            self.assertIsNone(parse_inbox_cursor(text))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Message chunking in bot.rendering
+"""
+import re
+import unittest
+from html.parser import HTMLParser
+
+from bot.rendering import TELEGRAM_MESSAGE_LIMIT, chunk_blocks, text_length
+
+class TagChecker(HTMLParser):
+    """Fails on a closing tag that doesn't match the innermost open one"""
+
+    def __init__(self):
+        super().__init__()
+        self.open = []
+
+    def handle_starttag(self, tag, attrs):
+        self.open.append(tag)
+
+    def handle_endtag(self, tag):
+        assert self.open and self.open.pop() == tag, tag
+
+def balanced(html: str) -> bool:
+    checker = TagChecker()
+    checker.feed(html)
+    checker.close()
+    return not checker.open
+
+def visible(html: str) -> str:
+    return re.sub(r'<[^>]*>', '', html)
+
+class ChunkBlocksTest(unittest.TestCase):
+    def test_blocks_fill_messages_in_order(self):
+        blocks = [f"<b>Tool {n}</b> - $12.50/day" for n in range(400)]
+        chunks = chunk_blocks(blocks, header="🛠 <b>Tools</b>\n")
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(chunks[0].startswith("🛠 <b>Tools</b>\n"))
+        self.assertTrue(all(text_length(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks))
+        # Split between blocks only, and no block is lost or reordered
+        self.assertEqual("\n".join(chunks).split("\n")[2:], blocks)
+        # Each message was as full as the next block allowed
+        for chunk, following in zip(chunks, chunks[1:]):
+            first_block = following.split("\n")[0]
+            self.assertGreater(text_length(chunk) + 1 + text_length(first_block), TELEGRAM_MESSAGE_LIMIT)
+
+    def test_lengths_count_utf16_code_units(self):
+        self.assertEqual(text_length("🔨"), 2)
+        chunks = chunk_blocks(["🔨" * 1500, "🔨" * 1500])
+        self.assertEqual(len(chunks), 2)
+
+    def test_oversized_block_keeps_tags_balanced(self):
+        block = "<b>Notes:</b> " + " ".join(f"<i>word{n}</i> <a href=\"https://x.y/{n}\">link</a>" for n in range(600))
+        chunks = chunk_blocks([block], limit=1000)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(text_length(chunk), 1000)
+            self.assertTrue(balanced(chunk), chunk)
+        self.assertEqual("".join(visible(chunk) for chunk in chunks), visible(block))
+
+    def test_word_longer_than_a_message_is_cut(self):
+        chunks = chunk_blocks(["<code>" + "x" * 2500 + "</code>"], limit=1000)
+        self.assertTrue(all(text_length(chunk) <= 1000 and balanced(chunk) for chunk in chunks))
+        self.assertEqual("".join(visible(chunk) for chunk in chunks), "x" * 2500)
+
+    def test_no_whitespace_only_part(self):
+        for block in ('x' * 4096 + ' ', 'x' * 4096 + '\n\n  ', '<b>' + 'x' * 4089 + ' </b>'):
+            chunks = chunk_blocks([block])
+            self.assertTrue(all(visible(chunk).strip() for chunk in chunks), chunks)
+            self.assertTrue(all(len(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks))
+
+    def test_blank_oversized_block_is_dropped(self):
+        self.assertEqual(chunk_blocks([' ' * 5000, 'tail']), ['tail'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Owner reply routing in bot.services.routing
+"""
+import unittest
+
+from sqlalchemy import delete
+
+from db import engine, init_db, async_session
+from models import ReplyRoute
+from bot.services.routing import ReplyRouter
+
+BOT_ID = 42
+OWNER_CHAT = 1
+
+class ReplyRouterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        async with async_session() as session:
+            await session.execute(delete(ReplyRoute))
+            await session.commit()
+
+    async def asyncTearDown(self):
+        await engine.dispose()
+
+    async def store_route(self, message_id: int, user_id: int):
+        """The route as another worker's outbox commits it"""
+        async with async_session() as session:
+            ReplyRouter().add(session, BOT_ID, OWNER_CHAT, message_id, (user_id, None))
+            await session.commit()
+
+    async def test_route_committed_after_a_miss(self):
+        router = ReplyRouter(miss_ttl=0)
+        self.assertIsNone(await router.resolve(BOT_ID, OWNER_CHAT, 10))
+        await self.store_route(10, user_id=500)
+        self.assertEqual(await router.resolve(BOT_ID, OWNER_CHAT, 10), (500, None))
+
+    async def test_miss_is_remembered_briefly(self):
+        router = ReplyRouter(miss_ttl=60)
+        self.assertIsNone(await router.resolve(BOT_ID, OWNER_CHAT, 11))
+        self.assertIsNone(await router.resolve(BOT_ID, OWNER_CHAT, 11))
+        self.assertEqual((router.hits, router.misses), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
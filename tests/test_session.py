@@ -0,0 +1,83 @@
+"""
+Bot API session built by bot.app.create_session
+"""
+import asyncio
+import socket
+import unittest
+from unittest.mock import patch
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramNetworkError
+
+from config import config
+from bot.app import create_session
+from bot.session import CachingResolver, TunedAiohttpSession
+from loadtest.fake_api import FakeTelegramAPI, start_server
+
+class CreateSessionTest(unittest.IsolatedAsyncioTestCase):
+    async def test_pool_limit_reaches_the_connector(self):
+        session = create_session(limit=7)
+        try:
+            client = await session.create_session()
+            self.assertEqual(client.connector.limit, 7)
+            self.assertIsInstance(client.connector._resolver, CachingResolver)
+        finally:
+            await session.close()
+
+    async def test_default_pool_size(self):
+        session = create_session()
+        try:
+            client = await session.create_session()
+            self.assertEqual(client.connector.limit, config.HTTP_POOL_SIZE)
+        finally:
+            await session.close()
+
+    async def test_custom_api_server(self):
+        # Multi-shop mode and the load tests build their session this way
+        with patch.object(config, 'TELEGRAM_API_URL', 'http://127.0.0.1:8081'):
+            session = create_session(limit=config.HTTP_POOL_SIZE)
+        try:
+            self.assertEqual(session.api.api_url('42:token', 'getMe'), 'http://127.0.0.1:8081/bot42:token/getMe')
+            client = await session.create_session()
+            self.assertEqual(client.connector.limit, config.HTTP_POOL_SIZE)
+        finally:
+            await session.close()
+
+class LongPollTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.api = FakeTelegramAPI()
+        self.runner = await start_server(self.api, '127.0.0.1', port)
+        # The HTTP timeout is shorter than the long poll, as HTTP_TIMEOUT is in production
+        self.session = TunedAiohttpSession(
+            timeout=0.5, api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")
+        )
+        self.bot = Bot(token='42:token', session=self.session)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.runner.cleanup()
+
+    async def test_idle_long_poll_outlasts_the_http_timeout(self):
+        self.assertEqual(await self.bot.get_updates(timeout=1), [])
+
+    async def test_long_poll_returns_pushed_update(self):
+        asyncio.get_running_loop().call_later(
+            0.8, self.api.push_update, {'message': {
+                'message_id': 1, 'date': 1700000000, 'text': 'hi',
+                'chat': {'id': 7, 'type': 'private'}
+            }}
+        )
+        updates = await self.bot.get_updates(timeout=2)
+        self.assertEqual([u.update_id for u in updates], [1])
+
+    async def test_other_methods_keep_the_http_timeout(self):
+        self.api.latency_ms = 1500
+        with self.assertRaises(TelegramNetworkError):
+            await self.bot.get_me()
+
+if __name__ == '__main__':
+    unittest.main()
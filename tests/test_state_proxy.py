@@ -0,0 +1,137 @@
+"""
+FSM reads and writes through bot.middlewares.state_proxy
+"""
+import unittest
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.middlewares import StateProxyMiddleware
+from bot.middlewares.state_proxy import StateProxy
+from bot.storage import BoundedMemoryStorage
+
+KEY = StorageKey(bot_id=42, chat_id=2, user_id=2)
+
+class CountingStorage(BoundedMemoryStorage):
+    """Counts the storage calls the proxy makes"""
+
+    def __init__(self):
+        super().__init__(ttl=60, max_bytes=1 << 20)
+        self.calls = []
+
+    async def get_data(self, key):
+        self.calls.append('get_data')
+        return await super().get_data(key)
+
+    async def set_data(self, key, data):
+        self.calls.append('set_data')
+        await super().set_data(key, data)
+
+    async def set_state(self, key, state=None):
+        self.calls.append('set_state')
+        await super().set_state(key, state)
+
+    async def set_record(self, key, state, data):
+        self.calls.append('set_record')
+        await super().set_record(key, state, data)
+
+class StateProxyTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = CountingStorage()
+        self.context = FSMContext(storage=self.storage, key=KEY)
+
+    async def proxy(self) -> StateProxy:
+        return StateProxy(self.context, await self.storage.get_state(key=KEY))
+
+    async def test_list_mutated_in_place_is_not_a_conflict(self):
+        await self.storage.set_data(key=KEY, data={'image_ids': ['a']})
+        proxy = await self.proxy()
+
+        # As process_tool_photos does
+        image_ids = (await proxy.get_data()).get('image_ids', [])
+        image_ids.extend(['b', 'c'])
+        self.assertEqual(await self.storage.get_data(key=KEY), {'image_ids': ['a']})
+        await proxy.update_data(image_ids=image_ids)
+        image_ids.append('late')
+
+        with self.assertNoLogs('bot.middlewares.state_proxy'):
+            self.assertTrue(await proxy.flush(verify=True))
+        self.assertEqual(await self.storage.get_data(key=KEY), {'image_ids': ['a', 'b', 'c']})
+
+    async def test_middleware_flushes_a_mutating_handler_cleanly(self):
+        await self.storage.set_data(key=KEY, data={'image_ids': []})
+        middleware = StateProxyMiddleware(verify=True)
+
+        async def handler(event, data):
+            image_ids = (await data['state'].get_data())['image_ids']
+            image_ids.append('photo')
+            await data['state'].update_data(image_ids=image_ids)
+
+        await middleware(handler, None, {'state': self.context, 'raw_state': None})
+        self.assertEqual(middleware.conflicts, 0)
+        self.assertEqual(await self.storage.get_data(key=KEY), {'image_ids': ['photo']})
+
+    async def test_one_read_and_one_write_per_update(self):
+        await self.storage.set_data(key=KEY, data={'name': "Drill"})
+        self.storage.calls.clear()
+        proxy = await self.proxy()
+
+        await proxy.update_data(price=10)
+        await proxy.get_data()
+        await proxy.update_data(description="Cordless")
+        await proxy.set_state("AddToolStates:waiting_for_photos")
+        self.assertEqual(await proxy.get_state(), "AddToolStates:waiting_for_photos")
+        self.assertEqual(self.storage.calls, ['get_data'])
+
+        self.assertTrue(await proxy.flush(verify=False))
+        self.assertEqual(self.storage.calls, ['get_data', 'set_record'])
+        self.assertEqual(
+            await self.storage.get_data(key=KEY), {'name': "Drill", 'price': 10, 'description': "Cordless"}
+        )
+        self.assertEqual(await self.storage.get_state(key=KEY), "AddToolStates:waiting_for_photos")
+
+    async def test_untouched_state_is_not_written(self):
+        middleware = StateProxyMiddleware()
+
+        async def handler(event, data):
+            await data['state'].get_data()
+
+        await middleware(handler, None, {'state': self.context, 'raw_state': None})
+        self.assertEqual(middleware.flushes, 0)
+        self.assertNotIn('set_data', self.storage.calls)
+
+    async def test_concurrent_change_of_another_key_is_kept(self):
+        await self.storage.set_data(key=KEY, data={'a': 1, 'b': 1})
+        proxy = await self.proxy()
+        await proxy.update_data(a=2)
+        # Another update of the same user, without event isolation
+        await self.storage.set_data(key=KEY, data={'a': 1, 'b': 3})
+
+        self.assertTrue(await proxy.flush(verify=True))
+        self.assertEqual(await self.storage.get_data(key=KEY), {'a': 2, 'b': 3})
+
+    async def test_concurrent_change_of_the_same_key_is_a_conflict(self):
+        await self.storage.set_data(key=KEY, data={'a': 1})
+        proxy = await self.proxy()
+        await proxy.update_data(a=2)
+        await self.storage.set_data(key=KEY, data={'a': 3})
+
+        with self.assertLogs('bot.middlewares.state_proxy', 'WARNING'):
+            self.assertFalse(await proxy.flush(verify=True))
+        # This update's value wins, as it did with direct writes
+        self.assertEqual(await self.storage.get_data(key=KEY), {'a': 2})
+
+    async def test_clear_replaces_the_record(self):
+        await self.storage.set_state(key=KEY, state="MessageStates:replying_to_user")
+        await self.storage.set_data(key=KEY, data={'reply_user_id': 7})
+        proxy = await self.proxy()
+
+        await proxy.clear()
+        self.assertIsNone(await proxy.get_state())
+        self.assertEqual(await proxy.get_data(), {})
+        self.assertTrue(await proxy.flush(verify=True))
+        self.assertIsNone(await self.storage.get_state(key=KEY))
+        self.assertEqual(await self.storage.get_data(key=KEY), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Hierarchical timing wheel in bot.services.timer_wheel
+"""
+import random
+import unittest
+
+from bot.services.timer_wheel import TimerWheel
+
+class TimerWheelTest(unittest.TestCase):
+    def test_fires_at_its_tick_not_before(self):
+        wheel = TimerWheel(start=1000, tick=1.0)
+        wheel.schedule(1005.5, 'a')
+        self.assertEqual(wheel.advance(1004.9), [])
+        self.assertEqual(wheel.advance(1005.0), ['a'])
+        self.assertEqual(wheel.advance(1010), [])
+        self.assertEqual(len(wheel), 0)
+
+    def test_overdue_timer_fires_at_the_next_tick(self):
+        wheel = TimerWheel(start=1000)
+        wheel.advance(1010)
+        wheel.schedule(990, 'late')
+        # Tick 1010 has been handled already
+        self.assertEqual(wheel.advance(1010.5), [])
+        self.assertEqual(wheel.advance(1011), ['late'])
+
+    def test_cascades_through_levels_and_overflow(self):
+        # Small levels: 4 ticks, 16 ticks, 32 ticks, the rest in overflow
+        wheel = TimerWheel(start=0, sizes=(4, 4, 2))
+        self.assertEqual(wheel.horizon, 32)
+        for due in (3, 9, 20, 31, 45, 100):
+            wheel.schedule(due, due)
+        self.assertEqual(len(wheel), 6)
+
+        fired = {}
+        for now in range(0, 120):
+            for item in wheel.advance(now):
+                fired[item] = now
+        self.assertEqual(fired, {due: due for due in (3, 9, 20, 31, 45, 100)})
+        self.assertEqual(len(wheel), 0)
+
+    def test_matches_a_sorted_list_under_random_steps(self):
+        rng = random.Random(7)
+        wheel = TimerWheel(start=500, sizes=(8, 8, 4))
+        timers = [(500 + rng.uniform(-5, 600), n) for n in range(500)]
+        for due, n in timers:
+            wheel.schedule(due, n)
+
+        now, seen = 500.0, set()
+        while now < 1200:
+            now += rng.choice((0.3, 1, 1, 3, 17, 64))
+            fired = set(wheel.advance(now))
+            expected = {n for due, n in timers if int(due) <= int(now)} - seen
+            self.assertEqual(fired, expected, f"at {now}")
+            seen |= fired
+        self.assertEqual(len(seen), len(timers))
+        self.assertEqual(len(wheel), 0)
+
+if __name__ == '__main__':
+    unittest.main()
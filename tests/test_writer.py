@@ -0,0 +1,86 @@
+"""
+Group-commit writer in bot.services.writer
+"""
+import asyncio
+import unittest
+
+from sqlalchemy import delete, select
+
+from db import engine, init_db, async_session
+from models import Tool
+from bot.services.writer import GroupCommitWriter
+
+PREFIX = "writer-test-"
+
+def add_tool(name: str, fail: bool = False):
+    async def write(session):
+        tool = Tool(name=PREFIX + name, description="", price_per_day=1.0)
+        session.add(tool)
+        await session.flush()
+        if fail:
+            raise ValueError(name)
+        return tool.id
+    return write
+
+class GroupCommitWriterTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        async with async_session() as session:
+            await session.execute(delete(Tool).where(Tool.name.startswith(PREFIX)))
+            await session.commit()
+        self.writer = GroupCommitWriter(max_batch=64, max_delay=0.05)
+
+    async def asyncTearDown(self):
+        await self.writer.stop()
+        await engine.dispose()
+
+    async def stored(self):
+        async with async_session() as session:
+            names = (await session.scalars(select(Tool.name).where(Tool.name.startswith(PREFIX)))).all()
+        return sorted(name[len(PREFIX):] for name in names)
+
+    async def test_concurrent_writes_share_one_commit(self):
+        ids = await asyncio.gather(*(self.writer.submit(add_tool(str(n))) for n in range(10)))
+        self.assertEqual(len(set(ids)), 10)
+        self.assertEqual((self.writer.commits, self.writer.intents), (1, 10))
+        self.assertEqual(await self.stored(), sorted(str(n) for n in range(10)))
+
+    async def test_result_is_committed_when_returned(self):
+        tool_id = await self.writer.submit(add_tool("a"))
+        async with async_session() as session:
+            self.assertEqual((await session.get(Tool, tool_id)).name, PREFIX + "a")
+
+    async def test_failing_write_rolls_back_alone(self):
+        results = await asyncio.gather(
+            self.writer.submit(add_tool("a")),
+            self.writer.submit(add_tool("bad", fail=True)),
+            self.writer.submit(add_tool("b")),
+            return_exceptions=True
+        )
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(self.writer.commits, 1)
+        self.assertEqual(await self.stored(), ["a", "b"])
+
+    async def test_groups_are_capped_at_max_batch(self):
+        self.writer.max_batch = 2
+        await asyncio.gather(*(self.writer.submit(add_tool(str(n))) for n in range(5)))
+        self.assertEqual((self.writer.commits, self.writer.intents), (3, 5))
+
+    async def test_cancelled_caller_is_not_written(self):
+        self.writer.max_delay = 0.2
+        kept = asyncio.ensure_future(self.writer.submit(add_tool("kept")))
+        dropped = asyncio.ensure_future(self.writer.submit(add_tool("dropped")))
+        await asyncio.sleep(0.05)
+        dropped.cancel()
+        await kept
+        self.assertEqual(await self.stored(), ["kept"])
+
+    async def test_stop_commits_what_is_queued(self):
+        pending = asyncio.ensure_future(self.writer.submit(add_tool("queued")))
+        await asyncio.sleep(0)
+        await self.writer.stop()
+        self.assertTrue(pending.done())
+        self.assertEqual(await self.stored(), ["queued"])
+
+if __name__ == '__main__':
+    unittest.main()